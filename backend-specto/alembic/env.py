@@ -4,7 +4,6 @@ import sys
 from logging.config import fileConfig
 
 from alembic import context
-from sqlalchemy import pool
 from sqlalchemy.engine import Connection
 from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
 
@@ -15,6 +14,7 @@ if BASE_DIR not in sys.path:
 
 # --- importa settings e Base ---
 from app.core.settings import settings
+from app.core.db import engine_kwargs
 from app.models import Base
 
 # Alembic Config
@@ -51,10 +51,12 @@ def do_run_migrations(connection: Connection) -> None:
 
 
 async def run_migrations_online() -> None:
+    url = get_url()
     connectable: AsyncEngine = create_async_engine(
-        get_url(),
-        poolclass=pool.NullPool,
-        # sem connect_args, sem SSL manual
+        url,
+        # mesmos connect_args da app (ex.: atrás de PgBouncer em modo transação);
+        # sem SSL manual
+        **engine_kwargs(url, null_pool=True),
     )
     async with connectable.connect() as connection:
         await connection.run_sync(do_run_migrations)
@@ -0,0 +1,76 @@
+"""add likes_count to comentarios and chat_messages
+
+Revision ID: 26b1c23e1fa2
+Revises: ee3426cc26e3
+Create Date: 2026-10-19 10:12:40.118204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '26b1c23e1fa2'
+down_revision: Union[str, Sequence[str], None] = 'ee3426cc26e3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# (tabela alvo, tabela de likes, coluna FK nos likes)
+COUNTERS = (
+    ("comentarios", "likes", "comentario_id"),
+    ("chat_messages", "chat_likes", "message_id"),
+)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for target, likes, fk in COUNTERS:
+        op.add_column(
+            target,
+            sa.Column('likes_count', sa.Integer(), server_default=sa.text('0'), nullable=False),
+        )
+
+        # Backfill a partir dos likes existentes
+        op.execute(
+            f"""
+            UPDATE {target} t
+            SET likes_count = c.total
+            FROM (SELECT {fk} AS id, count(*) AS total FROM {likes} GROUP BY {fk}) c
+            WHERE t.id = c.id
+            """
+        )
+
+        # Mantido pela DB na mesma transação do INSERT/DELETE do like, o que
+        # cobre também os deletes em cascata (ex.: apagar um utilizador).
+        op.execute(
+            f"""
+            CREATE OR REPLACE FUNCTION {likes}_count_trg() RETURNS trigger AS $$
+            BEGIN
+                IF TG_OP = 'INSERT' THEN
+                    UPDATE {target} SET likes_count = likes_count + 1 WHERE id = NEW.{fk};
+                ELSE
+                    UPDATE {target} SET likes_count = likes_count - 1 WHERE id = OLD.{fk};
+                END IF;
+                RETURN NULL;
+            END;
+            $$ LANGUAGE plpgsql
+            """
+        )
+        op.execute(
+            f"""
+            CREATE TRIGGER {likes}_count
+            AFTER INSERT OR DELETE ON {likes}
+            FOR EACH ROW EXECUTE FUNCTION {likes}_count_trg()
+            """
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for target, likes, _ in COUNTERS:
+        op.execute(f"DROP TRIGGER IF EXISTS {likes}_count ON {likes}")
+        op.execute(f"DROP FUNCTION IF EXISTS {likes}_count_trg()")
+        op.drop_column(target, 'likes_count')
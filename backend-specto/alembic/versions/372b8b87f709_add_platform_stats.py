@@ -0,0 +1,37 @@
+"""add platform_stats rollup and users.criado_em index
+
+Revision ID: 372b8b87f709
+Revises: 94e0fe5b4f09
+Create Date: 2026-10-19 11:40:52.903114
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '372b8b87f709'
+down_revision: Union[str, Sequence[str], None] = '94e0fe5b4f09'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('platform_stats',
+    sa.Column('nome', sa.Text(), nullable=False),
+    sa.Column('valor', sa.BigInteger(), nullable=False),
+    sa.Column('estimado', sa.Boolean(), server_default=sa.text('false'), nullable=False),
+    sa.Column('atualizado_em', sa.TIMESTAMP(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.PrimaryKeyConstraint('nome')
+    )
+    # "Utilizadores recentes" do dashboard: ORDER BY criado_em DESC LIMIT 5
+    op.create_index('ix_users_criado_em', 'users', ['criado_em'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_users_criado_em', table_name='users')
+    op.drop_table('platform_stats')
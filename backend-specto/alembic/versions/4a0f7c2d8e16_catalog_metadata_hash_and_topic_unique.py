@@ -0,0 +1,59 @@
+"""metadata_hash on filmes/series and unique (tmdb_id, media_type) on forum_topics
+
+Revision ID: 4a0f7c2d8e16
+Revises: e81a6d3f5b27
+Create Date: 2026-10-19 14:52:10.674381
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4a0f7c2d8e16'
+down_revision: Union[str, Sequence[str], None] = 'e81a6d3f5b27'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('filmes', sa.Column('metadata_hash', sa.Text(), nullable=True))
+    op.add_column('series', sa.Column('metadata_hash', sa.Text(), nullable=True))
+
+    # Tópicos duplicados (criados pela corrida do SELECT-then-INSERT): fica o
+    # mais antigo, que recebe os posts e mensagens dos restantes.
+    op.execute(
+        """
+        CREATE TEMP TABLE forum_topic_dups ON COMMIT DROP AS
+        SELECT id, min(id) OVER (PARTITION BY tmdb_id, media_type) AS keep_id
+        FROM forum_topics
+        WHERE tmdb_id IS NOT NULL
+        """
+    )
+    op.execute("DELETE FROM forum_topic_dups WHERE id = keep_id")
+    for table in ('forum_posts', 'chat_messages', 'chat_messages_archive'):
+        op.execute(
+            f"""
+            UPDATE {table} t SET topic_id = d.keep_id
+            FROM forum_topic_dups d WHERE t.topic_id = d.id
+            """
+        )
+    op.execute("DELETE FROM forum_topics WHERE id IN (SELECT id FROM forum_topic_dups)")
+
+    op.create_index(
+        'forum_topics_tmdb_media_unq',
+        'forum_topics',
+        ['tmdb_id', 'media_type'],
+        unique=True,
+        postgresql_where=sa.text('tmdb_id IS NOT NULL'),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('forum_topics_tmdb_media_unq', table_name='forum_topics')
+    op.drop_column('series', 'metadata_hash')
+    op.drop_column('filmes', 'metadata_hash')
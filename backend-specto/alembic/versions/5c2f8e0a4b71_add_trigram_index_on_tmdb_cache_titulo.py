@@ -0,0 +1,35 @@
+"""add trigram index on tmdb_cached_filmes payload->>'titulo'
+
+Revision ID: 5c2f8e0a4b71
+Revises: 9e4b6a1d7c30
+Create Date: 2026-10-19 19:05:48.327190
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5c2f8e0a4b71'
+down_revision: Union[str, Sequence[str], None] = '9e4b6a1d7c30'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    # CONCURRENTLY: não bloqueia o refresh da cache de géneros enquanto o índice é criado
+    with op.get_context().autocommit_block():
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS tmdb_cache_titulo_trgm "
+            "ON tmdb_cached_filmes USING gin ((payload->>'titulo') gin_trgm_ops)"
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS tmdb_cache_titulo_trgm")
@@ -0,0 +1,46 @@
+"""composite indexes for hot queries (vistos, comentarios, chat, genre cache)
+
+Revision ID: 5c9e2f71d0a4
+Revises: b7d41c2e9a13
+Create Date: 2026-10-19 13:27:48.902214
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5c9e2f71d0a4'
+down_revision: Union[str, Sequence[str], None] = 'b7d41c2e9a13'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# (novo índice, tabela, colunas, índice de uma coluna que passa a ser redundante)
+# O índice composto começa pela mesma coluna, por isso também serve as FKs/CASCADE.
+_INDEXES = (
+    ('vistos_user_data_idx', 'vistos', 'user_id, data_visto DESC', ('vistos_user_idx', 'user_id')),
+    ('comentarios_filme_criado_idx', 'comentarios', 'filme_id, criado_em', ('comentarios_filme_idx', 'filme_id')),
+    ('comentarios_serie_criado_idx', 'comentarios', 'serie_id, criado_em', ('comentarios_serie_idx', 'serie_id')),
+    ('chat_messages_topic_created_idx', 'chat_messages', 'topic_id, created_at DESC', ('chat_messages_topic_idx', 'topic_id')),
+    ('tmdb_cache_genero_cached_idx', 'tmdb_cached_filmes', 'genero_id, cached_em DESC, ordem', ('tmdb_cache_genero_idx', 'genero_id')),
+)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # CONCURRENTLY: as tabelas continuam a aceitar escritas durante a criação
+    with op.get_context().autocommit_block():
+        for name, table, columns, (old_name, _) in _INDEXES:
+            op.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {table} ({columns})")
+            op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {old_name}")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        for name, table, _, (old_name, old_column) in reversed(_INDEXES):
+            op.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {old_name} ON {table} ({old_column})")
+            op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
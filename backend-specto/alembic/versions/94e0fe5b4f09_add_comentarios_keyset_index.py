@@ -0,0 +1,43 @@
+"""add (criado_em, id) index on comentarios for keyset pagination
+
+Revision ID: 94e0fe5b4f09
+Revises: 26b1c23e1fa2
+Create Date: 2026-10-19 11:02:17.540318
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '94e0fe5b4f09'
+down_revision: Union[str, Sequence[str], None] = '26b1c23e1fa2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # CONCURRENTLY: não bloqueia escritas em comentarios enquanto o índice é criado
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_comentarios_criado_em_id',
+            'comentarios',
+            ['criado_em', 'id'],
+            unique=False,
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_comentarios_criado_em_id',
+            table_name='comentarios',
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
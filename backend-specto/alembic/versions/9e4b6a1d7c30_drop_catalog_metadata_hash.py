@@ -0,0 +1,32 @@
+"""drop metadata_hash from filmes/series (upsert compares the columns directly)
+
+Revision ID: 9e4b6a1d7c30
+Revises: c3d8a1f05e92
+Create Date: 2026-10-19 18:42:05.118734
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9e4b6a1d7c30'
+down_revision: Union[str, Sequence[str], None] = 'c3d8a1f05e92'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # O hash era de payloads parciais e reescrevia linhas sem mudanças; o
+    # upsert compara agora as colunas (IS DISTINCT FROM) e já não o usa.
+    op.drop_column('series', 'metadata_hash')
+    op.drop_column('filmes', 'metadata_hash')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.add_column('filmes', sa.Column('metadata_hash', sa.Text(), nullable=True))
+    op.add_column('series', sa.Column('metadata_hash', sa.Text(), nullable=True))
@@ -0,0 +1,44 @@
+"""add trigram indexes on users.username and users.email
+
+Revision ID: b7d41c2e9a13
+Revises: 372b8b87f709
+Create Date: 2026-10-19 12:41:05.118472
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7d41c2e9a13'
+down_revision: Union[str, Sequence[str], None] = '372b8b87f709'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# CITEXT não tem opclass gin_trgm_ops: o índice é sobre a expressão `col::text`
+_INDEXES = {
+    'users_username_trgm': 'username',
+    'users_email_trgm': 'email',
+}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    # CONCURRENTLY: não bloqueia registos/logins enquanto o índice é criado
+    with op.get_context().autocommit_block():
+        for name, column in _INDEXES.items():
+            op.execute(
+                f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} "
+                f"ON users USING gin (({column}::text) gin_trgm_ops)"
+            )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        for name in _INDEXES:
+            op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
@@ -0,0 +1,40 @@
+"""add login_throttle (shared login throttling state)
+
+Revision ID: c3d8a1f05e92
+Revises: 4a0f7c2d8e16
+Create Date: 2026-10-19 17:21:37.410862
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c3d8a1f05e92'
+down_revision: Union[str, Sequence[str], None] = '4a0f7c2d8e16'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('login_throttle',
+    sa.Column('chave', sa.Text(), nullable=False),
+    sa.Column('janela_inicio', sa.TIMESTAMP(timezone=True), nullable=False),
+    sa.Column('falhas_anteriores', sa.Integer(), server_default=sa.text('0'), nullable=False),
+    sa.Column('falhas', sa.Integer(), server_default=sa.text('0'), nullable=False),
+    sa.Column('bloqueios', sa.Integer(), server_default=sa.text('0'), nullable=False),
+    sa.Column('bloqueado_ate', sa.TIMESTAMP(timezone=True), nullable=True),
+    sa.Column('atualizado_em', sa.TIMESTAMP(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.PrimaryKeyConstraint('chave')
+    )
+    # Limpeza periódica das chaves inativas
+    op.create_index('ix_login_throttle_atualizado_em', 'login_throttle', ['atualizado_em'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_login_throttle_atualizado_em', table_name='login_throttle')
+    op.drop_table('login_throttle')
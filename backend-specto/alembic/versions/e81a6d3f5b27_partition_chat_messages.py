@@ -0,0 +1,145 @@
+"""partition chat_messages by month, with chat_messages_archive
+
+Revision ID: e81a6d3f5b27
+Revises: 5c9e2f71d0a4
+Create Date: 2026-10-19 14:08:33.260915
+
+"""
+from datetime import datetime, timezone
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e81a6d3f5b27'
+down_revision: Union[str, Sequence[str], None] = '5c9e2f71d0a4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Partições criadas à frente do mês atual (o job em app/services/chat_partitions
+# mantém esta margem daí em diante)
+MONTHS_AHEAD = 3
+
+_COLUMNS = """
+    id integer NOT NULL DEFAULT nextval('chat_messages_id_seq'),
+    topic_id integer NOT NULL REFERENCES forum_topics(id) ON DELETE CASCADE,
+    user_id integer NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    message text NOT NULL,
+    created_at timestamptz NOT NULL DEFAULT now(),
+    likes_count integer NOT NULL DEFAULT 0
+"""
+# O arquivo não gera ids: só recebe partições já preenchidas
+_ARCHIVE_COLUMNS = _COLUMNS.replace("DEFAULT nextval('chat_messages_id_seq')", "")
+
+
+def _add_months(month: datetime, n: int) -> datetime:
+    total = month.year * 12 + month.month - 1 + n
+    return month.replace(year=total // 12, month=total % 12 + 1)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    conn = op.get_bind()
+
+    # chat_likes deixa de ter FK (a PK passa a ser (id, created_at)); a limpeza
+    # dos likes quando uma mensagem é apagada passa para um trigger.
+    op.drop_constraint('chat_likes_message_id_fkey', 'chat_likes', type_='foreignkey')
+
+    op.execute("ALTER TABLE chat_messages RENAME TO chat_messages_legacy")
+    op.execute("ALTER TABLE chat_messages_legacy RENAME CONSTRAINT chat_messages_pkey TO chat_messages_legacy_pkey")
+    for index in ('chat_messages_topic_created_idx', 'chat_messages_topic_idx', 'chat_messages_user_idx'):
+        op.execute(f"DROP INDEX IF EXISTS {index}")
+
+    op.execute(f"CREATE TABLE chat_messages ({_COLUMNS}, PRIMARY KEY (id, created_at)) PARTITION BY RANGE (created_at)")
+    # Destino das partições antigas (ver chat_partitions.archive_old_partitions)
+    op.execute(
+        f"CREATE TABLE chat_messages_archive ({_ARCHIVE_COLUMNS}, "
+        "PRIMARY KEY (id, created_at)) PARTITION BY RANGE (created_at)"
+    )
+
+    # Uma partição por mês, da mensagem mais antiga até MONTHS_AHEAD à frente
+    first, last = conn.execute(sa.text(
+        "SELECT date_trunc('month', COALESCE(min(created_at), now()) AT TIME ZONE 'UTC'), "
+        "date_trunc('month', GREATEST(COALESCE(max(created_at), now()), now()) AT TIME ZONE 'UTC') "
+        "FROM chat_messages_legacy"
+    )).one()
+    month = first.replace(tzinfo=timezone.utc)
+    end = _add_months(last.replace(tzinfo=timezone.utc), MONTHS_AHEAD)
+    while month <= end:
+        nxt = _add_months(month, 1)
+        op.execute(
+            f"CREATE TABLE chat_messages_{month:%Y_%m} PARTITION OF chat_messages "
+            f"FOR VALUES FROM ('{month.isoformat()}') TO ('{nxt.isoformat()}')"
+        )
+        month = nxt
+
+    op.execute(
+        """
+        INSERT INTO chat_messages (id, topic_id, user_id, message, created_at, likes_count)
+        SELECT id, topic_id, user_id, message, COALESCE(created_at, now()), likes_count
+        FROM chat_messages_legacy
+        """
+    )
+    # Índices depois da cópia (mais rápido); propagam-se a todas as partições
+    op.execute("CREATE INDEX chat_messages_topic_created_idx ON chat_messages (topic_id, created_at DESC)")
+    op.execute("CREATE INDEX chat_messages_user_idx ON chat_messages (user_id)")
+
+    # A sequência pertencia à tabela antiga: sem isto o DROP levava-a junto
+    op.execute("ALTER SEQUENCE chat_messages_id_seq OWNED BY chat_messages.id")
+    op.execute("DROP TABLE chat_messages_legacy")
+
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION chat_messages_delete_likes_trg() RETURNS trigger AS $$
+        BEGIN
+            DELETE FROM chat_likes WHERE message_id = OLD.id;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+        """
+    )
+    op.execute(
+        """
+        CREATE TRIGGER chat_messages_delete_likes
+        AFTER DELETE ON chat_messages
+        FOR EACH ROW EXECUTE FUNCTION chat_messages_delete_likes_trg()
+        """
+    )
+    op.execute("ANALYZE chat_messages")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP TRIGGER IF EXISTS chat_messages_delete_likes ON chat_messages")
+    op.execute("DROP FUNCTION IF EXISTS chat_messages_delete_likes_trg()")
+
+    op.execute("ALTER TABLE chat_messages RENAME TO chat_messages_partitioned")
+    op.execute("ALTER TABLE chat_messages_partitioned RENAME CONSTRAINT chat_messages_pkey TO chat_messages_partitioned_pkey")
+    for index in ('chat_messages_topic_created_idx', 'chat_messages_user_idx'):
+        op.execute(f"DROP INDEX IF EXISTS {index}")
+
+    op.execute(f"CREATE TABLE chat_messages ({_COLUMNS}, PRIMARY KEY (id))")
+    # Mensagens arquivadas voltam também para a tabela única
+    op.execute(
+        """
+        INSERT INTO chat_messages (id, topic_id, user_id, message, created_at, likes_count)
+        SELECT id, topic_id, user_id, message, created_at, likes_count FROM chat_messages_partitioned
+        UNION ALL
+        SELECT id, topic_id, user_id, message, created_at, likes_count FROM chat_messages_archive
+        """
+    )
+    op.execute("ALTER SEQUENCE chat_messages_id_seq OWNED BY chat_messages.id")
+    op.execute("DROP TABLE chat_messages_partitioned CASCADE")
+    op.execute("DROP TABLE chat_messages_archive CASCADE")
+
+    op.execute("CREATE INDEX chat_messages_topic_created_idx ON chat_messages (topic_id, created_at DESC)")
+    op.execute("CREATE INDEX chat_messages_user_idx ON chat_messages (user_id)")
+
+    op.execute("DELETE FROM chat_likes WHERE message_id NOT IN (SELECT id FROM chat_messages)")
+    op.create_foreign_key(
+        'chat_likes_message_id_fkey', 'chat_likes', 'chat_messages',
+        ['message_id'], ['id'], ondelete='CASCADE',
+    )
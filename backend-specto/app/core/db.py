@@ -1,10 +1,104 @@
+import asyncio
+import logging
+import time
+from typing import Optional
+from uuid import uuid4
+
+from sqlalchemy import exc, text
 from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool
+
+from . import metrics
 from .settings import settings
 
+logger = logging.getLogger(__name__)
+
+
+class PoolMetrics:
+    def __init__(self) -> None:
+        self.checkout_wait = metrics.Timings()
+        self.timeouts = 0
+        self.liveness_failures = 0
+        self.liveness_timeouts = 0
+        self.liveness_disposals = 0
+        self.last_liveness_ok: Optional[float] = None
+
+
+pool_metrics = PoolMetrics()
+
+
+replica_pool_metrics = PoolMetrics()
+
+
+class InstrumentedPool(AsyncAdaptedQueuePool):
+    """QueuePool que mede quanto tempo cada checkout espera por uma ligação."""
+
+    metrics = pool_metrics
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            self.metrics.timeouts += 1
+            raise
+        finally:
+            self.metrics.checkout_wait.observe(time.perf_counter() - start)
+
+
+class ReplicaPool(InstrumentedPool):
+    metrics = replica_pool_metrics
+
+
+def _unnamed_statement() -> str:
+    # Nome único por statement: atrás de um pooler em modo transação a próxima
+    # transação pode calhar noutra ligação do servidor, onde um nome fixo colide.
+    return f"__asyncpg_{uuid4().hex}__"
+
+
+def connect_args(pooler_mode: Optional[str] = None) -> dict:
+    """connect_args do asyncpg para o modo de ligação configurado."""
+    if (pooler_mode or settings.db_pooler_mode) == "transaction":
+        return {
+            "statement_cache_size": 0,           # cache do asyncpg
+            "prepared_statement_cache_size": 0,  # cache do dialecto SQLAlchemy
+            "prepared_statement_name_func": _unnamed_statement,
+        }
+    # O SQLAlchemy prepara os statements ele próprio (cache do dialecto); a cache
+    # interna do asyncpg só cobre chamadas diretas. Ambas seguem a mesma setting.
+    return {
+        "statement_cache_size": settings.db_statement_cache_size,
+        "prepared_statement_cache_size": settings.db_statement_cache_size,
+    }
+
+
+def engine_kwargs(
+    url: str,
+    pooler_mode: Optional[str] = None,
+    null_pool: Optional[bool] = None,
+    poolclass: type = InstrumentedPool,
+) -> dict:
+    """Argumentos de create_async_engine partilhados pela app, alembic e scripts."""
+    if not url.startswith("postgresql"):
+        return {}  # SQLite local: pool por omissão
+    kwargs = {"connect_args": connect_args(pooler_mode)}
+    if settings.db_null_pool if null_pool is None else null_pool:
+        kwargs["poolclass"] = NullPool
+        return kwargs
+    kwargs.update(
+        poolclass=poolclass,
+        pool_size=settings.db_pool_size,
+        max_overflow=settings.db_max_overflow,
+        pool_timeout=settings.db_pool_timeout,
+        pool_recycle=settings.db_pool_recycle,
+    )
+    return kwargs
+
+
 # Cria o engine assíncrono com a URL da DB vinda do .env
 engine = create_async_engine(
     settings.database_url,
-    pool_pre_ping=True,
+    **engine_kwargs(settings.database_url),
 )
 
 # Session factory
@@ -14,7 +108,128 @@ SessionLocal = async_sessionmaker(
     expire_on_commit=False,
 )
 
+# Réplica de leitura (opcional); sem ela, as leituras usam o engine primário
+if settings.database_replica_url:
+    read_engine = create_async_engine(
+        settings.database_replica_url,
+        **engine_kwargs(settings.database_replica_url, poolclass=ReplicaPool),
+    )
+else:
+    read_engine = engine
+
+ReadSessionLocal = async_sessionmaker(
+    bind=read_engine,
+    class_=AsyncSession,
+    expire_on_commit=False,
+)
+
 # Dependency para FastAPI
 async def get_session() -> AsyncSession:
     async with SessionLocal() as session:
         yield session
+
+
+# ----------------- Liveness -----------------
+# Em vez de pool_pre_ping (um round trip por checkout), uma verificação
+# periódica; se a ligação tiver caído, o pool é descartado e as ligações são
+# recriadas (timeouts só contam na métrica).
+_liveness_task: Optional[asyncio.Task] = None
+
+
+def _is_disconnect(error: BaseException) -> bool:
+    """Ligação realmente perdida (vs. pool saturado ou servidor lento)."""
+    if isinstance(error, exc.DBAPIError):
+        if error.connection_invalidated:
+            return True
+        error = error.orig
+    # TimeoutError também é um OSError, mas não significa ligação perdida
+    return isinstance(error, (OSError, ConnectionError)) and not isinstance(error, TimeoutError)
+
+
+async def check_liveness(target=None, target_metrics: Optional[PoolMetrics] = None) -> bool:
+    target = target or engine
+    target_metrics = target_metrics or pool_metrics
+    try:
+        async with target.connect() as conn:
+            await asyncio.wait_for(conn.execute(text("SELECT 1")), timeout=5)
+    except (exc.TimeoutError, asyncio.TimeoutError) as e:
+        # Pool cheio ou servidor lento: as ligações estão boas, descartá-las só
+        # provocava uma avalanche de reconexões no pior momento
+        target_metrics.liveness_timeouts += 1
+        logger.warning("DB liveness sem resposta (%s): %s", target.url.host, e or "timeout")
+        return False
+    except Exception as e:
+        target_metrics.liveness_failures += 1
+        if not _is_disconnect(e):
+            logger.warning("DB liveness falhou (%s): %s", target.url.host, e)
+            return False
+        logger.warning("DB liveness perdeu a ligação (%s), a descartar o pool: %s", target.url.host, e)
+        try:
+            await target.dispose()
+            target_metrics.liveness_disposals += 1
+        except Exception as dispose_error:
+            logger.warning("Falha ao descartar o pool (%s): %s", target.url.host, dispose_error)
+        return False
+    target_metrics.last_liveness_ok = time.time()
+    return True
+
+
+async def _liveness_loop(interval: float) -> None:
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await check_liveness()
+        except Exception as e:
+            logger.warning("Verificação de liveness falhou: %s", e)
+        if read_engine is not engine:
+            # Réplica lenta ou ocupada só conta como timeout; o pool só cai se a ligação caiu
+            try:
+                await check_liveness(read_engine, replica_pool_metrics)
+            except Exception as e:
+                logger.warning("Verificação de liveness da réplica falhou: %s", e)
+
+
+def start_db_liveness() -> None:
+    global _liveness_task
+    if settings.db_liveness_interval > 0 and _liveness_task is None:
+        _liveness_task = asyncio.create_task(_liveness_loop(settings.db_liveness_interval))
+
+
+async def stop_db_liveness() -> None:
+    global _liveness_task
+    if _liveness_task is not None:
+        _liveness_task.cancel()
+        try:
+            await _liveness_task
+        except asyncio.CancelledError:
+            pass
+        _liveness_task = None
+
+
+def pool_status(target=None, target_metrics: Optional[PoolMetrics] = None) -> dict:
+    target = target or engine
+    target_metrics = target_metrics or pool_metrics
+    pool = target.pool
+    status = {
+        "pool_class": type(pool).__name__,
+        "checkout_wait": target_metrics.checkout_wait.as_dict(),
+        "checkout_timeouts": target_metrics.timeouts,
+        "liveness_failures": target_metrics.liveness_failures,
+        "liveness_timeouts": target_metrics.liveness_timeouts,
+        "liveness_disposals": target_metrics.liveness_disposals,
+        "last_liveness_ok": target_metrics.last_liveness_ok,
+    }
+    if isinstance(pool, AsyncAdaptedQueuePool):
+        status.update(
+            size=pool.size(),
+            in_use=pool.checkedout(),
+            idle=pool.checkedin(),
+            overflow=max(pool.overflow(), 0),
+            max_overflow=settings.db_max_overflow,
+        )
+    return status
+
+
+metrics.register("db_pool", pool_status)
+if read_engine is not engine:
+    metrics.register("db_replica_pool", lambda: pool_status(read_engine, replica_pool_metrics))
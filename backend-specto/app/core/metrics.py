@@ -0,0 +1,51 @@
+"""
+Registo simples de métricas do processo, exposto em `GET /admin/metrics`.
+
+Cada subsistema regista uma função que devolve um dict (sem I/O) com o seu
+estado atual; o endpoint junta tudo num snapshot.
+"""
+from collections import deque
+from typing import Callable, Dict
+
+_providers: Dict[str, Callable[[], dict]] = {}
+
+
+def register(name: str, provider: Callable[[], dict]) -> None:
+    _providers[name] = provider
+
+
+def snapshot() -> Dict[str, dict]:
+    return {name: provider() for name, provider in _providers.items()}
+
+
+class Timings:
+    """Contagem, média, máximo e percentis das últimas N medições (em ms)."""
+
+    def __init__(self, window: int = 1000) -> None:
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self._recent: deque = deque(maxlen=window)
+
+    def observe(self, seconds: float) -> None:
+        ms = seconds * 1000.0
+        self.count += 1
+        self.total += ms
+        self.max = max(self.max, ms)
+        self._recent.append(ms)
+
+    def _percentile(self, ordered: list, p: float) -> float:
+        if not ordered:
+            return 0.0
+        return ordered[min(len(ordered) - 1, int(p * len(ordered)))]
+
+    def as_dict(self) -> dict:
+        ordered = sorted(self._recent)
+        return {
+            "count": self.count,
+            "avg_ms": round(self.total / self.count, 3) if self.count else 0.0,
+            "max_ms": round(self.max, 3),
+            "p50_ms": round(self._percentile(ordered, 0.50), 3),
+            "p95_ms": round(self._percentile(ordered, 0.95), 3),
+            "p99_ms": round(self._percentile(ordered, 0.99), 3),
+        }
@@ -0,0 +1,100 @@
+"""
+Utilizador autenticado em cache (por processo).
+
+Depois de validar o JWT, as dependências de autenticação só precisam de uma
+versão reduzida do utilizador (`AuthPrincipal`): id, username, cargo, avatar,
+xp e nível. Guardamo-la por `AUTH_PRINCIPAL_TTL` segundos, por isso a maioria
+dos pedidos autenticados deixa de fazer `SELECT * FROM users` (com o
+`senha_hash`) a cada chamada.
+
+Quem altera estes campos chama `invalidate_principal(user_id)`; noutros
+workers a versão antiga dura no máximo o TTL.
+"""
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core import metrics
+from app.core.settings import settings
+from app.models import User
+
+
+@dataclass(frozen=True)
+class AuthPrincipal:
+    id: int
+    username: str
+    role: str
+    avatar_url: Optional[str]
+    xp: int
+    level: int
+
+
+_entries: "OrderedDict[int, tuple[float, AuthPrincipal]]" = OrderedDict()
+_stats = {"hits": 0, "misses": 0, "invalidations": 0}
+
+
+def _get(user_id: int) -> Optional[AuthPrincipal]:
+    entry = _entries.get(user_id)
+    if entry is None:
+        return None
+    expires, principal = entry
+    if expires <= time.monotonic():
+        _entries.pop(user_id, None)
+        return None
+    _entries.move_to_end(user_id)
+    return principal
+
+
+def _set(principal: AuthPrincipal) -> None:
+    _entries[principal.id] = (time.monotonic() + settings.auth_principal_ttl, principal)
+    _entries.move_to_end(principal.id)
+    while len(_entries) > settings.auth_principal_max_entries:
+        _entries.popitem(last=False)
+
+
+async def load_principal(session: AsyncSession, user_id: int) -> Optional[AuthPrincipal]:
+    """Principal do utilizador `user_id` (cache ou uma query só com as colunas necessárias)."""
+    if settings.auth_principal_ttl > 0:
+        principal = _get(user_id)
+        if principal is not None:
+            _stats["hits"] += 1
+            return principal
+    _stats["misses"] += 1
+
+    row = (
+        await session.execute(
+            select(User.id, User.username, User.role, User.avatar_url, User.xp, User.level).where(User.id == user_id)
+        )
+    ).one_or_none()
+    if row is None:
+        return None
+    principal = AuthPrincipal(*row)
+    if settings.auth_principal_ttl > 0:
+        _set(principal)
+    return principal
+
+
+def invalidate_principal(user_id: int) -> None:
+    if _entries.pop(user_id, None) is not None:
+        _stats["invalidations"] += 1
+
+
+def clear_principals() -> None:
+    _entries.clear()
+
+
+def principal_metrics() -> dict:
+    lookups = _stats["hits"] + _stats["misses"]
+    return {
+        **_stats,
+        "entries": len(_entries),
+        "hit_ratio": round(_stats["hits"] / lookups, 4) if lookups else 0.0,
+        "ttl_s": settings.auth_principal_ttl,
+    }
+
+
+metrics.register("auth_principals", principal_metrics)
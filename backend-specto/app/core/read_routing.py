@@ -0,0 +1,99 @@
+"""
+Encaminhamento de leituras para a réplica, com read-your-writes.
+
+Rotas só de leitura usam `get_read_session`: vai à réplica, exceto para um
+utilizador que escreveu há menos de `REPLICA_PIN_SECONDS` — esse fica "preso"
+ao primário e vê logo o que acabou de gravar. O `PrimaryPinMiddleware` marca o
+utilizador (pelo JWT) após cada POST/PUT/PATCH/DELETE bem-sucedido.
+
+Os pins vivem em memória do processo: com vários workers, a janela cobre o
+caso comum (o mesmo cliente volta ao mesmo worker via keep-alive) e o atraso
+normal da réplica é menor do que a janela.
+"""
+import time
+from typing import AsyncIterator, Dict, Optional
+
+from fastapi import Request
+from jose import JWTError
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.db import ReadSessionLocal, SessionLocal, engine, read_engine
+from app.core.security import decode_token
+from app.core.settings import settings
+
+WRITE_METHODS = {"POST", "PUT", "PATCH", "DELETE"}
+MAX_PINS = 50_000
+
+_pins: Dict[int, float] = {}
+
+
+def replica_enabled() -> bool:
+    return read_engine is not engine
+
+
+def pin_primary(user_id: int) -> None:
+    """Leituras deste utilizador vão ao primário durante a janela configurada."""
+    if not replica_enabled():
+        return
+    now = time.monotonic()
+    if len(_pins) >= MAX_PINS:
+        for uid in [uid for uid, until in _pins.items() if until <= now]:
+            _pins.pop(uid, None)
+    _pins[user_id] = now + settings.replica_pin_seconds
+
+
+def is_pinned(user_id: Optional[int]) -> bool:
+    if user_id is None:
+        return False
+    until = _pins.get(user_id)
+    if until is None:
+        return False
+    if until <= time.monotonic():
+        _pins.pop(user_id, None)
+        return False
+    return True
+
+
+def user_id_from_headers(headers: Headers) -> Optional[int]:
+    auth = headers.get("authorization", "")
+    scheme, _, token = auth.partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    try:
+        return int(decode_token(token).get("sub", "0")) or None
+    except (JWTError, ValueError):
+        return None
+
+
+async def get_read_session(request: Request) -> AsyncIterator[AsyncSession]:
+    """Dependency para rotas só de leitura (réplica, salvo pin ao primário)."""
+    factory = ReadSessionLocal
+    if replica_enabled() and is_pinned(user_id_from_headers(request.headers)):
+        factory = SessionLocal
+    async with factory() as session:
+        yield session
+
+
+class PrimaryPinMiddleware:
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] not in WRITE_METHODS or not replica_enabled():
+            await self.app(scope, receive, send)
+            return
+
+        user_id = user_id_from_headers(Headers(scope=scope))
+        if user_id is None:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_wrapper(message: Message) -> None:
+            # Antes de a resposta sair: o próximo pedido do cliente já vê o pin
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                pin_primary(user_id)
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
@@ -1,11 +1,22 @@
-from typing import Optional, Dict, Any, Union
+import asyncio
+import functools
+import secrets
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Optional, Dict, Any, Tuple, Union
 from datetime import datetime, timedelta, timezone
 from jose import jwt, JWTError
 from passlib.context import CryptContext
+from app.core import metrics
 from app.core.settings import settings
-from passlib.context import CryptContext
 
-pwd_context = CryptContext(schemes=["bcrypt_sha256"], deprecated="auto")
+# Hashes com outro custo (ou esquema) ficam "needs_update" e são refeitos no login
+pwd_context = CryptContext(
+    schemes=["bcrypt_sha256"],
+    deprecated="auto",
+    bcrypt_sha256__rounds=settings.password_bcrypt_rounds,
+)
 ALGORITHM = "HS256"
 
 def hash_password(password: str) -> str:
@@ -14,6 +25,112 @@ def hash_password(password: str) -> str:
 def verify_password(password: str, password_hash: str) -> bool:
     return pwd_context.verify(password, password_hash)
 
+
+# ----------------- Hashing fora do event loop -----------------
+# Cada bcrypt custa 100-300 ms de CPU: corre num pool de threads limitado (o
+# bcrypt liberta o GIL) e, com a fila cheia, o pedido falha logo em vez de
+# atrasar o chat e o resto da API.
+class PasswordHasherBusy(RuntimeError):
+    """Demasiados hashes pendentes (PASSWORD_HASH_WORKERS + PASSWORD_HASH_QUEUE)."""
+
+
+_executor: Optional[ThreadPoolExecutor] = None
+# `_pending` conta o trabalho que está mesmo no executor: só desce quando o job
+# termina (callback na thread do pool), não quando quem espera é cancelado.
+_state_lock = threading.Lock()
+_pending = 0
+_rejected = 0
+_timings = {"hash": metrics.Timings(), "verify": metrics.Timings(), "queue_wait": metrics.Timings()}
+
+
+def _job_done(kind: str, submitted: float, future: "Future") -> None:
+    global _pending
+    with _state_lock:
+        _pending -= 1
+        if not future.cancelled() and future.exception() is None:
+            started, _, finished = future.result()
+            _timings["queue_wait"].observe(started - submitted)
+            _timings[kind].observe(finished - started)
+
+
+async def _run_hasher(kind: str, fn, *args):
+    global _executor, _pending, _rejected
+    with _state_lock:
+        if _pending >= settings.password_hash_workers + settings.password_hash_queue:
+            _rejected += 1
+            raise PasswordHasherBusy("Demasiados pedidos de autenticação em curso")
+        _pending += 1
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=settings.password_hash_workers, thread_name_prefix="password-hash")
+
+    def job():
+        started = time.perf_counter()
+        return started, fn(*args), time.perf_counter()
+
+    submitted = time.perf_counter()
+    try:
+        future = _executor.submit(job)
+    except BaseException:
+        with _state_lock:
+            _pending -= 1
+        raise
+    future.add_done_callback(functools.partial(_job_done, kind, submitted))
+    _, result, _ = await asyncio.wrap_future(future)
+    return result
+
+
+async def hash_password_async(password: str) -> str:
+    return await _run_hasher("hash", pwd_context.hash, password)
+
+
+async def verify_and_update_password(password: str, password_hash: str) -> Tuple[bool, Optional[str]]:
+    """(válida, novo_hash): `novo_hash` vem preenchido quando o hash usa parâmetros antigos."""
+    return await _run_hasher("verify", pwd_context.verify_and_update, password, password_hash)
+
+
+_dummy_hash: Optional[str] = None
+_dummy_lock = asyncio.Lock()
+
+
+async def verify_dummy_password(password: str) -> None:
+    """Mesmo custo de um verify real, para emails que não existem (sem fuga por timing)."""
+    global _dummy_hash
+    if _dummy_hash is None:
+        # Um só hash mesmo com vários primeiros pedidos em simultâneo
+        async with _dummy_lock:
+            if _dummy_hash is None:
+                _dummy_hash = await hash_password_async(secrets.token_urlsafe(16))
+    await _run_hasher("verify", pwd_context.verify_and_update, password, _dummy_hash)
+
+
+async def warm_password_hasher() -> None:
+    """Calcula o hash de referência no arranque: o primeiro email desconhecido não paga dois bcrypt."""
+    try:
+        await verify_dummy_password("")
+    except PasswordHasherBusy:
+        pass
+
+
+def shutdown_password_hasher() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False)
+        _executor = None
+
+
+def password_hasher_metrics() -> dict:
+    return {
+        "workers": settings.password_hash_workers,
+        "queue_limit": settings.password_hash_queue,
+        "pending": _pending,
+        "rejected": _rejected,
+        "rounds": settings.password_bcrypt_rounds,
+        **{kind: timings.as_dict() for kind, timings in _timings.items()},
+    }
+
+
+metrics.register("password_hashing", password_hasher_metrics)
+
 def create_access_token(subject: Union[str, int], expires_minutes: Optional[int] = None, extra_claims: Optional[Dict[str, Any]] = None) -> str:
     if expires_minutes is None:
         expires_minutes = settings.access_token_expire_minutes
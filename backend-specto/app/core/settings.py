@@ -6,20 +6,115 @@ BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
 ENV_PATH = os.path.join(BASE_DIR, ".env")
 load_dotenv(ENV_PATH)
 
+def _async_db_url(url: str | None) -> str | None:
+    if url and url.startswith("postgres://"):
+        return url.replace("postgres://", "postgresql+asyncpg://", 1)
+    if url and url.startswith("postgresql://"):
+        return url.replace("postgresql://", "postgresql+asyncpg://", 1)
+    return url
+
+
 class Settings:
     def __init__(self) -> None:
         # Lê a variável RAILWAY_DATABASE_URL do .env
         # Prefer `DATABASE_URL` (used commonly) but fall back to `RAILWAY_DATABASE_URL`.
         # Keep None if neither are set so caller can decide. For local development
         # you can set `DATABASE_URL=sqlite+aiosqlite:///./specto.db` in `.env`.
-        self.database_url: str | None = os.getenv("DATABASE_URL")
-        if self.database_url and self.database_url.startswith("postgres://"):
-            self.database_url = self.database_url.replace("postgres://", "postgresql+asyncpg://", 1)
-        elif self.database_url and self.database_url.startswith("postgresql://"):
-            self.database_url = self.database_url.replace("postgresql://", "postgresql+asyncpg://", 1)
+        self.database_url: str | None = _async_db_url(os.getenv("DATABASE_URL"))
+        # Réplica só de leitura (opcional). Sem ela, as leituras vão ao primário.
+        self.database_replica_url: str | None = _async_db_url(os.getenv("DATABASE_REPLICA_URL") or None)
+        # Depois de uma escrita, as leituras desse utilizador ficam no primário
+        # durante este tempo (read-your-writes apesar do atraso da réplica).
+        self.replica_pin_seconds: float = float(os.getenv("REPLICA_PIN_SECONDS", "5"))
         self.secret_key: str = os.getenv("SECRET_KEY", "ChurrascoMorterini")
         self.access_token_expire_minutes: int = int(
             os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "60")
         )
 
+        # Pool de ligações à DB (só se aplica a Postgres; SQLite ignora)
+        self.db_pool_size: int = int(os.getenv("DB_POOL_SIZE", "10"))
+        self.db_max_overflow: int = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+        self.db_pool_timeout: float = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+        self.db_pool_recycle: int = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+        # Cache de prepared statements do asyncpg (por ligação); 0 desativa
+        self.db_statement_cache_size: int = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "256"))
+        # Substitui o pre-ping por checkout: verificação periódica em background
+        self.db_liveness_interval: float = float(os.getenv("DB_LIVENESS_INTERVAL", "30"))
+        # "direct" (ligação direta ao Postgres) ou "transaction" (atrás de um
+        # pooler em modo transação, ex. PgBouncer): sem prepared statements
+        # nomeados/cache e sem estado de sessão.
+        self.db_pooler_mode: str = os.getenv("DB_POOLER_MODE", "direct").strip().lower()
+        # Ligação direta (sem pooler) para a manutenção que precisa de estado de
+        # sessão: advisory locks de sessão e DETACH ... CONCURRENTLY.
+        self.database_direct_url: str | None = _async_db_url(os.getenv("DATABASE_DIRECT_URL") or None)
+        # NullPool: cada sessão abre/fecha a sua ligação (o pooler externo é que reutiliza)
+        self.db_null_pool: bool = os.getenv("DB_NULL_POOL", "false").strip().lower() in {"1", "true", "yes", "on"}
+
+        # Instrumentação de SQL: log de queries lentas, deteção de N+1 e, com
+        # SQL_DEBUG, cabeçalhos Server-Timing/X-DB-* em cada resposta.
+        self.sql_debug: bool = os.getenv("SQL_DEBUG", "false").strip().lower() in {"1", "true", "yes", "on"}
+        self.slow_query_ms: float = float(os.getenv("SLOW_QUERY_MS", "200"))
+        self.n_plus_one_threshold: int = int(os.getenv("N_PLUS_ONE_THRESHOLD", "5"))
+
+        # Dashboard admin: contadores recalculados em background a cada N segundos.
+        # Com PLATFORM_STATS_ESTIMATES (por omissão), tabelas acima de ..._MIN_ROWS
+        # usam as estimativas do planner (pg_class/pg_stats) em vez de COUNT(*).
+        self.platform_stats_interval: float = float(os.getenv("PLATFORM_STATS_INTERVAL", "60"))
+        self.platform_stats_estimates: bool = os.getenv("PLATFORM_STATS_ESTIMATES", "true").strip().lower() in {"1", "true", "yes", "on"}
+        self.platform_stats_estimate_min_rows: int = int(os.getenv("PLATFORM_STATS_ESTIMATE_MIN_ROWS", "1000000"))
+
+        # chat_messages particionada por mês: partições criadas com N meses de
+        # antecedência; as mais antigas que CHAT_RETENTION_MONTHS passam para
+        # chat_messages_archive (0 = nunca arquivar), opcionalmente noutro tablespace.
+        self.chat_partitions_ahead: int = int(os.getenv("CHAT_PARTITIONS_AHEAD", "3"))
+        self.chat_retention_months: int = int(os.getenv("CHAT_RETENTION_MONTHS", "12"))
+        self.chat_archive_tablespace: str | None = os.getenv("CHAT_ARCHIVE_TABLESPACE") or None
+        self.chat_partition_interval: float = float(os.getenv("CHAT_PARTITION_INTERVAL", "21600"))
+        # O histórico do chat procura primeiro só nesta janela (partições recentes)
+        self.chat_history_window_days: int = int(os.getenv("CHAT_HISTORY_WINDOW_DAYS", "30"))
+
+        # Utilizador autenticado em cache por processo (segundos; 0 = desligado).
+        # Alterações noutros workers (ex.: cargo) demoram no máximo isto a propagar.
+        self.auth_principal_ttl: float = float(os.getenv("AUTH_PRINCIPAL_TTL", "30"))
+        self.auth_principal_max_entries: int = int(os.getenv("AUTH_PRINCIPAL_MAX_ENTRIES", "10000"))
+
+        # Passwords: bcrypt num pool de threads fora do event loop. Acima de
+        # WORKERS + QUEUE hashes pendentes, login/registo respondem 503.
+        self.password_hash_workers: int = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+        self.password_hash_queue: int = int(os.getenv("PASSWORD_HASH_QUEUE", "64"))
+        # Custo do bcrypt; ao mudar, os hashes antigos são refeitos no login seguinte
+        self.password_bcrypt_rounds: int = int(os.getenv("PASSWORD_BCRYPT_ROUNDS", "12"))
+
+        # Login: falhas contadas por IP e por conta numa janela deslizante; acima
+        # do limite a chave fica bloqueada LOCKOUT_BASE * 2^(n-1) segundos (até
+        # LOCKOUT_MAX). "memory" (por processo), "postgres" (partilhado entre
+        # workers, tabela login_throttle) ou "off".
+        self.login_throttle_backend: str = os.getenv("LOGIN_THROTTLE_BACKEND", "memory").strip().lower()
+        self.login_throttle_window: float = float(os.getenv("LOGIN_THROTTLE_WINDOW", "300"))
+        self.login_throttle_ip_limit: int = int(os.getenv("LOGIN_THROTTLE_IP_LIMIT", "20"))
+        self.login_throttle_account_limit: int = int(os.getenv("LOGIN_THROTTLE_ACCOUNT_LIMIT", "5"))
+        self.login_lockout_base: float = float(os.getenv("LOGIN_LOCKOUT_BASE", "30"))
+        self.login_lockout_max: float = float(os.getenv("LOGIN_LOCKOUT_MAX", "3600"))
+        self.login_throttle_max_keys: int = int(os.getenv("LOGIN_THROTTLE_MAX_KEYS", "100000"))
+        # Proxies à frente da app que acrescentam ao X-Forwarded-For (Railway: 1).
+        # 0 = usar o IP da ligação.
+        self.trusted_proxy_hops: int = int(os.getenv("TRUSTED_PROXY_HOPS", "1"))
+
+        # Imagens (posters/backdrops). Sem IMAGE_PROXY_BASE_URL os formatters
+        # apontam diretamente para o CDN da TMDb; com ele, para o proxy /imagens.
+        self.tmdb_image_base: str = os.getenv("TMDB_IMAGE_BASE", "https://image.tmdb.org/t/p").rstrip("/")
+        self.image_proxy_base_url: str | None = (os.getenv("IMAGE_PROXY_BASE_URL") or "").rstrip("/") or None
+        self.image_cache_dir: str = os.getenv("IMAGE_CACHE_DIR", os.path.join(BASE_DIR, ".cache", "imagens"))
+        self.image_cache_max_mb: int = int(os.getenv("IMAGE_CACHE_MAX_MB", "512"))
+
+        # Compressão das respostas (gzip/br). Abaixo do limite não compensa o CPU.
+        self.compression_min_size: int = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+        self.compression_gzip_level: int = int(os.getenv("COMPRESSION_GZIP_LEVEL", "6"))
+        self.compression_brotli_quality: int = int(os.getenv("COMPRESSION_BROTLI_QUALITY", "4"))
+        self.compression_cache_mb: int = int(os.getenv("COMPRESSION_CACHE_MB", "32"))
+
+        # Entra no ETag das rotas públicas: um deploy novo (formatters diferentes)
+        # invalida as cópias que os browsers/edge têm guardadas.
+        self.release_id: str = os.getenv("RELEASE_ID") or os.getenv("RAILWAY_DEPLOYMENT_ID", "")
+
 settings = Settings()
@@ -0,0 +1,195 @@
+"""
+Instrumentação de SQL por pedido.
+
+Hooks `before/after_cursor_execute` nos engines registam, para o pedido atual
+(contextvar aberto pelo `SqlStatsMiddleware`):
+  - nº de queries e tempo total na DB;
+  - as queries mais lentas;
+  - quantas vezes cada "forma" de statement se repetiu -> padrões N+1.
+
+Queries acima de `SLOW_QUERY_MS` vão para o log; pedidos com a mesma forma
+repetida `N_PLUS_ONE_THRESHOLD` vezes ou mais também. Com `SQL_DEBUG=1`, a
+resposta leva `Server-Timing` e `X-DB-*` com o resumo.
+"""
+import heapq
+import logging
+import re
+import time
+from collections import Counter
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import List, Optional, Tuple
+
+from sqlalchemy import event
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core import metrics
+from app.core.db import engine, read_engine
+from app.core.settings import settings
+
+logger = logging.getLogger(__name__)
+
+SLOWEST_PER_REQUEST = 5
+
+_PARAM_LIST_RE = re.compile(r"\(\s*(?:\$\d+|\?|%\(\w+\)s)(?:\s*,\s*(?:\$\d+|\?|%\(\w+\)s))*\s*\)")
+_PARAM_RE = re.compile(r"\$\d+|%\(\w+\)s")
+_SPACE_RE = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=2048)
+def statement_shape(statement: str) -> str:
+    """Forma normalizada: parâmetros como `?` e listas IN (...) colapsadas."""
+    shape = _PARAM_LIST_RE.sub("(?)", statement)
+    shape = _PARAM_RE.sub("?", shape)
+    return _SPACE_RE.sub(" ", shape).strip()
+
+
+class RequestSqlStats:
+    def __init__(self, label: str) -> None:
+        self.label = label
+        self.count = 0
+        self.total = 0.0
+        self.shapes: Counter = Counter()
+        self._slowest: List[Tuple[float, str]] = []
+        self.closed = False
+
+    def record(self, shape: str, elapsed: float) -> None:
+        self.count += 1
+        self.total += elapsed
+        self.shapes[shape] += 1
+        if len(self._slowest) < SLOWEST_PER_REQUEST:
+            heapq.heappush(self._slowest, (elapsed, shape))
+        elif elapsed > self._slowest[0][0]:
+            heapq.heapreplace(self._slowest, (elapsed, shape))
+
+    @property
+    def slowest(self) -> List[Tuple[float, str]]:
+        return sorted(self._slowest, reverse=True)
+
+    def repeated(self, threshold: Optional[int] = None) -> List[Tuple[str, int]]:
+        threshold = threshold or settings.n_plus_one_threshold
+        return [(shape, n) for shape, n in self.shapes.most_common() if n >= threshold]
+
+
+class _Totals:
+    def __init__(self) -> None:
+        self.requests = 0
+        self.queries = 0
+        self.slow_queries = 0
+        self.n_plus_one_requests = 0
+        self.db_time = metrics.Timings()
+
+
+totals = _Totals()
+_current: ContextVar[Optional[RequestSqlStats]] = ContextVar("sql_stats", default=None)
+
+
+def current_stats() -> Optional[RequestSqlStats]:
+    return _current.get()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("_sql_stats_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get("_sql_stats_start")
+    if not starts:
+        return
+    elapsed = time.perf_counter() - starts.pop()
+    totals.queries += 1
+
+    stats = _current.get()
+    shape = statement_shape(statement)
+    if stats is not None and not stats.closed:
+        stats.record(shape, elapsed)
+
+    if elapsed * 1000 >= settings.slow_query_ms:
+        totals.slow_queries += 1
+        logger.warning(
+            "Query lenta (%.1f ms) em %s: %s",
+            elapsed * 1000,
+            stats.label if stats else "-",
+            shape[:500],
+        )
+
+
+def instrument(target) -> None:
+    sync_engine = target.sync_engine
+    if not event.contains(sync_engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(sync_engine, "after_cursor_execute", _after_cursor_execute)
+
+
+instrument(engine)
+if read_engine is not engine:
+    instrument(read_engine)
+
+
+def _finish(stats: RequestSqlStats) -> None:
+    stats.closed = True
+    totals.requests += 1
+    if not stats.count:
+        return
+    totals.db_time.observe(stats.total)
+    if settings.sql_debug:
+        logger.info(
+            "%s: %d queries, %.1f ms na DB; mais lentas: %s",
+            stats.label,
+            stats.count,
+            stats.total * 1000,
+            [(round(t * 1000, 1), shape[:120]) for t, shape in stats.slowest],
+        )
+    repeated = stats.repeated()
+    if repeated:
+        totals.n_plus_one_requests += 1
+        for shape, n in repeated:
+            logger.warning("Possível N+1 em %s: %dx %s", stats.label, n, shape[:300])
+
+
+class SqlStatsMiddleware:
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        # Websockets ficam de fora: uma ligação longa não é "um pedido"
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestSqlStats(f"{scope['method']} {scope['path']}")
+        token = _current.set(stats)
+
+        async def send_wrapper(message: Message) -> None:
+            if settings.sql_debug and message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                db_ms = stats.total * 1000
+                headers.append("Server-Timing", f'db;dur={db_ms:.1f};desc="{stats.count} queries"')
+                headers["X-DB-Queries"] = str(stats.count)
+                headers["X-DB-Time-Ms"] = f"{db_ms:.1f}"
+                repeated = stats.repeated()
+                if repeated:
+                    resumo = "; ".join(f"{n}x {shape[:80]}" for shape, n in repeated[:3])
+                    headers["X-DB-N-Plus-One"] = resumo.encode("ascii", "replace").decode()
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _finish(stats)
+            _current.reset(token)
+
+
+def sql_metrics() -> dict:
+    return {
+        "requests": totals.requests,
+        "queries": totals.queries,
+        "slow_queries": totals.slow_queries,
+        "slow_query_ms": settings.slow_query_ms,
+        "n_plus_one_requests": totals.n_plus_one_requests,
+        "db_time_per_request": totals.db_time.as_dict(),
+    }
+
+
+metrics.register("sql", sql_metrics)
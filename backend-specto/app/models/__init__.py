@@ -2,8 +2,8 @@ from __future__ import annotations
 from datetime import datetime
 from typing import Optional
 from sqlalchemy import (
-    CheckConstraint, ForeignKey, Integer, Text, Boolean,
-    Date, TIMESTAMP, text, Numeric, Index, String
+    BigInteger, CheckConstraint, cast, ForeignKey, Integer, Text, Boolean,
+    Date, TIMESTAMP, text, Numeric, Index, PrimaryKeyConstraint, String
 )
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
 from sqlalchemy.dialects.postgresql import CITEXT, JSONB
@@ -93,6 +93,8 @@ class Comentario(Base):
     comentario_pai_id: Mapped[Optional[int]] = mapped_column(ForeignKey("comentarios.id", ondelete="CASCADE"))
     texto: Mapped[str] = mapped_column(Text, nullable=False)
     criado_em: Mapped[datetime] = mapped_column(TIMESTAMP(timezone=True), server_default=text("now()"))
+    # Mantido por trigger em `likes` (ver migração 26b1c23e1fa2)
+    likes_count: Mapped[int] = mapped_column(Integer, nullable=False, server_default=text("0"))
 
     __table_args__ = (
         CheckConstraint(
@@ -163,16 +165,36 @@ Index(
     postgresql_ops={"nome": "gin_trgm_ops"},
 )
 
+# Pesquisa de utilizadores no admin (ILIKE '%x%' e similarity). As colunas são
+# CITEXT, que não tem opclass trigram: indexa-se a expressão `col::text`.
+Index(
+    "users_username_trgm",
+    cast(User.username, Text).label("username_text"),
+    postgresql_using="gin",
+    postgresql_ops={"username_text": "gin_trgm_ops"},
+)
+
+Index(
+    "users_email_trgm",
+    cast(User.email, Text).label("email_text"),
+    postgresql_using="gin",
+    postgresql_ops={"email_text": "gin_trgm_ops"},
+)
+
 # Índices
 Index("comentarios_user_idx", Comentario.user_id)
-Index("comentarios_filme_idx", Comentario.filme_id)
-Index("comentarios_serie_idx", Comentario.serie_id)
+# Árvore de comentários: WHERE filme_id/serie_id = ? ORDER BY criado_em
+Index("comentarios_filme_criado_idx", Comentario.filme_id, Comentario.criado_em)
+Index("comentarios_serie_criado_idx", Comentario.serie_id, Comentario.criado_em)
 Index("comentarios_pai_idx", Comentario.comentario_pai_id)
+# Paginação keyset do admin: ORDER BY criado_em DESC, id DESC
+Index("ix_comentarios_criado_em_id", Comentario.criado_em, Comentario.id)
 
 Index("likes_user_idx", Like.user_id)
 Index("likes_comentario_idx", Like.comentario_id)
 
-Index("vistos_user_idx", Visto.user_id)
+# /vistos: WHERE user_id = ? ORDER BY data_visto DESC
+Index("vistos_user_data_idx", Visto.user_id, Visto.data_visto.desc())
 Index("vistos_filme_idx", Visto.filme_id, postgresql_where=text("filme_id IS NOT NULL"))
 Index("vistos_serie_idx", Visto.serie_id, postgresql_where=text("serie_id IS NOT NULL"))
 
@@ -204,7 +226,19 @@ Index(
     TmdbCachedFilme.genero_id,
     unique=True,
 )
-Index("tmdb_cache_genero_idx", TmdbCachedFilme.genero_id)
+Index(
+    "tmdb_cache_genero_cached_idx",
+    TmdbCachedFilme.genero_id,
+    TmdbCachedFilme.cached_em.desc(),
+    TmdbCachedFilme.ordem,
+)
+# Pesquisa local também nos títulos da cache de géneros (payload->>'titulo' % :q)
+Index(
+    "tmdb_cache_titulo_trgm",
+    TmdbCachedFilme.payload["titulo"].astext.label("titulo"),
+    postgresql_using="gin",
+    postgresql_ops={"titulo": "gin_trgm_ops"},
+)
 
 # ======================
 # Fórum e Chat
@@ -242,17 +276,35 @@ class ForumPost(Base):
 
 
 class ChatMessage(Base):
+    # Particionada por mês em created_at (ver migração e app/services/chat_partitions).
+    # A PK tem de incluir a chave de partição: (id, created_at). Para o ORM basta
+    # o id, que vem de uma sequência.
     __tablename__ = "chat_messages"
+    __table_args__ = (
+        PrimaryKeyConstraint("id", "created_at"),
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
 
-    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    id: Mapped[int] = mapped_column(Integer, autoincrement=True)
     topic_id: Mapped[int] = mapped_column(ForeignKey("forum_topics.id", ondelete="CASCADE"), nullable=False)
     user_id: Mapped[int] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
     message: Mapped[str] = mapped_column(Text, nullable=False)
-    created_at: Mapped[datetime] = mapped_column(TIMESTAMP(timezone=True), server_default=text("now()"))
+    created_at: Mapped[datetime] = mapped_column(
+        TIMESTAMP(timezone=True), nullable=False, server_default=text("now()")
+    )
+    # Mantido por trigger em `chat_likes` (ver migração 26b1c23e1fa2)
+    likes_count: Mapped[int] = mapped_column(Integer, nullable=False, server_default=text("0"))
 
     topic = relationship("ForumTopic", back_populates="chat_messages")
     user = relationship("User")
-    likes = relationship("ChatLike", back_populates="message", cascade="all, delete-orphan")
+    likes = relationship(
+        "ChatLike",
+        primaryjoin="ChatMessage.id == foreign(ChatLike.message_id)",
+        back_populates="message",
+        cascade="all, delete-orphan",
+    )
+
+    __mapper_args__ = {"primary_key": [id]}
 
 
 class ChatLike(Base):
@@ -260,10 +312,16 @@ class ChatLike(Base):
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     user_id: Mapped[int] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
-    message_id: Mapped[int] = mapped_column(ForeignKey("chat_messages.id", ondelete="CASCADE"), nullable=False)
+    # Sem FK: uma tabela particionada só aceita FKs para a PK completa
+    # (id, created_at). A limpeza é feita por trigger em chat_messages.
+    message_id: Mapped[int] = mapped_column(Integer, nullable=False)
     created_at: Mapped[datetime] = mapped_column(TIMESTAMP(timezone=True), server_default=text("now()"))
 
-    message = relationship("ChatMessage", back_populates="likes")
+    message = relationship(
+        "ChatMessage",
+        primaryjoin="ChatMessage.id == foreign(ChatLike.message_id)",
+        back_populates="likes",
+    )
 
     __table_args__ = (
         Index("ix_chat_likes_user_message_unq", "user_id", "message_id", unique=True),
@@ -271,9 +329,18 @@ class ChatLike(Base):
 
 
 Index("forum_topics_type_idx", ForumTopic.type)
+# Um tópico por filme/série (alvo do ON CONFLICT em ensure_forum_topic)
+Index(
+    "forum_topics_tmdb_media_unq",
+    ForumTopic.tmdb_id,
+    ForumTopic.media_type,
+    unique=True,
+    postgresql_where=text("tmdb_id IS NOT NULL"),
+)
 Index("forum_posts_topic_idx", ForumPost.topic_id)
 Index("forum_posts_user_idx", ForumPost.user_id)
-Index("chat_messages_topic_idx", ChatMessage.topic_id)
+# Histórico do chat: WHERE topic_id = ? ORDER BY created_at DESC LIMIT 50
+Index("chat_messages_topic_created_idx", ChatMessage.topic_id, ChatMessage.created_at.desc())
 Index("chat_messages_user_idx", ChatMessage.user_id)
 Index("chat_likes_message_idx", ChatLike.message_id)
 
@@ -308,3 +375,35 @@ class UserAchievement(Base):
     __table_args__ = (
         Index("ix_user_achievements_unq", "user_id", "achievement_id", unique=True),
     )
+
+
+# ======================
+# Estatísticas agregadas (dashboard admin)
+# ======================
+
+class PlatformStat(Base):
+    """Contadores do dashboard, recalculados periodicamente (ver services/platform_stats)."""
+    __tablename__ = "platform_stats"
+
+    nome: Mapped[str] = mapped_column(Text, primary_key=True)
+    valor: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    estimado: Mapped[bool] = mapped_column(Boolean, nullable=False, server_default=text("false"))
+    atualizado_em: Mapped[datetime] = mapped_column(TIMESTAMP(timezone=True), nullable=False, server_default=text("now()"))
+
+
+class LoginThrottle(Base):
+    """Falhas de login por chave (ip:/conta:) no modo partilhado (ver services/login_throttle)."""
+    __tablename__ = "login_throttle"
+
+    chave: Mapped[str] = mapped_column(Text, primary_key=True)
+    janela_inicio: Mapped[datetime] = mapped_column(TIMESTAMP(timezone=True), nullable=False)
+    falhas_anteriores: Mapped[int] = mapped_column(Integer, nullable=False, server_default=text("0"))
+    falhas: Mapped[int] = mapped_column(Integer, nullable=False, server_default=text("0"))
+    bloqueios: Mapped[int] = mapped_column(Integer, nullable=False, server_default=text("0"))
+    bloqueado_ate: Mapped[Optional[datetime]] = mapped_column(TIMESTAMP(timezone=True))
+    atualizado_em: Mapped[datetime] = mapped_column(TIMESTAMP(timezone=True), nullable=False, server_default=text("now()"))
+
+    __table_args__ = (Index("ix_login_throttle_atualizado_em", "atualizado_em"),)
+
+
+Index("ix_users_criado_em", User.criado_em)
@@ -0,0 +1,121 @@
+"""
+Get-or-create de filmes, séries e tópicos do fórum numa só ida à DB.
+
+`INSERT ... ON CONFLICT ... RETURNING` dentro de uma CTE, com um SELECT de
+recurso para o caso em que o conflito não atualiza nada (DO NOTHING, ou os
+metadados não mudaram). Não há janela entre o SELECT e o INSERT, por isso dois
+pedidos simultâneos já não dão unique violation nem tópicos duplicados.
+
+Os metadados só são reescritos quando alguma das colunas enviadas tem um valor
+diferente do que está na linha (`IS DISTINCT FROM`, coluna a coluna): voltar a
+gravar os mesmos dados da TMDb não gera UPDATE (nem bloat/WAL). `ensure_*`
+(ex.: marcar como visto) nunca atualiza uma linha existente.
+"""
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Type, TypeVar
+
+from sqlalchemy import and_, exists, or_, select, union_all
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import Filme, ForumTopic, Serie
+
+T = TypeVar("T")
+
+# Colunas que identificam o registo (nunca entram no UPDATE)
+_IDENTITY = {"tmdb_id"}
+# NOT NULL em filmes/series: ficam sempre no INSERT, mesmo vazias
+_REQUIRED = {"titulo", "nome"}
+
+
+async def upsert_returning(
+    session: AsyncSession,
+    model: Type[T],
+    values: Dict[str, Any],
+    conflict: Sequence[str],
+    update: Sequence[str] = (),
+    conflict_where=None,
+) -> T:
+    """
+    Insere `values` ou, em conflito nas colunas `conflict`, atualiza `update`
+    (só se algum desses valores mudou). Devolve sempre a linha, numa só query.
+    """
+    table = model.__table__
+    stmt = pg_insert(table).values(values)
+    if update:
+        stmt = stmt.on_conflict_do_update(
+            index_elements=list(conflict),
+            index_where=conflict_where,
+            set_={col: stmt.excluded[col] for col in update},
+            where=or_(*(table.c[col].is_distinct_from(stmt.excluded[col]) for col in update)),
+        )
+    else:
+        stmt = stmt.on_conflict_do_nothing(index_elements=list(conflict), index_where=conflict_where)
+    upserted = stmt.returning(*table.c).cte("upserted")
+
+    # Sem INSERT nem UPDATE a CTE fica vazia: devolve a linha que já existia
+    existing = select(*table.c).where(
+        and_(*(table.c[col] == values[col] for col in conflict)),
+        ~exists(select(upserted.c[table.primary_key.columns.keys()[0]])),
+    )
+    orm_stmt = select(model).from_statement(union_all(select(*upserted.c), existing))
+    result = await session.execute(orm_stmt, execution_options={"populate_existing": True})
+    row = result.scalar_one_or_none()
+    if row is None:
+        # Conflito com uma transação que fez commit depois do snapshot desta query
+        row = await session.scalar(
+            select(model).where(*(getattr(model, col) == values[col] for col in conflict))
+        )
+    return row
+
+
+def _split_fields(values: Dict[str, Any]) -> Tuple[Dict[str, Any], List[str]]:
+    """(valores do INSERT, colunas do UPDATE) de um payload possivelmente parcial."""
+    # Só os campos preenchidos entram no UPDATE: um payload parcial não apaga
+    # o que já existe
+    filled = {k: v for k, v in values.items() if v is not None and v != ""}
+    # ...mas o INSERT mantém as colunas NOT NULL tal como vieram (ex.: titulo "")
+    insert_values = {**{k: values[k] for k in _REQUIRED if values.get(k) is not None}, **filled}
+    return insert_values, [col for col in filled if col not in _IDENTITY]
+
+
+async def upsert_filme(session: AsyncSession, **fields: Any) -> Filme:
+    values, update = _split_fields(fields)
+    return await upsert_returning(session, Filme, values, ["tmdb_id"], update)
+
+
+async def upsert_serie(session: AsyncSession, **fields: Any) -> Serie:
+    values, update = _split_fields(fields)
+    return await upsert_returning(session, Serie, values, ["tmdb_id"], update)
+
+
+async def ensure_filme(session: AsyncSession, tmdb_id: int, titulo: str) -> Filme:
+    """Garante que o filme existe, sem tocar nos metadados se já existir."""
+    return await upsert_returning(session, Filme, {"tmdb_id": tmdb_id, "titulo": titulo}, ["tmdb_id"])
+
+
+async def ensure_serie(session: AsyncSession, tmdb_id: int, nome: str) -> Serie:
+    return await upsert_returning(session, Serie, {"tmdb_id": tmdb_id, "nome": nome}, ["tmdb_id"])
+
+
+async def ensure_forum_topic(
+    session: AsyncSession,
+    tmdb_id: int,
+    media_type: str,
+    title: str,
+    description: Optional[str] = None,
+) -> ForumTopic:
+    """Tópico único por (tmdb_id, media_type) — índice forum_topics_tmdb_media_unq."""
+    values = {
+        "type": "custom",
+        "title": title,
+        "description": description,
+        "tmdb_id": tmdb_id,
+        "media_type": media_type,
+    }
+    return await upsert_returning(
+        session,
+        ForumTopic,
+        values,
+        ["tmdb_id", "media_type"],
+        conflict_where=ForumTopic.tmdb_id.is_not(None),
+    )
@@ -1,19 +1,26 @@
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy import select, func, desc
+from fastapi import APIRouter, Depends, HTTPException, Response, status, Query
+from sqlalchemy import Text, case, cast, desc, func, or_, select, tuple_
 from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel
 from datetime import datetime
 
-from app.core.db import get_session
-from app.models import User, Filme, Serie, Comentario, Visto, Achievement
+from app.core import metrics
+from app.core.db import SessionLocal, get_session
+from app.core.principals import AuthPrincipal, invalidate_principal
+from app.core.read_routing import get_read_session
+from app.core.settings import settings
+from app.models import User, Filme, Serie, Comentario, Achievement
 from app.routers.auth import get_current_user
+from app.services.platform_stats import STATS, read_platform_stats, refresh_platform_stats
+from app.utils.http_cache import TTLCache
+from app.utils.pagination import NEXT_CURSOR_HEADER, decode_cursor, encode_cursor, set_next_cursor
 
 router = APIRouter(prefix="/admin", tags=["Admin"])
 
 # --- Dependencies ---
 
-async def get_current_admin(user: User = Depends(get_current_user)) -> User:
+async def get_current_admin(user: AuthPrincipal = Depends(get_current_user)) -> AuthPrincipal:
     if user.role != "admin":
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
@@ -29,6 +36,8 @@ class DashboardStats(BaseModel):
     total_series_watched: int
     total_comments: int
     recent_users: List[dict]
+    updated_at: Optional[datetime] = None  # quando os contadores foram calculados
+    estimated: bool = False                # algum contador veio das estimativas do planner
 
 class UserAdminRead(BaseModel):
     id: int
@@ -54,14 +63,17 @@ class CommentAdminRead(BaseModel):
 
 @router.get("/stats", response_model=DashboardStats)
 async def get_dashboard_stats(
-    session: AsyncSession = Depends(get_session),
-    _: User = Depends(get_current_admin)
+    session: AsyncSession = Depends(get_read_session),
+    _: AuthPrincipal = Depends(get_current_admin)
 ):
-    # Counts
-    total_users = await session.scalar(select(func.count(User.id)))
-    total_movies_watched = await session.scalar(select(func.count(Visto.id)).where(Visto.filme_id.is_not(None)))
-    total_series_watched = await session.scalar(select(func.count(Visto.id)).where(Visto.serie_id.is_not(None)))
-    total_comments = await session.scalar(select(func.count(Comentario.id)))
+    # Counts: lidos de platform_stats (recalculados em background)
+    stats = await read_platform_stats(session)
+    if len(stats) < len(STATS):
+        # Primeira abertura antes do job correr: calcula já, no primário. Se
+        # outro worker estiver a calcular, espera por ele e usa o resultado.
+        async with SessionLocal() as primary:
+            await refresh_platform_stats(primary, max_age=settings.platform_stats_interval or None, wait=True)
+            stats = await read_platform_stats(primary)
     
     # Recent Users
     recent_users_res = await session.execute(
@@ -78,49 +90,116 @@ async def get_dashboard_stats(
     ]
     
     return {
-        "total_users": total_users or 0,
-        "total_movies_watched": total_movies_watched or 0,
-        "total_series_watched": total_series_watched or 0,
-        "total_comments": total_comments or 0,
-        "recent_users": recent_users
+        **{nome: stats[nome].valor if nome in stats else 0 for nome in STATS},
+        "recent_users": recent_users,
+        "updated_at": min((s.atualizado_em for s in stats.values()), default=None),
+        "estimated": any(s.estimado for s in stats.values()),
     }
 
+@router.get("/metrics")
+async def get_metrics(_: AuthPrincipal = Depends(get_current_admin)):
+    """Snapshot das métricas do processo (pool da DB, ...)."""
+    return metrics.snapshot()
+
+# Resultados da pesquisa de utilizadores: o painel pesquisa a cada tecla
+USER_SEARCH_TTL = 15.0
+_user_search_cache = TTLCache(max_entries=256)
+
+
+def _escape_like(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _user_search_query(search: str, limit: int, skip: int, cursor: Optional[str]):
+    """
+    Pesquisa por username/email com os índices trigram (`col::text`):
+    substring (ILIKE) ou semelhança (`%`), prefixos exatos primeiro e depois
+    por similarity. O cursor guarda (prefixo, -score, id) da última linha.
+    """
+    username, email = cast(User.username, Text), cast(User.email, Text)
+    escaped = _escape_like(search)
+    contains, prefix = f"%{escaped}%", f"{escaped}%"
+
+    rank = case((or_(username.ilike(prefix), email.ilike(prefix)), 0), else_=1)
+    neg_score = -func.greatest(func.similarity(username, search), func.similarity(email, search))
+
+    query = (
+        select(User, rank.label("rank"), neg_score.label("neg_score"))
+        .where(or_(
+            username.ilike(contains),
+            email.ilike(contains),
+            username.op("%")(search),
+            email.op("%")(search),
+        ))
+        .order_by(rank, neg_score, User.id)
+        .limit(limit + 1)
+    )
+    if cursor:
+        last_rank, last_score, last_id = decode_cursor(cursor, (int, float, int))
+        query = query.where(tuple_(rank, neg_score, User.id) > tuple_(last_rank, last_score, last_id))
+    else:
+        query = query.offset(skip)
+    return query
+
+
+def _user_admin_read(u: User) -> UserAdminRead:
+    return UserAdminRead(
+        id=u.id,
+        username=u.username,
+        email=u.email,
+        role=u.role,
+        created_at=u.criado_em
+    )
+
+
 @router.get("/users", response_model=List[UserAdminRead])
 async def list_users(
+    response: Response,
     skip: int = 0,
-    limit: int = 50,
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
     search: Optional[str] = None,
     session: AsyncSession = Depends(get_session),
-    _: User = Depends(get_current_admin)
+    _: AuthPrincipal = Depends(get_current_admin)
 ):
-    query = select(User).offset(skip).limit(limit).order_by(User.id)
-    
+    search = (search or "").strip()
     if search:
-        query = query.where(
-            (User.username.ilike(f"%{search}%")) | 
-            (User.email.ilike(f"%{search}%"))
-        )
+        key = (search.lower(), limit, skip, cursor)
+        cached = _user_search_cache.get(key)
+        if cached is None:
+            res = await session.execute(_user_search_query(search, limit, skip, cursor))
+            rows = res.all()
+            page = rows[:limit]
+            next_cursor = (
+                encode_cursor(page[-1].rank, page[-1].neg_score, page[-1].User.id)
+                if len(rows) > limit else None
+            )
+            cached = ([_user_admin_read(row.User) for row in page], next_cursor)
+            _user_search_cache.set(key, cached, USER_SEARCH_TTL)
+        users, next_cursor = cached
+        if next_cursor:
+            response.headers[NEXT_CURSOR_HEADER] = next_cursor
+        return users
+
+    # Sem pesquisa: keyset por id; com `cursor` (de X-Next-Cursor) ignora o `skip`
+    query = select(User).order_by(User.id).limit(limit + 1)
+    if cursor:
+        (last_id,) = decode_cursor(cursor, (int,))
+        query = query.where(User.id > last_id)
+    else:
+        query = query.offset(skip)
         
     res = await session.execute(query)
-    users = res.scalars().all()
+    users = set_next_cursor(response, res.scalars().all(), limit, key=lambda u: (u.id,))
     
-    return [
-        UserAdminRead(
-            id=u.id,
-            username=u.username,
-            email=u.email,
-            role=u.role,
-            created_at=u.criado_em
-        )
-        for u in users
-    ]
+    return [_user_admin_read(u) for u in users]
 
 @router.patch("/users/{user_id}/role")
 async def update_user_role(
     user_id: int,
     payload: UserRoleUpdate,
     session: AsyncSession = Depends(get_session),
-    current_admin: User = Depends(get_current_admin)
+    current_admin: AuthPrincipal = Depends(get_current_admin)
 ):
     if user_id == current_admin.id:
          raise HTTPException(400, "Não podes alterar o teu próprio cargo.")
@@ -134,33 +213,40 @@ async def update_user_role(
         
     user.role = payload.role
     await session.commit()
+    _user_search_cache.clear()
+    invalidate_principal(user_id)
     return {"message": "Cargo atualizado com sucesso"}
 
-@router.get("/comments", response_model=List[CommentAdminRead])
-async def list_comments(
-    skip: int = 0,
-    limit: int = 50,
-    session: AsyncSession = Depends(get_session),
-    _: User = Depends(get_current_admin)
-):
+def _comments_page_query(limit: int, skip: int = 0, cursor: Optional[str] = None):
     # Join with User, Filme, Serie to get details
-    # This is a bit complex due to optional relationships, doing separate queries or careful joins
-    # For simplicity, let's fetch comments and then populate details or use joinedload if configured
-    # But our models don't have all relationships set up for eager loading easily in this direction maybe?
-    # Let's try a direct select with joins
-    
     query = (
         select(Comentario, User, Filme, Serie)
         .join(User, Comentario.user_id == User.id)
         .outerjoin(Filme, Comentario.filme_id == Filme.id)
         .outerjoin(Serie, Comentario.serie_id == Serie.id)
-        .order_by(desc(Comentario.criado_em))
-        .offset(skip)
-        .limit(limit)
+        .order_by(desc(Comentario.criado_em), desc(Comentario.id))
+        .limit(limit + 1)
     )
-    
-    res = await session.execute(query)
-    rows = res.all()
+    # Keyset por (criado_em, id) descendente, servido por ix_comentarios_criado_em_id
+    if cursor:
+        last_criado_em, last_id = decode_cursor(cursor, (datetime, int))
+        query = query.where(tuple_(Comentario.criado_em, Comentario.id) < tuple_(last_criado_em, last_id))
+    else:
+        query = query.offset(skip)
+    return query
+
+
+@router.get("/comments", response_model=List[CommentAdminRead])
+async def list_comments(
+    response: Response,
+    skip: int = 0,
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
+    session: AsyncSession = Depends(get_session),
+    _: AuthPrincipal = Depends(get_current_admin)
+):
+    res = await session.execute(_comments_page_query(limit, skip, cursor))
+    rows = set_next_cursor(response, res.all(), limit, key=lambda row: (row[0].criado_em, row[0].id))
     
     result = []
     for comment, user, movie, serie in rows:
@@ -183,7 +269,7 @@ async def list_comments(
 async def delete_comment(
     comment_id: int,
     session: AsyncSession = Depends(get_session),
-    _: User = Depends(get_current_admin)
+    _: AuthPrincipal = Depends(get_current_admin)
 ):
     comment = await session.get(Comentario, comment_id)
     if not comment:
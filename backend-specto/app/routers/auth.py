@@ -17,7 +17,16 @@ from jose import JWTError
 from fastapi.security import OAuth2PasswordRequestForm
 
 from app.core.db import get_session
-from app.core.security import hash_password, verify_password, create_access_token, decode_token
+from app.core.principals import AuthPrincipal, invalidate_principal, load_principal
+from app.core.security import (
+    PasswordHasherBusy,
+    create_access_token,
+    decode_token,
+    hash_password_async,
+    verify_and_update_password,
+    verify_dummy_password,
+)
+from app.services import login_throttle
 from app.schemas.user import AuthResponse, UserCreate, UserRead, UserUpdate
 from app.models import User
 from app.utils.avatars import build_avatar_url, delete_avatar_file, save_avatar_file
@@ -25,6 +34,15 @@ from app.utils.avatars import build_avatar_url, delete_avatar_file, save_avatar_
 router = APIRouter(prefix="/auth", tags=["Auth"])
 
 
+def _hasher_busy() -> HTTPException:
+    # Pool de bcrypt cheio: melhor recusar já do que deixar o pedido em fila
+    return HTTPException(
+        status.HTTP_503_SERVICE_UNAVAILABLE,
+        "Demasiados pedidos de autenticação. Tenta novamente.",
+        headers={"Retry-After": "1"},
+    )
+
+
 def user_to_read(user: User, request: Optional[Request] = None) -> UserRead:
     theme_value = "light" if user.theme_mode is False else "dark"
     return UserRead(
@@ -54,10 +72,15 @@ async def register(
     if res.scalar_one_or_none():
         raise HTTPException(400, "Username ou email já existe.")
 
+    try:
+        senha_hash = await hash_password_async(payload.password)
+    except PasswordHasherBusy:
+        raise _hasher_busy()
+
     user = User(
         username=payload.username,
         email=payload.email,
-        senha_hash=hash_password(payload.password),
+        senha_hash=senha_hash,
     )
     session.add(user)
     await session.commit()
@@ -76,12 +99,37 @@ async def login(
     # No OAuth2PasswordRequestForm o campo chama-se "username", mas aqui é o email
     email = form_data.username.strip()
 
+    # Chave bloqueada: responde antes de gastar um bcrypt
+    ip = login_throttle.client_ip(request)
+    wait = await login_throttle.retry_after(ip, email)
+    if wait:
+        raise HTTPException(
+            status.HTTP_429_TOO_MANY_REQUESTS,
+            "Demasiadas tentativas de login. Tenta novamente mais tarde.",
+            headers={"Retry-After": str(int(wait))},
+        )
+
     user = await session.scalar(select(User).where(User.email == email))
-    if not user or not verify_password(form_data.password, user.senha_hash):
+    valid, new_hash = False, None
+    try:
+        if user:
+            valid, new_hash = await verify_and_update_password(form_data.password, user.senha_hash)
+        else:
+            await verify_dummy_password(form_data.password)
+    except PasswordHasherBusy:
+        raise _hasher_busy()
+    if not valid:
+        await login_throttle.record_failure(ip, email)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Credenciais inválidas",
         )
+    await login_throttle.record_success(ip, email)
+
+    if new_hash:
+        # Hash com custo/esquema antigo: atualiza agora que temos a password em claro
+        user.senha_hash = new_hash
+        await session.commit()
 
     access_token = create_access_token(
         user.id,
@@ -114,17 +162,31 @@ oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 bearer_scheme = HTTPBearer(auto_error=False)
 
 
-async def get_current_user(
-    token: str = Depends(oauth2_scheme),
-    session: AsyncSession = Depends(get_session),
-) -> User:
+def _user_id_from_token(token: str) -> int:
     try:
         payload = decode_token(token)
-        user_id = int(payload.get("sub", "0"))
+        return int(payload.get("sub", "0"))
     except (JWTError, ValueError):
         raise HTTPException(401, "Token inválido ou expirado")
-    res = await session.execute(select(User).where(User.id == user_id))
-    user = res.scalar_one_or_none()
+
+
+async def get_current_user(
+    token: str = Depends(oauth2_scheme),
+    session: AsyncSession = Depends(get_session),
+) -> AuthPrincipal:
+    # Principal em cache: sem ida à DB na maioria dos pedidos
+    principal = await load_principal(session, _user_id_from_token(token))
+    if not principal:
+        raise HTTPException(401, "Utilizador não existe")
+    return principal
+
+
+async def get_current_user_model(
+    token: str = Depends(oauth2_scheme),
+    session: AsyncSession = Depends(get_session),
+) -> User:
+    """Utilizador completo (ORM) — só para as rotas que o alteram ou precisam do email/tema."""
+    user = await session.get(User, _user_id_from_token(token))
     if not user:
         raise HTTPException(401, "Utilizador não existe")
     return user
@@ -133,23 +195,20 @@ async def get_current_user(
 async def get_current_user_optional(
     credentials: Optional[HTTPAuthorizationCredentials] = Depends(bearer_scheme),
     session: AsyncSession = Depends(get_session),
-) -> Optional[User]:
+) -> Optional[AuthPrincipal]:
     if credentials is None:
         return None
 
-    token = credentials.credentials
     try:
-        payload = decode_token(token)
-        user_id = int(payload.get("sub", "0"))
-    except (JWTError, ValueError):
+        user_id = _user_id_from_token(credentials.credentials)
+    except HTTPException:
         return None
 
-    res = await session.execute(select(User).where(User.id == user_id))
-    return res.scalar_one_or_none()
+    return await load_principal(session, user_id)
 
 
 @router.post("/logout", status_code=status.HTTP_204_NO_CONTENT)
-async def logout(_: User = Depends(get_current_user)) -> None:
+async def logout(_: AuthPrincipal = Depends(get_current_user)) -> None:
     # JWT é stateless: nada a invalidar no servidor.
     return None
 
@@ -159,7 +218,7 @@ async def update_me(
     payload: UserUpdate,
     request: Request,
     session: AsyncSession = Depends(get_session),
-    user: User = Depends(get_current_user),
+    user: User = Depends(get_current_user_model),
 ) -> UserRead:
     updated = False
     avatar_to_remove: Optional[str] = None
@@ -176,7 +235,10 @@ async def update_me(
         updated = True
 
     if payload.password:
-        user.senha_hash = hash_password(payload.password)
+        try:
+            user.senha_hash = await hash_password_async(payload.password)
+        except PasswordHasherBusy:
+            raise _hasher_busy()
         updated = True
 
     if payload.remove_avatar and user.avatar_url:
@@ -206,6 +268,7 @@ async def update_me(
     session.add(user)
     await session.commit()
     await session.refresh(user)
+    invalidate_principal(user.id)
 
     if avatar_to_remove:
         delete_avatar_file(avatar_to_remove)
@@ -218,7 +281,7 @@ async def upload_avatar(
     request: Request,
     file: UploadFile = File(...),
     session: AsyncSession = Depends(get_session),
-    user: User = Depends(get_current_user),
+    user: User = Depends(get_current_user_model),
 ) -> UserRead:
     previous_avatar = user.avatar_url
     stored_path = await save_avatar_file(file, user.id)
@@ -226,6 +289,7 @@ async def upload_avatar(
     session.add(user)
     await session.commit()
     await session.refresh(user)
+    invalidate_principal(user.id)
 
     if previous_avatar and previous_avatar != stored_path:
         delete_avatar_file(previous_avatar)
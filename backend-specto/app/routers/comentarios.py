@@ -2,12 +2,16 @@ from collections import defaultdict
 from typing import Dict, List, Optional, Literal
 
 from fastapi import APIRouter, Depends, HTTPException, Request, status
-from sqlalchemy import func, select
+from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.db import get_session
+from app.core.principals import AuthPrincipal
+from app.core.read_routing import get_read_session
 from app.models import Comentario, Filme, Serie, Like, User
+from app.repositories.catalog import ensure_filme, ensure_serie
 from app.routers.auth import get_current_user, get_current_user_optional
+from app.services.likes import toggle_comment_like
 from app.schemas.comment import CommentCreate, CommentLikeResponse, CommentList, CommentOut, CommentUpdate, CommentUser
 from app.utils.avatars import build_avatar_url
 
@@ -31,21 +35,13 @@ async def _ensure_target(
     tmdb_id: int,
     titulo: Optional[str],
 ):
-    target = await _get_target(session, tipo, tmdb_id)
-    if target:
-        return target
-
     titulo_base = "Filme" if tipo == "filme" else "Série"
     titulo_final = (titulo or "").strip() or f"{titulo_base} {tmdb_id}"
 
+    # Uma só query: devolve o existente ou cria-o (sem corrida no tmdb_id)
     if tipo == "filme":
-        novo = Filme(tmdb_id=tmdb_id, titulo=titulo_final)
-    else:
-        novo = Serie(tmdb_id=tmdb_id, nome=titulo_final)
-
-    session.add(novo)
-    await session.flush()
-    return novo
+        return await ensure_filme(session, tmdb_id, titulo_final)
+    return await ensure_serie(session, tmdb_id, titulo_final)
 
 
 async def _build_comment_tree(
@@ -68,13 +64,6 @@ async def _build_comment_tree(
         avatar_url = build_avatar_url(row[2], request)
         user_map[row[0]] = CommentUser(id=row[0], username=row[1], avatar_url=avatar_url)
 
-    likes_rows = await session.execute(
-        select(Like.comentario_id, func.count(Like.id))
-        .where(Like.comentario_id.in_(comment_ids))
-        .group_by(Like.comentario_id)
-    )
-    likes_map = {row[0]: row[1] for row in likes_rows}
-
     liked_set: set[int] = set()
     if current_user_id:
         liked_rows = await session.execute(
@@ -102,7 +91,7 @@ async def _build_comment_tree(
                 id=comment.id,
                 texto=comment.texto,
                 created_at=comment.criado_em,
-                likes=likes_map.get(comment.id, 0),
+                likes=comment.likes_count,
                 liked_by_user=comment.id in liked_set,
                 user=author,
                 replies=build_branch(comment.id),
@@ -113,27 +102,28 @@ async def _build_comment_tree(
     return build_branch(None)
 
 
+def _target_comments_stmt(tipo: str, target_id: int):
+    condition = (
+        Comentario.filme_id == target_id
+        if tipo == "filme"
+        else Comentario.serie_id == target_id
+    )
+    return select(Comentario).where(condition).order_by(Comentario.criado_em.asc())
+
+
 @router.get("/{tipo}/{tmdb_id}", response_model=CommentList)
 async def listar_comentarios(
     tipo: Literal["filme", "serie"],
     tmdb_id: int,
     request: Request,
-    session: AsyncSession = Depends(get_session),
-    current_user: Optional[User] = Depends(get_current_user_optional),
+    session: AsyncSession = Depends(get_read_session),
+    current_user: Optional[AuthPrincipal] = Depends(get_current_user_optional),
 ):
     target = await _get_target(session, tipo, tmdb_id)
     if not target:
         return CommentList(comentarios=[])
 
-    condition = (
-        Comentario.filme_id == target.id
-        if tipo == "filme"
-        else Comentario.serie_id == target.id
-    )
-
-    result = await session.execute(
-        select(Comentario).where(condition).order_by(Comentario.criado_em.asc())
-    )
+    result = await session.execute(_target_comments_stmt(tipo, target.id))
     comentarios = result.scalars().all()
 
     arvore = await _build_comment_tree(
@@ -150,7 +140,7 @@ async def criar_comentario(
     payload: CommentCreate,
     request: Request,
     session: AsyncSession = Depends(get_session),
-    user: User = Depends(get_current_user),
+    user: AuthPrincipal = Depends(get_current_user),
 ):
     target = await _ensure_target(session, payload.tipo, payload.tmdb_id, payload.alvo_titulo)
 
@@ -201,32 +191,13 @@ async def criar_comentario(
 async def alternar_like(
     comentario_id: int,
     session: AsyncSession = Depends(get_session),
-    user: User = Depends(get_current_user),
+    user: AuthPrincipal = Depends(get_current_user),
 ):
     comentario = await session.get(Comentario, comentario_id)
     if not comentario:
         raise HTTPException(status_code=404, detail="Comentário não encontrado.")
 
-    result = await session.execute(
-        select(Like).where(Like.comentario_id == comentario_id, Like.user_id == user.id)
-    )
-    existente = result.scalar_one_or_none()
-
-    if existente:
-        await session.delete(existente)
-        liked = False
-    else:
-        novo_like = Like(user_id=user.id, comentario_id=comentario_id)
-        session.add(novo_like)
-        liked = True
-
-    await session.commit()
-
-    likes_result = await session.execute(
-        select(func.count(Like.id)).where(Like.comentario_id == comentario_id)
-    )
-    likes = likes_result.scalar_one()
-
+    liked, likes = await toggle_comment_like(session, comentario_id, user.id)
     return CommentLikeResponse(liked=liked, likes=likes)
 
 
@@ -236,7 +207,7 @@ async def editar_comentario(
     payload: CommentUpdate,
     request: Request,
     session: AsyncSession = Depends(get_session),
-    user: User = Depends(get_current_user),
+    user: AuthPrincipal = Depends(get_current_user),
 ):
     """Editar um comentário existente. Apenas o autor pode editar."""
     comentario = await session.get(Comentario, comentario_id)
@@ -259,12 +230,6 @@ async def editar_comentario(
         avatar_url=build_avatar_url(user.avatar_url, request),
     )
 
-    # Get likes count
-    likes_result = await session.execute(
-        select(func.count(Like.id)).where(Like.comentario_id == comentario_id)
-    )
-    likes = likes_result.scalar_one()
-
     # Check if user liked
     liked_result = await session.execute(
         select(Like).where(Like.comentario_id == comentario_id, Like.user_id == user.id)
@@ -275,7 +240,7 @@ async def editar_comentario(
         id=comentario.id,
         texto=comentario.texto,
         created_at=comentario.criado_em,
-        likes=likes,
+        likes=comentario.likes_count,
         liked_by_user=liked_by_user,
         user=comment_user,
         replies=[],
@@ -1,3 +1,4 @@
+from datetime import datetime, timedelta, timezone
 from typing import Dict, List, Optional
 
 from fastapi import APIRouter, Depends, HTTPException, WebSocket, WebSocketDisconnect, status
@@ -5,6 +6,9 @@ from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.db import get_session
+from app.core.principals import AuthPrincipal, load_principal
+from app.core.read_routing import get_read_session, pin_primary
+from app.core.settings import settings
 from app.routers.auth import get_current_user
 from app.core.security import decode_token
 from app.schemas.forum import (
@@ -18,7 +22,10 @@ from app.schemas.forum import (
     ForumTopList,
 )
 from app.models import ChatMessage, ForumPost, ForumTopic, User, ChatLike
+from app.repositories.catalog import ensure_forum_topic
 from app.services.forum_top import fetch_top_items
+from app.services import likes as likes_service
+from app.utils.conditional import CacheScope, cache_scope
 
 router = APIRouter(prefix="/forum", tags=["Forum"])
 
@@ -26,45 +33,35 @@ router = APIRouter(prefix="/forum", tags=["Forum"])
 
 
 @router.get("/top-items", response_model=ForumTopList)
-async def get_top_items():
+async def get_top_items(cache: CacheScope = Depends(cache_scope)):
     movies = await fetch_top_items("movies")
     series = await fetch_top_items("series")
+    if cache.fresh():
+        return cache.not_modified()
     return ForumTopList(movies=movies, series=series)
 
 
 @router.post("/topics/ensure", response_model=ForumTopicBase)
 async def ensure_topic(
     payload: ForumTopicCreate,
-    _: User = Depends(get_current_user),
+    _: AuthPrincipal = Depends(get_current_user),
     session: AsyncSession = Depends(get_session),
 ):
-    # Verifica se já existe tópico para este filme/série
-    query = select(ForumTopic).where(
-        ForumTopic.tmdb_id == payload.tmdb_id,
-        ForumTopic.media_type == payload.media_type
+    # Devolve o tópico deste filme/série ou cria-o, numa só query (índice único)
+    topic = await ensure_forum_topic(
+        session,
+        tmdb_id=payload.tmdb_id,
+        media_type=payload.media_type,
+        title=payload.title,
+        description=f"Discussão sobre {payload.title}",
     )
-    result = await session.execute(query)
-    topic = result.scalars().first()
-
-    if not topic:
-        # Cria novo tópico
-        topic = ForumTopic(
-            type="custom",
-            title=payload.title,
-            description=f"Discussão sobre {payload.title}",
-            tmdb_id=payload.tmdb_id,
-            media_type=payload.media_type,
-        )
-        session.add(topic)
-        await session.commit()
-        await session.refresh(topic)
-
+    await session.commit()
     return topic
 
 
 @router.get("/topics", response_model=List[ForumTopicBase])
 async def list_topics(
-    _: User = Depends(get_current_user),
+    _: AuthPrincipal = Depends(get_current_user),
     session: AsyncSession = Depends(get_session),
 ):
     # Retorna tópicos "fixos" ou recentes? Por enquanto, retorna todos ou os mais recentes
@@ -75,8 +72,8 @@ async def list_topics(
 @router.get("/topics/{topic_id}", response_model=ForumTopicDetail)
 async def topic_detail(
     topic_id: int,
-    _: User = Depends(get_current_user),
-    session: AsyncSession = Depends(get_session),
+    _: AuthPrincipal = Depends(get_current_user),
+    session: AsyncSession = Depends(get_read_session),
 ):
     topic = await session.get(ForumTopic, topic_id)
     if not topic:
@@ -119,7 +116,7 @@ async def topic_detail(
 async def create_post(
     topic_id: int,
     payload: ForumPostCreate,
-    user: User = Depends(get_current_user),
+    user: AuthPrincipal = Depends(get_current_user),
     session: AsyncSession = Depends(get_session),
 ):
     topic = await session.get(ForumTopic, topic_id)
@@ -168,7 +165,7 @@ class ChatManager:
 manager = ChatManager()
 
 
-async def _authenticate_websocket(token: str, session: AsyncSession) -> User:
+async def _authenticate_websocket(token: str, session: AsyncSession) -> AuthPrincipal:
     if not token:
         raise HTTPException(status.HTTP_401_UNAUTHORIZED, "Token ausente")
     try:
@@ -176,7 +173,7 @@ async def _authenticate_websocket(token: str, session: AsyncSession) -> User:
         user_id = int(payload.get("sub", "0"))
     except Exception:
         raise HTTPException(status.HTTP_401_UNAUTHORIZED, "Token inválido")
-    user = await session.get(User, user_id)
+    user = await load_principal(session, user_id)
     if not user:
         raise HTTPException(status.HTTP_401_UNAUTHORIZED, "Utilizador não existe")
     return user
@@ -192,6 +189,33 @@ def _extract_token_from_ws(websocket: WebSocket) -> Optional[str]:
     return None
 
 
+HISTORY_LIMIT = 50
+
+
+def _history_stmt(topic_id: int, limit: int = HISTORY_LIMIT, since: Optional[datetime] = None):
+    stmt = (
+        select(ChatMessage, User)
+        .join(User, ChatMessage.user_id == User.id)
+        .where(ChatMessage.topic_id == topic_id)
+        .order_by(ChatMessage.created_at.desc())
+        .limit(limit)
+    )
+    if since is not None:
+        # Limite literal no created_at: o planner descarta as partições antigas
+        stmt = stmt.where(ChatMessage.created_at >= since)
+    return stmt
+
+
+async def _load_history(session: AsyncSession, topic_id: int) -> list:
+    """Últimas mensagens do tópico, procurando primeiro só nas partições recentes."""
+    since = datetime.now(timezone.utc) - timedelta(days=settings.chat_history_window_days)
+    rows = (await session.execute(_history_stmt(topic_id, since=since))).all()
+    if len(rows) < HISTORY_LIMIT:
+        # Tópico calmo: completa com as restantes partições (não arquivadas)
+        rows = (await session.execute(_history_stmt(topic_id))).all()
+    return rows
+
+
 @router.websocket("/{topic_id}/ws")
 async def websocket_forum(
     websocket: WebSocket,
@@ -219,40 +243,21 @@ async def websocket_forum(
         # Vamos de join manual ou selectinload se configurado.
         # Aqui faremos algo simples: buscar mensagens e depois popular likes.
         
-        history_query = (
-            select(ChatMessage, User)
-            .join(User, ChatMessage.user_id == User.id)
-            .where(ChatMessage.topic_id == topic_id)
-            .order_by(ChatMessage.created_at.desc())
-            .limit(50)
-        )
-        history_result = await session.execute(history_query)
+        messages_data = await _load_history(session, topic_id)  # [(msg, user), ...]
         
         # Carregar likes para estas mensagens
         # Uma abordagem melhor seria carregar tudo numa query, mas vamos iterar por simplicidade agora
         # ou fazer uma query de likes IN (msg_ids)
         
-        messages_data = history_result.all() # [(msg, user), ...]
         history_payload: List[dict] = []
         
         # Coletar IDs para buscar likes em lote
         msg_ids = [m[0].id for m in messages_data]
         
-        likes_map = {}
         user_likes_map = {}
         
         if msg_ids:
-            # Contagem de likes por mensagem
-            from sqlalchemy import func
-            count_query = (
-                select(ChatLike.message_id, func.count(ChatLike.id))
-                .where(ChatLike.message_id.in_(msg_ids))
-                .group_by(ChatLike.message_id)
-            )
-            count_res = await session.execute(count_query)
-            for mid, count in count_res.all():
-                likes_map[mid] = count
-                
+            # Contagem de likes: coluna likes_count (mantida por trigger)
             # Likes do usuário atual
             user_likes_query = (
                 select(ChatLike.message_id)
@@ -270,7 +275,7 @@ async def websocket_forum(
                     "user": {"id": msg_user.id, "username": msg_user.username, "avatar_url": msg_user.avatar_url},
                     "message": msg.message,
                     "created_at": msg.created_at.isoformat(),
-                    "likes": likes_map.get(msg.id, 0),
+                    "likes": msg.likes_count,
                     "liked_by_me": user_likes_map.get(msg.id, False),
                 }
             )
@@ -307,6 +312,7 @@ async def websocket_forum(
             session.add(chat)
             await session.commit()
             await session.refresh(chat)
+            pin_primary(user.id)  # o histórico lido a seguir já inclui a mensagem
 
             outgoing = {
                 "id": chat.id,
@@ -332,7 +338,7 @@ async def websocket_forum(
 @router.post("/messages/{message_id}/like")
 async def toggle_message_like(
     message_id: int,
-    user: User = Depends(get_current_user),
+    user: AuthPrincipal = Depends(get_current_user),
     session: AsyncSession = Depends(get_session),
 ):
     # Verifica se a mensagem existe
@@ -340,31 +346,8 @@ async def toggle_message_like(
     if not msg:
         raise HTTPException(status_code=404, detail="Mensagem não encontrada")
 
-    # Verifica se já deu like
-    query = select(ChatLike).where(
-        ChatLike.user_id == user.id,
-        ChatLike.message_id == message_id
-    )
-    result = await session.execute(query)
-    existing_like = result.scalars().first()
-
-    if existing_like:
-        # Remove like
-        await session.delete(existing_like)
-        liked = False
-    else:
-        # Adiciona like
-        new_like = ChatLike(user_id=user.id, message_id=message_id)
-        session.add(new_like)
-        liked = True
-
-    await session.commit()
-    
-    # Obter contagem atualizada
-    from sqlalchemy import func
-    count_query = select(func.count(ChatLike.id)).where(ChatLike.message_id == message_id)
-    count_res = await session.execute(count_query)
-    total_likes = count_res.scalar() or 0
+    # Alterna o like e lê a contagem atualizada (coluna mantida por trigger)
+    liked, total_likes = await likes_service.toggle_message_like(session, message_id, user.id)
 
     # Broadcast da atualização para todos no tópico
     # Precisamos reconstruir o objeto da mensagem ou mandar apenas o update parcial?
@@ -0,0 +1,35 @@
+import mimetypes
+import re
+
+import httpx
+from fastapi import APIRouter, HTTPException, Response, status
+
+from app.utils.image_cache import UpstreamNotFound, get_image
+from app.utils.images import ALLOWED_SIZES
+
+router = APIRouter(prefix="/imagens", tags=["Imagens"])
+
+# Só formatos raster: um SVG servido a partir da origem da API pode correr script
+_FILENAME_RE = re.compile(r"^[A-Za-z0-9_\-]+\.(jpg|jpeg|png|webp)$")
+IMMUTABLE_CACHE = "public, max-age=31536000, immutable"
+
+
+@router.get("/{tamanho}/{ficheiro}")
+async def imagem(tamanho: str, ficheiro: str) -> Response:
+    """Serve posters/backdrops da TMDb a partir da cache em disco."""
+    if tamanho not in ALLOWED_SIZES or not _FILENAME_RE.match(ficheiro):
+        raise HTTPException(status.HTTP_404_NOT_FOUND, "Imagem não encontrada")
+
+    try:
+        data = await get_image(tamanho, ficheiro)
+    except UpstreamNotFound:
+        raise HTTPException(status.HTTP_404_NOT_FOUND, "Imagem não encontrada")
+    except httpx.HTTPError:
+        raise HTTPException(status.HTTP_502_BAD_GATEWAY, "Falha ao obter a imagem")
+
+    media_type = mimetypes.guess_type(ficheiro)[0] or "application/octet-stream"
+    return Response(
+        content=data,
+        media_type=media_type,
+        headers={"Cache-Control": IMMUTABLE_CACHE, "X-Content-Type-Options": "nosniff"},
+    )
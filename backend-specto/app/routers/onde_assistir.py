@@ -0,0 +1,45 @@
+from typing import List, Literal
+
+from fastapi import APIRouter, HTTPException, Query, status
+
+from app.services.providers import MAX_BATCH_IDS, get_providers_batch
+
+router = APIRouter(prefix="/onde-assistir", tags=["Onde assistir"])
+
+
+def _parse_ids(ids: str) -> List[int]:
+    vistos: List[int] = []
+    for parte in ids.split(","):
+        parte = parte.strip()
+        if not parte:
+            continue
+        try:
+            tmdb_id = int(parte)
+        except ValueError:
+            raise HTTPException(status.HTTP_400_BAD_REQUEST, f"ID inválido: {parte}")
+        if tmdb_id not in vistos:
+            vistos.append(tmdb_id)
+    if not vistos:
+        raise HTTPException(status.HTTP_400_BAD_REQUEST, "Indica pelo menos um ID.")
+    if len(vistos) > MAX_BATCH_IDS:
+        raise HTTPException(
+            status.HTTP_400_BAD_REQUEST,
+            f"Máximo de {MAX_BATCH_IDS} IDs por pedido.",
+        )
+    return vistos
+
+
+@router.get("")
+async def onde_assistir_lote(
+    ids: str = Query(..., description="IDs TMDb separados por vírgula"),
+    tipo: Literal["filme", "serie"] = "filme",
+    pais: str = "PT",
+):
+    """Providers de vários títulos num só pedido (badges nas listas)."""
+    media = "movie" if tipo == "filme" else "tv"
+    resultados = await get_providers_batch(media, _parse_ids(ids), pais)
+    return {
+        "tipo": tipo,
+        "pais": pais.upper(),
+        "resultados": {str(tmdb_id): projecao for tmdb_id, projecao in resultados.items()},
+    }
@@ -5,11 +5,14 @@ from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.db import get_session
+from app.core.principals import AuthPrincipal
+from app.core.read_routing import get_read_session
 from app.models import Filme, Serie, User, Visto
-from app.routers.vistos import _map_visto
+from app.routers.vistos import _map_visto, _vistos_stmt, stream_vistos
 from app.schemas.user import UserRead
 from app.schemas.visto import VistoList, VistoItem
 from app.utils.avatars import build_avatar_url
+from app.utils.streaming import ndjson_response, wants_ndjson
 from app.routers.auth import get_current_user
 
 router = APIRouter(prefix="/users", tags=["Users"])
@@ -19,7 +22,7 @@ router = APIRouter(prefix="/users", tags=["Users"])
 async def get_public_profile(
     user_id: int,
     request: Request,
-    session: AsyncSession = Depends(get_session),
+    session: AsyncSession = Depends(get_read_session),
 ):
     # 1. Buscar usuário
     query = select(User).where(User.id == user_id)
@@ -29,27 +32,7 @@ async def get_public_profile(
     if not user:
         raise HTTPException(status_code=404, detail="Utilizador não encontrado")
 
-    # 2. Buscar vistos (filmes e séries)
-    stmt = (
-        select(Visto, Filme, Serie)
-        .outerjoin(Filme, Filme.id == Visto.filme_id)
-        .outerjoin(Serie, Serie.id == Visto.serie_id)
-        .where(Visto.user_id == user.id)
-        .order_by(Visto.data_visto.desc())
-    )
-
-    vistos_res = await session.execute(stmt)
-    filmes: List[VistoItem] = []
-    series: List[VistoItem] = []
-
-    for visto, filme, serie in vistos_res.all():
-        item = _map_visto(visto, filme, serie)
-        if item.tipo == "filme":
-            filmes.append(item)
-        else:
-            series.append(item)
-
-    # 3. Calcular estatísticas
+    # 2. Calcular estatísticas
     from sqlalchemy import func
     from app.models import Comentario, Like
 
@@ -67,7 +50,7 @@ async def get_public_profile(
     count_likes_res = await session.execute(count_likes_query)
     total_likes_received = count_likes_res.scalar() or 0
 
-    # 4. Buscar conquistas
+    # 3. Buscar conquistas
     from app.models import UserAchievement, Achievement
     achievements_query = (
         select(Achievement, UserAchievement.unlocked_at)
@@ -86,8 +69,8 @@ async def get_public_profile(
         }
         for a, unlocked_at in achievements_res.all()
     ]
-    # 5. Montar resposta
-    return {
+    # 4. Montar resposta
+    header = {
         "user": {
             "id": user.id,
             "username": user.username,
@@ -97,8 +80,6 @@ async def get_public_profile(
             "level": user.level,
         },
         "stats": {
-            "total_filmes": len(filmes),
-            "total_series": len(series),
             "total_comentarios": total_comments,
             "total_likes_recebidos": total_likes_received,
         },
@@ -107,10 +88,53 @@ async def get_public_profile(
             "level": user.level,
             "achievements": achievements
         },
+    }
+
+    if wants_ndjson(request):
+        # Streaming: cabeçalho do perfil na primeira linha, depois um visto por linha.
+        totals_res = await session.execute(
+            select(
+                func.count(Visto.filme_id),
+                func.count(Visto.serie_id),
+            ).where(Visto.user_id == user.id)
+        )
+        total_filmes, total_series = totals_res.one()
+        header["stats"] = {
+            "total_filmes": total_filmes,
+            "total_series": total_series,
+            **header["stats"],
+        }
+
+        async def _linhas():
+            yield header
+            async for item in stream_vistos(session, user.id):
+                yield item
+
+        return ndjson_response(_linhas())
+
+    # 5. Buscar vistos (filmes e séries)
+    vistos_res = await session.execute(_vistos_stmt(user.id))
+    filmes: List[VistoItem] = []
+    series: List[VistoItem] = []
+
+    for visto, filme, serie in vistos_res.all():
+        item = _map_visto(visto, filme, serie)
+        if item.tipo == "filme":
+            filmes.append(item)
+        else:
+            series.append(item)
+
+    header["stats"] = {
+        "total_filmes": len(filmes),
+        "total_series": len(series),
+        **header["stats"],
+    }
+    return {
+        **header,
         "vistos": {
             "filmes": filmes,
             "series": series,
-        }
+        },
     }
 
 
@@ -118,7 +142,7 @@ async def get_public_profile(
 async def get_my_reputation(
     request: Request,
     session: AsyncSession = Depends(get_session),
-    user: User = Depends(get_current_user),
+    user: AuthPrincipal = Depends(get_current_user),
 ):
     from app.models import UserAchievement, Achievement
     achievements_query = (
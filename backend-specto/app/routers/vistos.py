@@ -3,14 +3,18 @@ from __future__ import annotations
 from datetime import date, datetime
 from typing import Optional
 
-from fastapi import APIRouter, Depends, HTTPException, Response, status
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.db import get_session
+from app.core.principals import AuthPrincipal
+from app.core.read_routing import get_read_session
 from app.models import Filme, Serie, User, Visto
+from app.repositories.catalog import upsert_filme, upsert_serie
 from app.routers.auth import get_current_user
 from app.schemas.visto import VistoCreate, VistoItem, VistoList, VistoUpdate
+from app.utils.streaming import ndjson_response, wants_ndjson
 
 router = APIRouter(prefix="/vistos", tags=["Vistos"])
 
@@ -34,81 +38,33 @@ def _parse_date(data_str: Optional[str]) -> Optional[date]:
 
 
 async def _get_or_create_filme(session: AsyncSession, payload: VistoCreate) -> Filme:
-    filme = await session.scalar(select(Filme).where(Filme.tmdb_id == payload.tmdb_id))
-    ano = _parse_year(payload.data_lancamento)
-
-    if not filme:
-        filme = Filme(
-            tmdb_id=payload.tmdb_id,
-            titulo=payload.titulo,
-            titulo_original=payload.titulo_original,
-            ano=ano,
-            descricao=payload.descricao,
-            poster_path=payload.poster_path,
-            backdrop_path=payload.backdrop_path,
-            media_avaliacao=payload.media_avaliacao,
-            votos=payload.votos,
-        )
-        session.add(filme)
-        await session.flush()
-    else:
-        if payload.titulo:
-            filme.titulo = payload.titulo
-        if payload.titulo_original:
-            filme.titulo_original = payload.titulo_original
-        if ano is not None:
-            filme.ano = ano
-        if payload.descricao:
-            filme.descricao = payload.descricao
-        if payload.poster_path:
-            filme.poster_path = payload.poster_path
-        if payload.backdrop_path:
-            filme.backdrop_path = payload.backdrop_path
-        if payload.media_avaliacao is not None:
-            filme.media_avaliacao = payload.media_avaliacao
-        if payload.votos is not None:
-            filme.votos = payload.votos
-
-    return filme
+    return await upsert_filme(
+        session,
+        tmdb_id=payload.tmdb_id,
+        titulo=payload.titulo,
+        titulo_original=payload.titulo_original,
+        ano=_parse_year(payload.data_lancamento),
+        descricao=payload.descricao,
+        poster_path=payload.poster_path,
+        backdrop_path=payload.backdrop_path,
+        media_avaliacao=payload.media_avaliacao,
+        votos=payload.votos,
+    )
 
 
 async def _get_or_create_serie(session: AsyncSession, payload: VistoCreate) -> Serie:
-    serie = await session.scalar(select(Serie).where(Serie.tmdb_id == payload.tmdb_id))
-    primeira_exibicao = _parse_date(payload.data_lancamento)
-
-    if not serie:
-        serie = Serie(
-            tmdb_id=payload.tmdb_id,
-            nome=payload.titulo,
-            nome_original=payload.titulo_original,
-            primeira_exibicao=primeira_exibicao,
-            descricao=payload.descricao,
-            poster_path=payload.poster_path,
-            backdrop_path=payload.backdrop_path,
-            media_avaliacao=payload.media_avaliacao,
-            votos=payload.votos,
-        )
-        session.add(serie)
-        await session.flush()
-    else:
-        if payload.titulo:
-            serie.nome = payload.titulo
-        if payload.titulo_original:
-            serie.nome_original = payload.titulo_original
-        if primeira_exibicao is not None:
-            serie.primeira_exibicao = primeira_exibicao
-        if payload.descricao:
-            serie.descricao = payload.descricao
-        if payload.poster_path:
-            serie.poster_path = payload.poster_path
-        if payload.backdrop_path:
-            serie.backdrop_path = payload.backdrop_path
-        if payload.media_avaliacao is not None:
-            serie.media_avaliacao = payload.media_avaliacao
-        if payload.votos is not None:
-            serie.votos = payload.votos
-
-    return serie
+    return await upsert_serie(
+        session,
+        tmdb_id=payload.tmdb_id,
+        nome=payload.titulo,
+        nome_original=payload.titulo_original,
+        primeira_exibicao=_parse_date(payload.data_lancamento),
+        descricao=payload.descricao,
+        poster_path=payload.poster_path,
+        backdrop_path=payload.backdrop_path,
+        media_avaliacao=payload.media_avaliacao,
+        votos=payload.votos,
+    )
 
 
 def _map_visto(visto: Visto, filme: Optional[Filme], serie: Optional[Serie]) -> VistoItem:
@@ -155,20 +111,33 @@ def _map_visto(visto: Visto, filme: Optional[Filme], serie: Optional[Serie]) ->
     )
 
 
-@router.get("/", response_model=VistoList)
-async def listar_vistos(
-    session: AsyncSession = Depends(get_session),
-    user: User = Depends(get_current_user),
-) -> VistoList:
-    stmt = (
+def _vistos_stmt(user_id: int):
+    return (
         select(Visto, Filme, Serie)
         .outerjoin(Filme, Filme.id == Visto.filme_id)
         .outerjoin(Serie, Serie.id == Visto.serie_id)
-        .where(Visto.user_id == user.id)
+        .where(Visto.user_id == user_id)
         .order_by(Visto.data_visto.desc())
     )
 
-    result = await session.execute(stmt)
+
+async def stream_vistos(session: AsyncSession, user_id: int):
+    """Percorre os vistos do utilizador com um cursor do servidor, item a item."""
+    result = await session.stream(_vistos_stmt(user_id))
+    async for visto, filme, serie in result:
+        yield _map_visto(visto, filme, serie)
+
+
+@router.get("/", response_model=VistoList)
+async def listar_vistos(
+    request: Request,
+    session: AsyncSession = Depends(get_read_session),
+    user: AuthPrincipal = Depends(get_current_user),
+) -> VistoList:
+    if wants_ndjson(request):
+        return ndjson_response(stream_vistos(session, user.id))
+
+    result = await session.execute(_vistos_stmt(user.id))
     filmes: list[VistoItem] = []
     series: list[VistoItem] = []
 
@@ -186,7 +155,7 @@ async def listar_vistos(
 async def criar_visto(
     payload: VistoCreate,
     session: AsyncSession = Depends(get_session),
-    user: User = Depends(get_current_user),
+    user: AuthPrincipal = Depends(get_current_user),
 ) -> VistoItem:
     if payload.tipo == "filme":
         alvo = await _get_or_create_filme(session, payload)
@@ -248,7 +217,7 @@ async def atualizar_visto(
     visto_id: int,
     payload: VistoUpdate,
     session: AsyncSession = Depends(get_session),
-    user: User = Depends(get_current_user),
+    user: AuthPrincipal = Depends(get_current_user),
 ) -> VistoItem:
     visto = await session.get(Visto, visto_id)
     if not visto or visto.user_id != user.id:
@@ -277,7 +246,7 @@ async def atualizar_visto(
 async def remover_visto(
     visto_id: int,
     session: AsyncSession = Depends(get_session),
-    user: User = Depends(get_current_user),
+    user: AuthPrincipal = Depends(get_current_user),
 ) -> Response:
     visto = await session.get(Visto, visto_id)
     if not visto or visto.user_id != user.id:
@@ -293,8 +262,7 @@ async def remover_visto(
 import asyncio
 from config import API_KEY, BASE_URL
 from app.utils.http_cache import cached_get_json
-
-IMG_BASE = "https://image.tmdb.org/t/p"
+from app.utils.images import image_url
 
 
 def _format_recommendation(item: dict, media_type: str) -> dict:
@@ -306,8 +274,8 @@ def _format_recommendation(item: dict, media_type: str) -> dict:
         "id": item["id"],
         "tipo": "filme" if media_type == "movie" else "serie",
         "titulo": item.get(title_key),
-        "poster": f"{IMG_BASE}/w500{item['poster_path']}" if item.get("poster_path") else None,
-        "backdrop": f"{IMG_BASE}/w500{item['backdrop_path']}" if item.get("backdrop_path") else None,
+        "poster": image_url(item.get("poster_path"), "grid"),
+        "backdrop": image_url(item.get("backdrop_path"), "backdrop"),
         "nota": item.get("vote_average"),
         "data_lancamento": item.get(date_key),
         "sinopse": item.get("overview", "")[:200] + "..." if item.get("overview") and len(item.get("overview", "")) > 200 else item.get("overview"),
@@ -327,7 +295,7 @@ async def _fetch_tmdb_recommendations(tmdb_id: int, media_type: str) -> list:
 @router.get("/recomendacoes")
 async def get_recomendacoes(
     session: AsyncSession = Depends(get_session),
-    user: User = Depends(get_current_user),
+    user: AuthPrincipal = Depends(get_current_user),
 ):
     """
     Retorna recomendações personalizadas baseadas nos filmes e séries que o utilizador viu.
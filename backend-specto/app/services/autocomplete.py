@@ -0,0 +1,236 @@
+"""
+Autocomplete da pesquisa servido por um índice de prefixos em memória.
+
+O índice é um array ordenado de chaves normalizadas (sem acentos, casefold)
+consultado com `bisect`, alimentado por:
+  - títulos das listas TMDb que estão na cache HTTP;
+  - linhas locais de `filmes`/`series` (incremental, por id);
+  - pesquisas populares registadas por `catalog_search`.
+
+A atualização é incremental e corre em background; a consulta nunca toca na DB.
+"""
+import asyncio
+import heapq
+import logging
+import math
+import time
+from bisect import bisect_left
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import select
+
+from app.core.db import SessionLocal
+from app.models import Filme, Serie
+from app.services.catalog_search import popular_queries
+from app.utils.http_cache import cached_items
+from app.utils.text import fold
+
+logger = logging.getLogger(__name__)
+
+REFRESH_INTERVAL = 30.0   # segundos entre atualizações incrementais
+LOCAL_BATCH = 5000        # linhas de filmes/series lidas por atualização
+MAX_SUFFIX_WORDS = 4      # indexa também o título a partir das primeiras palavras
+SHORT_PREFIX_LEN = 2      # prefixos curtos usam listas pré-calculadas
+SHORT_PREFIX_TOP = 20
+MAX_SCAN = 2000           # limite de candidatos percorridos por consulta
+
+EntryKey = Tuple[str, object]  # ("filme", tmdb_id) | ("serie", tmdb_id) | ("pesquisa", texto)
+IndexKey = Tuple[str, int, EntryKey]  # (chave normalizada, é início do título, entrada)
+
+
+@dataclass
+class Suggestion:
+    tipo: str
+    id: Optional[int]
+    titulo: str
+    peso: float
+
+    def as_dict(self) -> dict:
+        return {"id": self.id, "tipo": self.tipo, "titulo": self.titulo}
+
+
+def _index_keys(titulo: str) -> List[Tuple[str, int]]:
+    folded = fold(titulo)
+    if not folded:
+        return []
+    keys = [(folded, 1)]
+    words = folded.split(" ")
+    for i in range(1, min(len(words), MAX_SUFFIX_WORDS + 1)):
+        if len(words[i]) >= 2:
+            keys.append((" ".join(words[i:]), 0))
+    return keys
+
+
+class PrefixIndex:
+    def __init__(self) -> None:
+        self._keys: List[IndexKey] = []
+        self._entries: Dict[EntryKey, Suggestion] = {}
+        self._pending: List[IndexKey] = []
+        self._short: Dict[str, List[EntryKey]] = {}
+        self._dirty = False
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def add(self, entry_key: EntryKey, tipo: str, tmdb_id: Optional[int], titulo: str, peso: float) -> None:
+        existente = self._entries.get(entry_key)
+        if existente:
+            if peso > existente.peso:
+                existente.peso = peso
+                self._dirty = True
+            return
+        self._entries[entry_key] = Suggestion(tipo=tipo, id=tmdb_id, titulo=titulo, peso=peso)
+        self._dirty = True
+        for key, is_start in _index_keys(titulo):
+            self._pending.append((key, is_start, entry_key))
+
+    def flush(self) -> None:
+        """Junta as chaves pendentes ao array ordenado e recalcula os prefixos curtos."""
+        if not self._dirty:
+            return
+        self._dirty = False
+        keys = self._keys
+        if self._pending:
+            pending, self._pending = self._pending, []
+            pending.sort()
+            keys = list(heapq.merge(keys, pending))
+
+        melhores: Dict[str, List[Tuple[float, EntryKey]]] = {}
+        for key, is_start, entry_key in keys:
+            score = self._score(entry_key, is_start)
+            for n in range(1, min(len(key), SHORT_PREFIX_LEN) + 1):
+                bucket = melhores.setdefault(key[:n], [])
+                if len(bucket) < SHORT_PREFIX_TOP:
+                    heapq.heappush(bucket, (score, entry_key))
+                elif score > bucket[0][0]:
+                    heapq.heapreplace(bucket, (score, entry_key))
+        short: Dict[str, List[EntryKey]] = {}
+        for prefix, bucket in melhores.items():
+            ordered: List[EntryKey] = []
+            for _, entry_key in sorted(bucket, reverse=True):
+                if entry_key not in ordered:
+                    ordered.append(entry_key)
+            short[prefix] = ordered
+        self._keys, self._short = keys, short
+
+    def _score(self, entry_key: EntryKey, is_start: int) -> float:
+        peso = self._entries[entry_key].peso
+        return peso if is_start else peso * 0.5
+
+    def lookup(self, prefix: str, limit: int = 8) -> List[Suggestion]:
+        p = fold(prefix)
+        if not p:
+            return []
+
+        if len(p) <= SHORT_PREFIX_LEN:
+            return [self._entries[k] for k in self._short.get(p, [])[:limit]]
+
+        keys = self._keys
+        i = bisect_left(keys, (p,))
+        candidatos: Dict[EntryKey, float] = {}
+        end = min(len(keys), i + MAX_SCAN)
+        while i < end and keys[i][0].startswith(p):
+            _, is_start, entry_key = keys[i]
+            score = self._score(entry_key, is_start)
+            if score > candidatos.get(entry_key, -1.0):
+                candidatos[entry_key] = score
+            i += 1
+
+        top = heapq.nlargest(limit, candidatos.items(), key=lambda item: item[1])
+        return [self._entries[entry_key] for entry_key, _ in top]
+
+
+def _weight(votos: Optional[float]) -> float:
+    return 1.0 + math.log1p(max(votos or 0, 0))
+
+
+class AutocompleteService:
+    def __init__(self) -> None:
+        self.index = PrefixIndex()
+        self._seen_urls: Dict[str, float] = {}
+        self._filme_watermark = 0
+        self._serie_watermark = 0
+        self._last_refresh = 0.0
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    def _ingest_http_cache(self) -> None:
+        for url, expires, data in cached_items():
+            if self._seen_urls.get(url) == expires:
+                continue
+            self._seen_urls[url] = expires
+            if not isinstance(data, dict):
+                continue
+            for item in data.get("results") or []:
+                if not isinstance(item, dict) or not item.get("id"):
+                    continue
+                media_type = item.get("media_type")
+                if media_type == "person":
+                    continue
+                if item.get("title") or media_type == "movie":
+                    tipo, titulo = "filme", item.get("title")
+                else:
+                    tipo, titulo = "serie", item.get("name")
+                if titulo:
+                    peso = _weight(item.get("vote_count"))
+                    self.index.add((tipo, item["id"]), tipo, item["id"], titulo, peso)
+
+        # Entradas expiradas deixam de existir na cache HTTP
+        validas = {url for url, _, _ in cached_items()}
+        for url in list(self._seen_urls):
+            if url not in validas:
+                self._seen_urls.pop(url, None)
+
+    async def _ingest_local(self) -> None:
+        async with SessionLocal() as session:
+            filmes = await session.execute(
+                select(Filme.id, Filme.tmdb_id, Filme.titulo, Filme.votos)
+                .where(Filme.id > self._filme_watermark)
+                .order_by(Filme.id)
+                .limit(LOCAL_BATCH)
+            )
+            for row_id, tmdb_id, titulo, votos in filmes.all():
+                self.index.add(("filme", tmdb_id), "filme", tmdb_id, titulo, _weight(votos))
+                self._filme_watermark = row_id
+
+            series = await session.execute(
+                select(Serie.id, Serie.tmdb_id, Serie.nome, Serie.votos)
+                .where(Serie.id > self._serie_watermark)
+                .order_by(Serie.id)
+                .limit(LOCAL_BATCH)
+            )
+            for row_id, tmdb_id, nome, votos in series.all():
+                self.index.add(("serie", tmdb_id), "serie", tmdb_id, nome, _weight(votos))
+                self._serie_watermark = row_id
+
+    def _ingest_popular(self) -> None:
+        for query, hits in popular_queries():
+            self.index.add(("pesquisa", query), "pesquisa", None, query, 2.0 * hits)
+
+    async def refresh(self) -> None:
+        async with self._lock:
+            self._ingest_http_cache()
+            self._ingest_popular()
+            try:
+                await self._ingest_local()
+            except Exception as exc:
+                logger.warning("Autocomplete: falha ao ler o catálogo local: %s", exc)
+            # Ordenar/recalcular é CPU puro: fora do event loop, trocado atomicamente no fim
+            await asyncio.to_thread(self.index.flush)
+            self._last_refresh = time.monotonic()
+
+    async def ensure_fresh(self) -> None:
+        """Na primeira chamada constrói o índice; depois atualiza em background."""
+        if not self._last_refresh:
+            await self.refresh()
+            return
+        stale = time.monotonic() - self._last_refresh > REFRESH_INTERVAL
+        if stale and (self._task is None or self._task.done()):
+            self._task = asyncio.create_task(self.refresh())
+
+    def lookup(self, prefix: str, limit: int = 8) -> List[dict]:
+        return [s.as_dict() for s in self.index.lookup(prefix, limit)]
+
+
+autocomplete = AutocompleteService()
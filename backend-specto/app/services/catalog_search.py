@@ -0,0 +1,443 @@
+"""
+Pesquisa híbrida do catálogo.
+
+Primeiro consulta as tabelas locais (`filmes`/`series`, via índices pg_trgm, e a
+cache de géneros `tmdb_cached_filmes`). Se a confiança for alta responde logo;
+caso contrário junta os resultados da TMDb. As pesquisas populares ficam
+persistidas localmente para passarem a ser servidas só pelo Postgres.
+
+Os resultados são devolvidos no formato "cru" da TMDb (title/name, poster_path,
+vote_average...), para que cada rota aplique o seu próprio `formatar_lista`.
+"""
+import asyncio
+import logging
+import math
+import re
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from difflib import SequenceMatcher
+from typing import Dict, List, Literal, Optional, Tuple
+from urllib.parse import quote
+
+from sqlalchemy import Text, func, literal_column, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import Filme, Serie, TmdbCachedFilme
+from app.utils.http_cache import cached_get_json
+from app.utils.text import fold
+from config import API_KEY, BASE_URL
+
+logger = logging.getLogger(__name__)
+
+Tipo = Literal["filme", "serie"]
+
+# URLs de imagem guardadas em cache: .../<tamanho>/<ficheiro> (TMDb ou proxy /imagens)
+_IMG_PATH_RE = re.compile(r"/(?:w\d+|original)(/[^/]+)$")
+
+MAX_RESULTS = 20
+HIGH_CONFIDENCE = 0.6      # similarity() mínima do melhor resultado local
+MIN_LOCAL_RESULTS = 5      # nº mínimo de resultados locais para dispensar a TMDb
+POPULAR_QUERY_HITS = 3     # a partir de quantas pesquisas a query é "popular"
+MAX_TRACKED_QUERIES = 5000
+SOURCE_BUDGET = 1.5        # segundos por fonte remota na pesquisa federada
+
+_query_hits: Counter = Counter()
+_persisted_queries: set = set()
+
+
+def normalize_query(query: str) -> str:
+    return " ".join(query.split()).lower()
+
+
+def record_query(tipo: Tipo, query: str) -> int:
+    """Conta a pesquisa e devolve o total de vezes que já foi feita neste processo."""
+    key = (tipo, normalize_query(query))
+    _query_hits[key] += 1
+    if len(_query_hits) > MAX_TRACKED_QUERIES:
+        mais_comuns = _query_hits.most_common(MAX_TRACKED_QUERIES // 2)
+        _query_hits.clear()
+        _query_hits.update(dict(mais_comuns))
+    return _query_hits[key]
+
+
+def popular_queries(limit: int = 100) -> List[Tuple[str, int]]:
+    """Pesquisas mais frequentes (somando filmes e séries), com o respetivo total."""
+    totais: Counter = Counter()
+    for (_, query), hits in _query_hits.items():
+        totais[query] += hits
+    return [
+        (query, hits)
+        for query, hits in totais.most_common(limit)
+        if hits >= POPULAR_QUERY_HITS
+    ]
+
+
+def _strip_img(url: Optional[str]) -> Optional[str]:
+    if not url:
+        return None
+    match = _IMG_PATH_RE.search(url)
+    return match.group(1) if match else None
+
+
+def _filme_to_raw(filme: Filme) -> dict:
+    return {
+        "id": filme.tmdb_id,
+        "title": filme.titulo,
+        "original_title": filme.titulo_original,
+        "overview": filme.descricao,
+        "poster_path": filme.poster_path,
+        "backdrop_path": filme.backdrop_path,
+        "genre_ids": [],
+        "release_date": str(filme.ano) if filme.ano else None,
+        "vote_average": float(filme.media_avaliacao) if filme.media_avaliacao is not None else None,
+        "vote_count": filme.votos,
+    }
+
+
+def _serie_to_raw(serie: Serie) -> dict:
+    return {
+        "id": serie.tmdb_id,
+        "name": serie.nome,
+        "original_name": serie.nome_original,
+        "overview": serie.descricao,
+        "poster_path": serie.poster_path,
+        "backdrop_path": serie.backdrop_path,
+        "genre_ids": [],
+        "first_air_date": serie.primeira_exibicao.isoformat() if serie.primeira_exibicao else None,
+        "vote_average": float(serie.media_avaliacao) if serie.media_avaliacao is not None else None,
+        "vote_count": serie.votos,
+    }
+
+
+def _cached_payload_to_raw(payload: dict) -> dict:
+    """Converte uma entrada de `tmdb_cached_filmes` (já formatada) de volta ao formato TMDb."""
+    return {
+        "id": payload.get("id"),
+        "title": payload.get("titulo"),
+        "original_title": payload.get("titulo_original"),
+        "overview": payload.get("sinopse"),
+        "poster_path": _strip_img(payload.get("poster")),
+        "backdrop_path": _strip_img(payload.get("backdrop")),
+        "genre_ids": payload.get("generos_ids", []),
+        "release_date": payload.get("data_lancamento"),
+        "vote_average": payload.get("nota"),
+        "adult": payload.get("adulto", False),
+    }
+
+
+async def search_local(
+    session: AsyncSession,
+    tipo: Tipo,
+    query: str,
+    limit: int = MAX_RESULTS,
+) -> List[Tuple[float, dict]]:
+    """Pesquisa por semelhança (pg_trgm) nas tabelas locais, ordenada por score."""
+    if tipo == "filme":
+        score = func.similarity(Filme.titulo, query).label("score")
+        stmt = (
+            select(Filme, score)
+            .where(Filme.titulo.op("%")(query))
+            .order_by(score.desc())
+            .limit(limit)
+        )
+        rows = (await session.execute(stmt)).all()
+        encontrados: Dict[int, Tuple[float, dict]] = {
+            filme.tmdb_id: (float(s), _filme_to_raw(filme)) for filme, s in rows
+        }
+
+        # A cache de géneros já guarda muitos títulos populares. O mesmo filme
+        # aparece uma vez por género: DISTINCT ON antes do LIMIT, senão os
+        # duplicados ocupavam os lugares de outros títulos.
+        # Chave literal (não parâmetro): só assim a expressão coincide com a
+        # do índice tmdb_cache_titulo_trgm num prepared statement
+        titulo_cache = TmdbCachedFilme.payload.op("->>", return_type=Text)(literal_column("'titulo'"))
+        unicos = (
+            select(
+                TmdbCachedFilme.payload,
+                func.similarity(titulo_cache, query).label("score"),
+            )
+            .where(titulo_cache.op("%")(query))
+            .distinct(TmdbCachedFilme.tmdb_id)
+            .order_by(TmdbCachedFilme.tmdb_id, TmdbCachedFilme.cached_em.desc())
+            .subquery()
+        )
+        cache_stmt = (
+            select(unicos.c.payload, unicos.c.score)
+            .order_by(unicos.c.score.desc())
+            .limit(limit)
+        )
+        for payload, s in (await session.execute(cache_stmt)).all():
+            tmdb_id = payload.get("id")
+            if tmdb_id is None or tmdb_id in encontrados:
+                continue
+            encontrados[tmdb_id] = (float(s), _cached_payload_to_raw(payload))
+    else:
+        score = func.similarity(Serie.nome, query).label("score")
+        stmt = (
+            select(Serie, score)
+            .where(Serie.nome.op("%")(query))
+            .order_by(score.desc())
+            .limit(limit)
+        )
+        rows = (await session.execute(stmt)).all()
+        encontrados = {serie.tmdb_id: (float(s), _serie_to_raw(serie)) for serie, s in rows}
+
+    resultados = sorted(encontrados.values(), key=lambda item: item[0], reverse=True)
+    return resultados[:limit]
+
+
+def tmdb_search_url(tipo: Tipo, query: str, language: str) -> str:
+    resource = "movie" if tipo == "filme" else "tv"
+    return (
+        f"{BASE_URL}/search/{resource}?api_key={API_KEY}"
+        f"&language={language}&query={quote(query)}"
+    )
+
+
+def _parse_ano(data_str: Optional[str]) -> Optional[int]:
+    try:
+        return int(data_str[:4]) if data_str else None
+    except ValueError:
+        return None
+
+
+def _parse_data(data_str: Optional[str]) -> Optional[date]:
+    try:
+        return datetime.strptime(data_str, "%Y-%m-%d").date() if data_str else None
+    except ValueError:
+        return None
+
+
+async def _persist_results(session: AsyncSession, tipo: Tipo, resultados: List[dict]) -> None:
+    """Guarda os resultados da TMDb em filmes/series (sem reescrever linhas existentes)."""
+    if tipo == "filme":
+        rows = [
+            {
+                "tmdb_id": r["id"],
+                "titulo": r["title"],
+                "titulo_original": r.get("original_title"),
+                "ano": _parse_ano(r.get("release_date")),
+                "descricao": r.get("overview") or None,
+                "poster_path": r.get("poster_path"),
+                "backdrop_path": r.get("backdrop_path"),
+                "media_avaliacao": r.get("vote_average"),
+                "votos": r.get("vote_count"),
+            }
+            for r in resultados
+            if r.get("id") and r.get("title")
+        ]
+        model = Filme
+    else:
+        rows = [
+            {
+                "tmdb_id": r["id"],
+                "nome": r["name"],
+                "nome_original": r.get("original_name"),
+                "primeira_exibicao": _parse_data(r.get("first_air_date")),
+                "descricao": r.get("overview") or None,
+                "poster_path": r.get("poster_path"),
+                "backdrop_path": r.get("backdrop_path"),
+                "media_avaliacao": r.get("vote_average"),
+                "votos": r.get("vote_count"),
+            }
+            for r in resultados
+            if r.get("id") and r.get("name")
+        ]
+        model = Serie
+
+    if not rows:
+        return
+
+    stmt = pg_insert(model).values(rows).on_conflict_do_nothing(index_elements=[model.tmdb_id])
+    await session.execute(stmt)
+    await session.commit()
+
+
+def _merge(local: List[Tuple[float, dict]], remote: List[dict], limit: int) -> List[dict]:
+    """Resultados locais muito parecidos primeiro, depois a ordem de relevância da TMDb."""
+    vistos: set = set()
+    resultados: List[dict] = []
+
+    for score, raw in local:
+        if score >= HIGH_CONFIDENCE and raw["id"] not in vistos:
+            vistos.add(raw["id"])
+            resultados.append(raw)
+    for raw in remote:
+        if raw.get("id") not in vistos:
+            vistos.add(raw.get("id"))
+            resultados.append(raw)
+    for _, raw in local:
+        if raw["id"] not in vistos:
+            vistos.add(raw["id"])
+            resultados.append(raw)
+
+    return resultados[:limit]
+
+
+def _is_confident(local: List[Tuple[float, dict]], query_key: tuple) -> bool:
+    if len(local) < MIN_LOCAL_RESULTS:
+        return False
+    return query_key in _persisted_queries or local[0][0] >= HIGH_CONFIDENCE
+
+
+def _start_remote(tipo: Tipo, query: str, language: str) -> asyncio.Task:
+    task = asyncio.create_task(cached_get_json(tmdb_search_url(tipo, query, language)))
+    # Evita avisos de "exception never retrieved" quando o resultado é descartado.
+    task.add_done_callback(lambda t: t.cancelled() or t.exception())
+    return task
+
+
+@dataclass
+class _Pesquisa:
+    tipo: Tipo
+    query: str
+    language: str
+    key: tuple
+    hits: int
+    remote: Optional[asyncio.Task] = None
+    local: List[Tuple[float, dict]] = field(default_factory=list)
+
+    def cancel(self) -> None:
+        if self.remote:
+            self.remote.cancel()
+
+
+def _begin(tipo: Tipo, query: str, language: str) -> _Pesquisa:
+    key = (tipo, normalize_query(query))
+    pesquisa = _Pesquisa(tipo=tipo, query=query, language=language, key=key, hits=record_query(tipo, query))
+    if key not in _persisted_queries:
+        # Em paralelo com a query local, para não somar as latências.
+        pesquisa.remote = _start_remote(tipo, query, language)
+    return pesquisa
+
+
+async def _finish(
+    session: AsyncSession,
+    pesquisa: _Pesquisa,
+    deadline: Optional[float] = None,
+) -> List[dict]:
+    """Resultados da TMDb para completar a pesquisa (lista vazia se não forem precisos)."""
+    if _is_confident(pesquisa.local, pesquisa.key):
+        pesquisa.cancel()
+        return []
+
+    if pesquisa.remote is None:
+        pesquisa.remote = _start_remote(pesquisa.tipo, pesquisa.query, pesquisa.language)
+
+    try:
+        if deadline is None:
+            dados = await pesquisa.remote
+        else:
+            # shield: se a fonte estourar o orçamento continua em background e aquece a cache
+            restante = max(deadline - asyncio.get_running_loop().time(), 0.0)
+            dados = await asyncio.wait_for(asyncio.shield(pesquisa.remote), timeout=restante)
+    except asyncio.TimeoutError:
+        logger.info("Pesquisa TMDb (%s) excedeu o orçamento para %r", pesquisa.tipo, pesquisa.query)
+        return []
+    except Exception as exc:
+        logger.warning("Pesquisa TMDb falhou para %r (%s): %s", pesquisa.query, pesquisa.tipo, exc)
+        return []
+
+    remote = dados.get("results", [])
+    if pesquisa.hits >= POPULAR_QUERY_HITS and remote:
+        try:
+            await _persist_results(session, pesquisa.tipo, remote)
+            _persisted_queries.add(pesquisa.key)
+        except Exception as exc:  # pragma: no cover - a pesquisa não deve falhar por isto
+            await session.rollback()
+            logger.warning("Falha ao persistir resultados de %r: %s", pesquisa.query, exc)
+    return remote
+
+
+async def search_catalog(
+    session: AsyncSession,
+    tipo: Tipo,
+    query: str,
+    language: str = "pt-PT",
+    limit: int = MAX_RESULTS,
+) -> List[dict]:
+    """Pesquisa local primeiro; a TMDb só entra quando a confiança local é baixa."""
+    query = query.strip()
+    if not query:
+        return []
+
+    pesquisa = _begin(tipo, query, language)
+    try:
+        pesquisa.local = await search_local(session, tipo, query, limit)
+    except BaseException:
+        pesquisa.cancel()
+        raise
+
+    remote = await _finish(session, pesquisa)
+    if not remote:
+        return [raw for _, raw in pesquisa.local]
+    return _merge(pesquisa.local, remote, limit)
+
+
+def _rank_score(query: str, raw: dict, posicao: int, local_score: Optional[float]) -> float:
+    """Relevância textual (dominante) + popularidade, com leve penalização pela posição."""
+    titulo = fold(raw.get("title") or raw.get("name") or "")
+    q = fold(query)
+    if not titulo or not q:
+        relevancia = 0.0
+    elif titulo == q:
+        relevancia = 1.0
+    elif titulo.startswith(q):
+        relevancia = 0.9
+    elif f" {q}" in f" {titulo}":
+        relevancia = 0.8
+    else:
+        relevancia = 0.7 * SequenceMatcher(None, q, titulo).ratio()
+    if local_score is not None:
+        relevancia = max(relevancia, local_score)
+
+    popularidade = min(math.log1p(raw.get("vote_count") or 0) / math.log1p(20000), 1.0)
+    return 0.75 * relevancia + 0.25 * popularidade - 0.005 * posicao
+
+
+async def federated_search(
+    session: AsyncSession,
+    query: str,
+    language: str = "pt-BR",
+    limit: int = MAX_RESULTS,
+    budget: float = SOURCE_BUDGET,
+) -> Dict[str, list]:
+    """
+    Pesquisa filmes e séries em simultâneo: os dois pedidos à TMDb arrancam logo,
+    cada um com `budget` segundos, enquanto o Postgres responde. Devolve as listas
+    por tipo e `resultados`, uma lista única ordenada de pares (tipo, item).
+    """
+    query = query.strip()
+    if not query:
+        return {"filmes": [], "series": [], "resultados": []}
+
+    deadline = asyncio.get_running_loop().time() + budget
+    pesquisas = [_begin("filme", query, language), _begin("serie", query, language)]
+    try:
+        for pesquisa in pesquisas:
+            pesquisa.local = await search_local(session, pesquisa.tipo, query, limit)
+    except BaseException:
+        for pesquisa in pesquisas:
+            pesquisa.cancel()
+        raise
+
+    por_tipo: Dict[str, List[dict]] = {}
+    ranked: List[Tuple[float, str, dict]] = []
+    for pesquisa in pesquisas:
+        remote = await _finish(session, pesquisa, deadline)
+        raws = _merge(pesquisa.local, remote, limit) if remote else [raw for _, raw in pesquisa.local]
+        por_tipo[pesquisa.tipo] = raws
+
+        local_scores = {raw["id"]: score for score, raw in pesquisa.local}
+        for posicao, raw in enumerate(raws):
+            score = _rank_score(query, raw, posicao, local_scores.get(raw.get("id")))
+            ranked.append((score, pesquisa.tipo, raw))
+
+    ranked.sort(key=lambda item: item[0], reverse=True)
+    return {
+        "filmes": por_tipo["filme"],
+        "series": por_tipo["serie"],
+        "resultados": [(tipo, raw) for _, tipo, raw in ranked[:limit]],
+    }
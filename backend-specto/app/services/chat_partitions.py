@@ -0,0 +1,284 @@
+"""
+Manutenção das partições mensais de `chat_messages`.
+
+- Garante que existem partições para o mês atual e os `CHAT_PARTITIONS_AHEAD`
+  seguintes (não há partição DEFAULT: uma mensagem fora de qualquer intervalo
+  falharia, por isso o job corre no arranque e depois periodicamente).
+- Arquiva as partições mais antigas que `CHAT_RETENTION_MONTHS`: são
+  desanexadas de `chat_messages` (DETACH ... CONCURRENTLY, sem bloquear o chat),
+  renomeadas para `chat_messages_archive_AAAA_MM` e anexadas a
+  `chat_messages_archive`; com `CHAT_ARCHIVE_TABLESPACE` são também movidas
+  para esse tablespace (ex.: disco mais barato).
+- Antes disso termina arquivamentos que ficaram a meio (DETACH pendente ou
+  tabela solta depois de uma falha), para nenhuma partição se perder.
+
+Corre numa ligação direta dedicada (DATABASE_DIRECT_URL atrás de um pooler em
+modo transação); sem ela, faz tudo numa transação com DETACH bloqueante.
+
+O histórico do chat e os índices passam a cobrir só os meses recentes.
+"""
+import asyncio
+import logging
+import re
+from datetime import datetime, timezone
+from typing import List, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection, create_async_engine
+
+from app.core.db import engine, engine_kwargs
+from app.core.settings import settings
+
+logger = logging.getLogger(__name__)
+
+PARENT = "chat_messages"
+ARCHIVE = "chat_messages_archive"
+
+# Lock de sessão: um só worker faz a manutenção de cada vez. Corre numa ligação
+# direta dedicada (ver `maintain_chat_partitions`), nunca através do pooler.
+_LOCK_KEY = 0x5E7A_0044
+
+
+def _partition_re(parent: str) -> "re.Pattern[str]":
+    return re.compile(rf"^{parent}_(\d{{4}})_(\d{{2}})$")
+
+
+def month_start(when: datetime) -> datetime:
+    return when.astimezone(timezone.utc).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def add_months(month: datetime, n: int) -> datetime:
+    total = month.year * 12 + month.month - 1 + n
+    return month.replace(year=total // 12, month=total % 12 + 1)
+
+
+def partition_name(month: datetime, prefix: str = PARENT) -> str:
+    return f"{prefix}_{month:%Y_%m}"
+
+
+def _bounds(month: datetime) -> str:
+    return f"FOR VALUES FROM ('{month.isoformat()}') TO ('{add_months(month, 1).isoformat()}')"
+
+
+def _parse_month(name: str, parent: str) -> Optional[datetime]:
+    match = _partition_re(parent).match(name)
+    if not match:
+        return None
+    return datetime(int(match.group(1)), int(match.group(2)), 1, tzinfo=timezone.utc)
+
+
+async def list_partitions(conn: AsyncConnection, parent: str = PARENT) -> List[Tuple[str, datetime]]:
+    """(nome, mês) das partições atuais de `parent`, por ordem (sem as que estão a ser desanexadas)."""
+    rows = await conn.execute(
+        text(
+            """
+            SELECT c.relname
+            FROM pg_inherits i
+            JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = to_regclass(:parent) AND NOT i.inhdetachpending
+            """
+        ),
+        {"parent": parent},
+    )
+    partitions = []
+    for (name,) in rows:
+        month = _parse_month(name, parent)
+        if month:
+            partitions.append((name, month))
+    return sorted(partitions, key=lambda p: p[1])
+
+
+async def ensure_partition_range(conn: AsyncConnection, start: datetime, end: datetime) -> List[str]:
+    """Cria as partições em falta para todos os meses entre `start` e `end` (inclusive)."""
+    existing = {name for name, _ in await list_partitions(conn)}
+    created = []
+    month, last = month_start(start), month_start(end)
+    while month <= last:
+        name = partition_name(month)
+        if name not in existing:
+            await conn.execute(text(f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {PARENT} {_bounds(month)}"))
+            created.append(name)
+        month = add_months(month, 1)
+    return created
+
+
+async def ensure_partitions(conn: AsyncConnection, now: Optional[datetime] = None) -> List[str]:
+    """Cria as partições em falta até `CHAT_PARTITIONS_AHEAD` meses à frente."""
+    current = month_start(now or datetime.now(timezone.utc))
+    return await ensure_partition_range(conn, current, add_months(current, settings.chat_partitions_ahead))
+
+
+def _retention_cutoff(now: Optional[datetime]) -> Optional[datetime]:
+    if settings.chat_retention_months <= 0:
+        return None
+    return add_months(month_start(now or datetime.now(timezone.utc)), -settings.chat_retention_months)
+
+
+async def _move_to_archive(conn: AsyncConnection, name: str, month: datetime) -> str:
+    """Partição já desanexada de `chat_messages` -> `chat_messages_archive_AAAA_MM`."""
+    archive_name = partition_name(month, ARCHIVE)
+    if name != archive_name:
+        await conn.execute(text(f"ALTER TABLE {name} RENAME TO {archive_name}"))
+    if settings.chat_archive_tablespace:
+        await conn.execute(text(f'ALTER TABLE {archive_name} SET TABLESPACE "{settings.chat_archive_tablespace}"'))
+    await conn.execute(text(f"ALTER TABLE {ARCHIVE} ATTACH PARTITION {archive_name} {_bounds(month)}"))
+    return archive_name
+
+
+async def recover_partitions(conn: AsyncConnection, now: Optional[datetime] = None, concurrently: bool = True) -> List[str]:
+    """
+    Termina arquivamentos interrompidos a meio:
+    - DETACH ... CONCURRENTLY interrompido deixa a partição "detach pending"
+      (continua em pg_inherits): completa-se com DETACH ... FINALIZE;
+    - falha no RENAME/SET TABLESPACE/ATTACH deixa uma tabela solta, fora dos
+      dois pais: volta a `chat_messages` se ainda está dentro da retenção, senão
+      segue para `chat_messages_archive`.
+    Corre antes de criar partições: uma tabela solta com o nome de um mês
+    recente faria o CREATE TABLE IF NOT EXISTS não criar nada.
+    """
+    pending = await conn.execute(
+        text(
+            """
+            SELECT c.relname
+            FROM pg_inherits i
+            JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = to_regclass(:parent) AND i.inhdetachpending
+            """
+        ),
+        {"parent": PARENT},
+    )
+    for (name,) in pending.all():
+        if not concurrently:
+            # FINALIZE não pode correr dentro de uma transação
+            logger.warning("Partição %s com DETACH pendente; precisa de DATABASE_DIRECT_URL para terminar", name)
+            continue
+        await conn.execute(text(f"ALTER TABLE {PARENT} DETACH PARTITION {name} FINALIZE"))
+
+    orphans = await conn.execute(
+        text(
+            r"""
+            SELECT c.relname
+            FROM pg_class c
+            WHERE c.relkind = 'r'
+              AND NOT c.relispartition
+              AND c.relnamespace = current_schema()::regnamespace
+              AND c.relname LIKE 'chat\_messages\_%'
+            """
+        )
+    )
+    cutoff = _retention_cutoff(now)
+    recovered = []
+    for (name,) in orphans.all():
+        if month := _parse_month(name, ARCHIVE):
+            await _move_to_archive(conn, name, month)
+        elif month := _parse_month(name, PARENT):
+            if cutoff is not None and month < cutoff:
+                await _move_to_archive(conn, name, month)
+            else:
+                await conn.execute(text(f"ALTER TABLE {PARENT} ATTACH PARTITION {name} {_bounds(month)}"))
+        else:
+            continue
+        recovered.append(name)
+        logger.warning("Partição solta %s recuperada", name)
+    return recovered
+
+
+async def archive_old_partitions(
+    conn: AsyncConnection, now: Optional[datetime] = None, concurrently: bool = True
+) -> List[str]:
+    """Move as partições anteriores à retenção para `chat_messages_archive`."""
+    cutoff = _retention_cutoff(now)
+    if cutoff is None:
+        return []
+    archived = []
+    for name, month in await list_partitions(conn):
+        if month >= cutoff:
+            break
+        # CONCURRENTLY não pode correr dentro de uma transação: a ligação está em autocommit
+        mode = " CONCURRENTLY" if concurrently else ""
+        await conn.execute(text(f"ALTER TABLE {PARENT} DETACH PARTITION {name}{mode}"))
+        archived.append(await _move_to_archive(conn, name, month))
+        logger.info("Partição %s arquivada como %s", name, archived[-1])
+    return archived
+
+
+def _direct_url() -> Optional[str]:
+    """URL de uma ligação de sessão real ao Postgres (None atrás de um pooler em modo transação)."""
+    if settings.database_direct_url:
+        return settings.database_direct_url
+    if settings.db_pooler_mode == "transaction":
+        return None
+    return settings.database_url
+
+
+async def _maintain_direct(url: str, now: Optional[datetime]) -> dict:
+    # Ligação dedicada e sem pool: o lock de sessão e o unlock vão sempre ao
+    # mesmo backend, e fechar a ligação liberta o lock mesmo que algo falhe.
+    maintenance_engine = create_async_engine(url, **engine_kwargs(url, pooler_mode="direct", null_pool=True))
+    try:
+        async with maintenance_engine.connect() as conn:
+            conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+            got_lock = await conn.scalar(text("SELECT pg_try_advisory_lock(:key)"), {"key": _LOCK_KEY})
+            if not got_lock:
+                return {"created": [], "archived": [], "recovered": [], "skipped": True}
+            try:
+                recovered = await recover_partitions(conn, now)
+                created = await ensure_partitions(conn, now)
+                archived = await archive_old_partitions(conn, now)
+            finally:
+                await conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": _LOCK_KEY})
+    finally:
+        await maintenance_engine.dispose()
+    return {"created": created, "archived": archived, "recovered": recovered, "skipped": False}
+
+
+async def _maintain_in_transaction(now: Optional[datetime]) -> dict:
+    # Atrás de PgBouncer (modo transação) sem DATABASE_DIRECT_URL: tudo numa só
+    # transação, com lock de transação e DETACH sem CONCURRENTLY (bloqueia o
+    # chat durante o detach).
+    async with engine.begin() as conn:
+        got_lock = await conn.scalar(text("SELECT pg_try_advisory_xact_lock(:key)"), {"key": _LOCK_KEY})
+        if not got_lock:
+            return {"created": [], "archived": [], "recovered": [], "skipped": True}
+        recovered = await recover_partitions(conn, now, concurrently=False)
+        created = await ensure_partitions(conn, now)
+        archived = await archive_old_partitions(conn, now, concurrently=False)
+    return {"created": created, "archived": archived, "recovered": recovered, "skipped": False}
+
+
+async def maintain_chat_partitions(now: Optional[datetime] = None) -> dict:
+    """Recupera arquivamentos interrompidos, cria as partições futuras e arquiva as antigas."""
+    url = _direct_url()
+    if url is None:
+        return await _maintain_in_transaction(now)
+    return await _maintain_direct(url, now)
+
+
+# ----------------- Job em background -----------------
+_task: Optional[asyncio.Task] = None
+
+
+async def _maintenance_loop(interval: float) -> None:
+    while True:
+        try:
+            await maintain_chat_partitions()
+        except Exception as exc:
+            logger.warning("Falha na manutenção das partições do chat: %s", exc)
+        await asyncio.sleep(interval)
+
+
+def start_chat_partition_job() -> None:
+    global _task
+    if settings.chat_partition_interval > 0 and _task is None:
+        _task = asyncio.create_task(_maintenance_loop(settings.chat_partition_interval))
+
+
+async def stop_chat_partition_job() -> None:
+    global _task
+    if _task is not None:
+        _task.cancel()
+        try:
+            await _task
+        except asyncio.CancelledError:
+            pass
+        _task = None
@@ -0,0 +1,106 @@
+"""
+Cache de detalhes por secção.
+
+Um único pedido `/{media}/{id}?append_to_response=credits,reviews,videos` é
+partido em entradas independentes (`detalhes`, `credits`, `reviews`, `videos`),
+cada uma com o seu TTL. As rotas de sub-recursos (`/reviews`, `/videos`,
+`/elenco`) leem a secção correspondente e só vão à TMDb se ela não existir.
+O bloco `images` só é pedido e guardado quando alguém o pede explicitamente.
+"""
+import asyncio
+from typing import Dict, Iterable, Literal, Tuple
+
+from app.utils.http_cache import TTLCache, fetch_json
+from app.utils.images import image_url
+from config import API_KEY, BASE_URL
+
+Media = Literal["movie", "tv"]
+
+SECTION_TTLS: Dict[str, float] = {
+    "detalhes": 600.0,
+    "credits": 3600.0,
+    "reviews": 900.0,
+    "videos": 1800.0,
+    "images": 3600.0,
+}
+DEFAULT_SECTIONS: Tuple[str, ...] = ("credits", "reviews", "videos")
+
+_sections = TTLCache(max_entries=8192)
+
+
+def _key(media: Media, tmdb_id: int, language: str, section: str) -> tuple:
+    return (media, tmdb_id, language, section)
+
+
+def _store(media: Media, tmdb_id: int, language: str, section: str, data: dict) -> None:
+    _sections.set(_key(media, tmdb_id, language, section), data, SECTION_TTLS[section])
+
+
+def _image_params(sections: Iterable[str]) -> str:
+    # Sem isto, language=pt-* filtra quase todas as imagens
+    return "&include_image_language=pt,null" if "images" in sections else ""
+
+
+async def _fetch_bundle(media: Media, tmdb_id: int, language: str, sections: Tuple[str, ...]) -> dict:
+    """Uma chamada à TMDb que preenche a base e todas as secções pedidas."""
+    url = (
+        f"{BASE_URL}/{media}/{tmdb_id}?api_key={API_KEY}&language={language}"
+        f"&append_to_response={','.join(sections)}{_image_params(sections)}"
+    )
+    dados = await fetch_json(url)
+    base = {k: v for k, v in dados.items() if k not in SECTION_TTLS}
+    _store(media, tmdb_id, language, "detalhes", base)
+    for section in sections:
+        _store(media, tmdb_id, language, section, dados.get(section) or {})
+    return dados
+
+
+async def _fetch_section(media: Media, tmdb_id: int, language: str, section: str) -> dict:
+    page = "&page=1" if section == "reviews" else ""
+    url = (
+        f"{BASE_URL}/{media}/{tmdb_id}/{section}?api_key={API_KEY}"
+        f"&language={language}{page}{_image_params((section,))}"
+    )
+    dados = await fetch_json(url)
+    _store(media, tmdb_id, language, section, dados)
+    return dados
+
+
+async def get_details(
+    media: Media,
+    tmdb_id: int,
+    language: str,
+    include_images: bool = False,
+) -> dict:
+    """Payload de detalhes (com as secções anexadas) montado a partir da cache."""
+    wanted = DEFAULT_SECTIONS + (("images",) if include_images else ())
+    base = _sections.get(_key(media, tmdb_id, language, "detalhes"))
+    cached = {s: _sections.get(_key(media, tmdb_id, language, s)) for s in wanted}
+
+    if base is None:
+        return await _fetch_bundle(media, tmdb_id, language, wanted)
+
+    missing = [s for s, data in cached.items() if data is None]
+    if missing:
+        fetched = await asyncio.gather(
+            *(_fetch_section(media, tmdb_id, language, s) for s in missing)
+        )
+        cached.update(zip(missing, fetched))
+
+    return {**base, **cached}
+
+
+async def get_section(media: Media, tmdb_id: int, language: str, section: str) -> dict:
+    """Uma secção (credits/reviews/videos/images); vem da cache dos detalhes quando possível."""
+    cached = _sections.get(_key(media, tmdb_id, language, section))
+    if cached is not None:
+        return cached
+    return await _fetch_section(media, tmdb_id, language, section)
+
+
+def formatar_imagens(images: dict, limite: int = 10) -> dict:
+    """Formata o bloco `images` (só presente quando pedido)."""
+    return {
+        tipo: [image_url(img["file_path"], "backdrop_large") for img in images.get(tipo, [])[:limite] if img.get("file_path")]
+        for tipo in ("posters", "backdrops")
+    }
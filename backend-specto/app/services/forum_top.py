@@ -4,6 +4,7 @@ from typing import List
 
 from app.schemas.forum import ForumTopItem
 from app.utils.http_cache import cached_get_json
+from app.utils.images import image_url
 from config import API_KEY, BASE_URL
 
 
@@ -32,11 +33,7 @@ async def fetch_top_items(topic_type: str) -> List[ForumTopItem]:
             ForumTopItem(
                 id=raw.get("id"),
                 title=raw.get("title") or raw.get("name") or "Título desconhecido",
-                poster_url=(
-                    f"https://image.tmdb.org/t/p/w500{raw['poster_path']}"
-                    if raw.get("poster_path")
-                    else None
-                ),
+                poster_url=image_url(raw.get("poster_path"), "grid"),
                 rating=raw.get("vote_average"),
             )
         )
@@ -1,6 +1,7 @@
 from sqlalchemy.orm import Session
 from sqlalchemy import select, func
 from app.models import User, Achievement, UserAchievement, Visto, Comentario
+from app.core.principals import invalidate_principal
 from datetime import datetime
 
 class GamificationService:
@@ -46,6 +47,7 @@ class GamificationService:
             
         await db.commit()
         await db.refresh(user)
+        invalidate_principal(user_id)
         return user
 
     @staticmethod
@@ -0,0 +1,51 @@
+"""
+Likes em comentários e mensagens do chat.
+
+O contador (`likes_count`) é mantido por trigger na mesma transação do
+INSERT/DELETE do like, por isso ler a contagem é ler uma coluna. O toggle é
+atómico: apaga o like do utilizador se existir (DELETE ... RETURNING), senão
+insere-o (ON CONFLICT DO NOTHING protege contra dois pedidos simultâneos).
+"""
+from typing import Tuple, Type
+
+from sqlalchemy import delete, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import ChatLike, ChatMessage, Comentario, Like
+
+
+async def _toggle(
+    session: AsyncSession,
+    like_model: Type,
+    target_model: Type,
+    fk_name: str,
+    target_id: int,
+    user_id: int,
+) -> Tuple[bool, int]:
+    fk = getattr(like_model, fk_name)
+    removido = await session.scalar(
+        delete(like_model)
+        .where(fk == target_id, like_model.user_id == user_id)
+        .returning(like_model.id)
+    )
+    if removido is None:
+        await session.execute(
+            pg_insert(like_model)
+            .values({fk_name: target_id, "user_id": user_id})
+            .on_conflict_do_nothing(index_elements=["user_id", fk_name])
+        )
+
+    likes = await session.scalar(select(target_model.likes_count).where(target_model.id == target_id))
+    await session.commit()
+    return removido is None, likes or 0
+
+
+async def toggle_comment_like(session: AsyncSession, comentario_id: int, user_id: int) -> Tuple[bool, int]:
+    """Alterna o like do utilizador; devolve (liked, total de likes)."""
+    return await _toggle(session, Like, Comentario, "comentario_id", comentario_id, user_id)
+
+
+async def toggle_message_like(session: AsyncSession, message_id: int, user_id: int) -> Tuple[bool, int]:
+    """Alterna o like do utilizador numa mensagem do chat; devolve (liked, total)."""
+    return await _toggle(session, ChatLike, ChatMessage, "message_id", message_id, user_id)
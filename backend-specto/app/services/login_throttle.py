@@ -0,0 +1,297 @@
+"""
+Limitação de tentativas de login (proteção do CPU gasto em bcrypt).
+
+As falhas são contadas por IP e por conta (email) numa janela deslizante
+(contador de duas janelas fixas ponderado). Quando uma chave passa o limite
+fica bloqueada `LOGIN_LOCKOUT_BASE * 2^(n-1)` segundos, até `LOGIN_LOCKOUT_MAX`;
+o n volta a zero depois de um período igual ao máximo sem bloqueios. O
+bloqueio é verificado antes do hash, por isso um ataque de credential stuffing
+deixa de custar um bcrypt por pedido.
+
+Um login com sucesso limpa a chave da conta, mas não a do IP (senão bastava
+ao atacante entrar na sua própria conta para recomeçar).
+
+`LOGIN_THROTTLE_BACKEND`: "memory" (por processo), "postgres" (estado
+partilhado entre workers na tabela login_throttle) ou "off".
+"""
+import asyncio
+import logging
+import math
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+from fastapi import Request
+from sqlalchemy import delete, func, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from app.core import metrics
+from app.core.db import SessionLocal
+from app.core.settings import settings
+from app.models import LoginThrottle
+
+logger = logging.getLogger(__name__)
+
+_stats: Dict[str, int] = {
+    "checks": 0,
+    "throttled": 0,
+    "failures": 0,
+    "successes": 0,
+    "lockouts_ip": 0,
+    "lockouts_conta": 0,
+    "backend_errors": 0,
+}
+
+
+def client_ip(request: Request) -> str:
+    """IP do cliente; atrás de `TRUSTED_PROXY_HOPS` proxies usa o X-Forwarded-For."""
+    hops = settings.trusted_proxy_hops
+    forwarded = request.headers.get("x-forwarded-for")
+    if hops > 0 and forwarded:
+        # Só as entradas acrescentadas pelos nossos proxies são de confiança
+        chain = [part.strip() for part in forwarded.split(",") if part.strip()]
+        if chain:
+            return chain[-min(hops, len(chain))]
+    return request.client.host if request.client else "desconhecido"
+
+
+def _keys(ip: str, email: str) -> Dict[str, str]:
+    return {"ip": f"ip:{ip}", "conta": f"conta:{email.strip().lower()}"}
+
+
+def _limit(scope: str) -> int:
+    return settings.login_throttle_ip_limit if scope == "ip" else settings.login_throttle_account_limit
+
+
+@dataclass
+class _Window:
+    """Estado de uma chave; tempos em segundos desde a epoch."""
+
+    janela_inicio: float
+    falhas_anteriores: int = 0
+    falhas: int = 0
+    bloqueios: int = 0
+    bloqueado_ate: float = 0.0
+
+    def _roll(self, now: float) -> None:
+        window = settings.login_throttle_window
+        elapsed = now - self.janela_inicio
+        if elapsed >= 2 * window:
+            self.janela_inicio, self.falhas_anteriores, self.falhas = now, 0, 0
+        elif elapsed >= window:
+            self.janela_inicio += window
+            self.falhas_anteriores, self.falhas = self.falhas, 0
+
+    def fail(self, now: float, limit: int) -> float:
+        """Regista uma falha; devolve a duração do bloqueio aplicado (0 = nenhum)."""
+        if self.bloqueios and now - self.bloqueado_ate > settings.login_lockout_max:
+            self.bloqueios = 0
+        self._roll(now)
+        self.falhas += 1
+        weight = 1 - (now - self.janela_inicio) / settings.login_throttle_window
+        if self.falhas_anteriores * weight + self.falhas < limit:
+            return 0.0
+        self.bloqueios += 1
+        lockout = min(settings.login_lockout_base * 2 ** (self.bloqueios - 1), settings.login_lockout_max)
+        self.bloqueado_ate = now + lockout
+        # Depois do bloqueio recomeça a contar
+        self.falhas_anteriores, self.falhas = 0, 0
+        return lockout
+
+
+# ----------------- Backend em memória -----------------
+class MemoryBackend:
+    def __init__(self) -> None:
+        self._windows: "OrderedDict[str, _Window]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._windows)
+
+    async def locked_for(self, keys: List[str], now: float) -> float:
+        until = max((w.bloqueado_ate for k in keys if (w := self._windows.get(k))), default=0.0)
+        return max(0.0, until - now)
+
+    async def fail(self, keys: Dict[str, str], now: float) -> Dict[str, float]:
+        lockouts = {}
+        for scope, key in keys.items():
+            window = self._windows.get(key) or _Window(janela_inicio=now)
+            self._windows[key] = window
+            self._windows.move_to_end(key)
+            lockouts[scope] = window.fail(now, _limit(scope))
+        while len(self._windows) > settings.login_throttle_max_keys:
+            self._windows.popitem(last=False)
+        return lockouts
+
+    async def reset(self, key: str) -> None:
+        self._windows.pop(key, None)
+
+    async def prune(self, now: float) -> int:
+        horizon = now - 2 * settings.login_throttle_window - settings.login_lockout_max
+        stale = [k for k, w in self._windows.items() if max(w.janela_inicio, w.bloqueado_ate) < horizon]
+        for key in stale:
+            del self._windows[key]
+        return len(stale)
+
+
+# ----------------- Backend partilhado (Postgres) -----------------
+def _ts(seconds: float) -> datetime:
+    return datetime.fromtimestamp(seconds, tz=timezone.utc)
+
+
+class PostgresBackend:
+    async def locked_for(self, keys: List[str], now: float) -> float:
+        async with SessionLocal() as session:
+            until = await session.scalar(
+                select(func.max(LoginThrottle.bloqueado_ate)).where(LoginThrottle.chave.in_(keys))
+            )
+        return max(0.0, until.timestamp() - now) if until else 0.0
+
+    async def fail(self, keys: Dict[str, str], now: float) -> Dict[str, float]:
+        lockouts = {}
+        async with SessionLocal() as session:
+            await session.execute(
+                pg_insert(LoginThrottle)
+                .values([{"chave": key, "janela_inicio": _ts(now)} for key in sorted(keys.values())])
+                .on_conflict_do_nothing(index_elements=["chave"])
+            )
+            # FOR UPDATE por ordem da chave: workers concorrentes não entram em deadlock
+            rows = await session.scalars(
+                select(LoginThrottle)
+                .where(LoginThrottle.chave.in_(list(keys.values())))
+                .order_by(LoginThrottle.chave)
+                .with_for_update()
+            )
+            by_key = {row.chave: row for row in rows}
+            for scope, key in keys.items():
+                row = by_key[key]
+                window = _Window(
+                    janela_inicio=row.janela_inicio.timestamp(),
+                    falhas_anteriores=row.falhas_anteriores,
+                    falhas=row.falhas,
+                    bloqueios=row.bloqueios,
+                    bloqueado_ate=row.bloqueado_ate.timestamp() if row.bloqueado_ate else 0.0,
+                )
+                lockouts[scope] = window.fail(now, _limit(scope))
+                row.janela_inicio = _ts(window.janela_inicio)
+                row.falhas_anteriores = window.falhas_anteriores
+                row.falhas = window.falhas
+                row.bloqueios = window.bloqueios
+                row.bloqueado_ate = _ts(window.bloqueado_ate) if window.bloqueado_ate else None
+                row.atualizado_em = _ts(now)
+            await session.commit()
+        return lockouts
+
+    async def reset(self, key: str) -> None:
+        async with SessionLocal() as session:
+            await session.execute(delete(LoginThrottle).where(LoginThrottle.chave == key))
+            await session.commit()
+
+    async def prune(self, now: float) -> int:
+        horizon = now - 2 * settings.login_throttle_window - settings.login_lockout_max
+        async with SessionLocal() as session:
+            result = await session.execute(
+                delete(LoginThrottle).where(
+                    LoginThrottle.atualizado_em < _ts(horizon),
+                    func.coalesce(LoginThrottle.bloqueado_ate, LoginThrottle.atualizado_em) < _ts(now),
+                )
+            )
+            await session.commit()
+        return result.rowcount or 0
+
+
+_backend: Optional[object] = (
+    PostgresBackend() if settings.login_throttle_backend == "postgres"
+    else None if settings.login_throttle_backend == "off"
+    else MemoryBackend()
+)
+
+
+# ----------------- API usada pelo login -----------------
+async def retry_after(ip: str, email: str) -> float:
+    """Segundos até o IP/conta poderem tentar de novo (0 = pode tentar já)."""
+    if _backend is None:
+        return 0.0
+    _stats["checks"] += 1
+    try:
+        wait = await _backend.locked_for(list(_keys(ip, email).values()), time.time())
+    except Exception as exc:
+        # Sem estado partilhado não bloqueamos ninguém: o pool de bcrypt continua limitado
+        _stats["backend_errors"] += 1
+        logger.warning("Login throttle indisponível: %s", exc)
+        return 0.0
+    if wait > 0:
+        _stats["throttled"] += 1
+    return math.ceil(wait)
+
+
+async def record_failure(ip: str, email: str) -> None:
+    if _backend is None:
+        return
+    _stats["failures"] += 1
+    try:
+        lockouts = await _backend.fail(_keys(ip, email), time.time())
+    except Exception as exc:
+        _stats["backend_errors"] += 1
+        logger.warning("Login throttle indisponível: %s", exc)
+        return
+    for scope, seconds in lockouts.items():
+        if seconds:
+            _stats[f"lockouts_{scope}"] += 1
+            logger.info("Login bloqueado por %.0fs (%s)", seconds, scope)
+
+
+async def record_success(ip: str, email: str) -> None:
+    if _backend is None:
+        return
+    _stats["successes"] += 1
+    try:
+        await _backend.reset(_keys(ip, email)["conta"])
+    except Exception as exc:
+        _stats["backend_errors"] += 1
+        logger.warning("Login throttle indisponível: %s", exc)
+
+
+def throttle_metrics() -> dict:
+    return {
+        "backend": settings.login_throttle_backend,
+        **_stats,
+        **({"keys": len(_backend)} if isinstance(_backend, MemoryBackend) else {}),
+    }
+
+
+metrics.register("login_throttle", throttle_metrics)
+
+
+# ----------------- Job em background -----------------
+PRUNE_INTERVAL = 600.0
+_task: Optional[asyncio.Task] = None
+
+
+async def _prune_loop(interval: float) -> None:
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            removed = await _backend.prune(time.time())
+            if removed:
+                logger.info("Login throttle: %d chaves inativas removidas", removed)
+        except Exception as exc:
+            logger.warning("Falha na limpeza do login throttle: %s", exc)
+
+
+def start_login_throttle_job() -> None:
+    global _task
+    if _backend is not None and _task is None:
+        _task = asyncio.create_task(_prune_loop(PRUNE_INTERVAL))
+
+
+async def stop_login_throttle_job() -> None:
+    global _task
+    if _task is not None:
+        _task.cancel()
+        try:
+            await _task
+        except asyncio.CancelledError:
+            pass
+        _task = None
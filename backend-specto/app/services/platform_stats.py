@@ -0,0 +1,173 @@
+"""
+Contadores do dashboard admin (`platform_stats`).
+
+Em vez de quatro COUNT(*) por cada abertura do dashboard, um job em background
+recalcula os valores a cada `PLATFORM_STATS_INTERVAL` segundos e guarda-os numa
+tabela pequena; o endpoint só lê essa tabela (com a data da última atualização).
+Com vários workers só um recalcula em cada intervalo: os outros veem que os
+valores ainda estão frescos e não fazem nada.
+
+Para tabelas muito grandes (`PLATFORM_STATS_ESTIMATES`, ligado por omissão) usa-se a
+estimativa do planner: `pg_class.reltuples` e, para contagens filtradas por
+`coluna IS NOT NULL`, `pg_stats.null_frac` — valores de ANALYZE, sem scan.
+"""
+import asyncio
+import logging
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import func, select, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.db import SessionLocal
+from app.core.settings import settings
+from app.models import Comentario, PlatformStat, User, Visto
+
+logger = logging.getLogger(__name__)
+
+# Evita que vários workers recalculem ao mesmo tempo (lock de transação)
+_REFRESH_LOCK_KEY = 0x5E7A_0041
+
+
+@dataclass(frozen=True)
+class StatDef:
+    table: str
+    not_null: Optional[str]  # coluna filtrada com IS NOT NULL (None = tabela toda)
+    exact: object            # select(...) exato
+
+
+STATS: Dict[str, StatDef] = {
+    "total_users": StatDef("users", None, select(func.count(User.id))),
+    "total_movies_watched": StatDef(
+        "vistos", "filme_id", select(func.count(Visto.id)).where(Visto.filme_id.is_not(None))
+    ),
+    "total_series_watched": StatDef(
+        "vistos", "serie_id", select(func.count(Visto.id)).where(Visto.serie_id.is_not(None))
+    ),
+    "total_comments": StatDef("comentarios", None, select(func.count(Comentario.id))),
+}
+
+_ESTIMATE_SQL = text(
+    """
+    SELECT c.reltuples::bigint AS linhas, s.null_frac
+    FROM pg_class c
+    LEFT JOIN pg_stats s
+        ON s.schemaname = current_schema() AND s.tablename = c.relname AND s.attname = :coluna
+    WHERE c.oid = to_regclass(:tabela)
+    """
+)
+
+
+async def _estimate(session: AsyncSession, stat: StatDef) -> Optional[int]:
+    row = (await session.execute(_ESTIMATE_SQL, {"tabela": stat.table, "coluna": stat.not_null or ""})).first()
+    if row is None or row.linhas is None or row.linhas < settings.platform_stats_estimate_min_rows:
+        return None  # tabela pequena ou nunca analisada (-1): conta exata
+    if stat.not_null is None:
+        return int(row.linhas)
+    if row.null_frac is None:
+        return None
+    return int(row.linhas * (1.0 - row.null_frac))
+
+
+async def compute_stats(session: AsyncSession) -> Dict[str, Tuple[int, bool]]:
+    """{nome: (valor, estimado)}"""
+    valores: Dict[str, Tuple[int, bool]] = {}
+    for nome, stat in STATS.items():
+        valor = await _estimate(session, stat) if settings.platform_stats_estimates else None
+        if valor is not None:
+            valores[nome] = (valor, True)
+        else:
+            valores[nome] = ((await session.scalar(stat.exact)) or 0, False)
+    return valores
+
+
+async def _is_fresh(session: AsyncSession, max_age: float) -> bool:
+    total, oldest = (
+        await session.execute(select(func.count(), func.min(PlatformStat.atualizado_em)))
+    ).one()
+    if total < len(STATS) or oldest is None:
+        return False
+    return (datetime.now(timezone.utc) - oldest).total_seconds() < max_age
+
+
+async def refresh_platform_stats(
+    session: AsyncSession,
+    max_age: Optional[float] = None,
+    wait: bool = False,
+) -> bool:
+    """
+    Recalcula e grava os contadores; devolve True se recalculou.
+
+    Com `max_age`, não faz nada se todos os contadores forem mais recentes (o
+    teste é feito já com o lock, por isso N workers fazem um só cálculo por
+    intervalo). Sem `wait`, desiste se outro worker tiver o lock; com `wait`,
+    espera por ele e normalmente encontra os valores acabados de gravar.
+    """
+    if wait:
+        await session.execute(select(func.pg_advisory_xact_lock(_REFRESH_LOCK_KEY)))
+    elif not await session.scalar(select(func.pg_try_advisory_xact_lock(_REFRESH_LOCK_KEY))):
+        await session.rollback()
+        return False
+
+    if max_age is not None and await _is_fresh(session, max_age):
+        await session.rollback()
+        return False
+
+    valores = await compute_stats(session)
+    agora = datetime.now(timezone.utc)
+    stmt = pg_insert(PlatformStat).values(
+        [
+            {"nome": nome, "valor": valor, "estimado": estimado, "atualizado_em": agora}
+            for nome, (valor, estimado) in valores.items()
+        ]
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[PlatformStat.nome],
+        set_={
+            "valor": stmt.excluded.valor,
+            "estimado": stmt.excluded.estimado,
+            "atualizado_em": stmt.excluded.atualizado_em,
+        },
+    )
+    await session.execute(stmt)
+    await session.commit()
+    return True
+
+
+async def read_platform_stats(session: AsyncSession) -> Dict[str, PlatformStat]:
+    rows = (await session.scalars(select(PlatformStat))).all()
+    return {row.nome: row for row in rows}
+
+
+# ----------------- Job em background -----------------
+_task: Optional[asyncio.Task] = None
+
+
+async def _refresh_loop(interval: float) -> None:
+    while True:
+        try:
+            async with SessionLocal() as session:
+                # Margem para o atraso dos sleeps: o worker seguinte não repete o cálculo
+                await refresh_platform_stats(session, max_age=interval * 0.9)
+        except Exception as exc:
+            logger.warning("Falha ao atualizar platform_stats: %s", exc)
+        await asyncio.sleep(interval)
+
+
+def start_platform_stats_job() -> None:
+    global _task
+    if settings.platform_stats_interval > 0 and _task is None:
+        _task = asyncio.create_task(_refresh_loop(settings.platform_stats_interval))
+
+
+async def stop_platform_stats_job() -> None:
+    global _task
+    if _task is not None:
+        _task.cancel()
+        try:
+            await _task
+        except asyncio.CancelledError:
+            pass
+        _task = None
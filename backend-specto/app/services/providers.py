@@ -0,0 +1,52 @@
+"""
+Onde assistir: cache da projeção por país dos watch providers da TMDb.
+
+A TMDb devolve sempre os providers de todos os países; aqui guardamos apenas a
+fatia do país pedido, e o lote resolve vários títulos com concorrência limitada.
+"""
+import asyncio
+import logging
+from typing import Dict, Iterable, Literal
+
+from app.utils.http_cache import TTLCache, fetch_json
+from config import API_KEY, BASE_URL
+
+logger = logging.getLogger(__name__)
+
+Media = Literal["movie", "tv"]
+
+PROVIDERS_TTL = 6 * 3600.0
+BATCH_CONCURRENCY = 8
+MAX_BATCH_IDS = 60
+
+_providers = TTLCache(max_entries=16384)
+
+
+async def get_providers(media: Media, tmdb_id: int, pais: str = "PT") -> dict:
+    """Providers (link, flatrate, rent, buy...) de um título num país."""
+    pais = pais.upper()
+    key = (media, tmdb_id, pais)
+    cached = _providers.get(key)
+    if cached is not None:
+        return cached
+
+    dados = await fetch_json(f"{BASE_URL}/{media}/{tmdb_id}/watch/providers?api_key={API_KEY}")
+    projecao = dados.get("results", {}).get(pais, {})
+    _providers.set(key, projecao, PROVIDERS_TTL)
+    return projecao
+
+
+async def get_providers_batch(media: Media, tmdb_ids: Iterable[int], pais: str = "PT") -> Dict[int, dict]:
+    """Resolve vários títulos de uma vez; falhas individuais são omitidas do resultado."""
+    semaforo = asyncio.Semaphore(BATCH_CONCURRENCY)
+
+    async def _um(tmdb_id: int):
+        async with semaforo:
+            try:
+                return tmdb_id, await get_providers(media, tmdb_id, pais)
+            except Exception as exc:
+                logger.warning("Falha ao obter providers de %s %s: %s", media, tmdb_id, exc)
+                return tmdb_id, None
+
+    resultados = await asyncio.gather(*(_um(tmdb_id) for tmdb_id in tmdb_ids))
+    return {tmdb_id: projecao for tmdb_id, projecao in resultados if projecao is not None}
@@ -0,0 +1,213 @@
+"""
+Compressão das respostas HTTP (gzip e, se o pacote `brotli` estiver instalado, br).
+
+Middleware ASGI puro para não bufferizar respostas em streaming (NDJSON):
+  - corpo completo acima de `minimum_size` -> comprimido de uma vez; a variante
+    comprimida fica numa LRU indexada pelo hash do corpo, por isso respostas que
+    vêm da cache (listas TMDb, detalhes) só são comprimidas na primeira vez;
+  - corpo em streaming -> compressor incremental com flush por chunk, para cada
+    linha chegar logo ao cliente.
+Só comprime tipos de texto; imagens e respostas já codificadas passam intactas.
+"""
+import hashlib
+import zlib
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:  # dependência opcional
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None
+
+COMPRESSIBLE_TYPES = {
+    "application/json",
+    "application/x-ndjson",
+    "application/javascript",
+    "image/svg+xml",
+}
+
+
+def available_encodings() -> Tuple[str, ...]:
+    """Encodings suportados, por ordem de preferência."""
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def negotiate(accept_encoding: str) -> Optional[str]:
+    """Escolhe o encoding a partir do Accept-Encoding (respeita q=0 e `*`)."""
+    if not accept_encoding:
+        return None
+    qualities = {}
+    for part in accept_encoding.split(","):
+        token, _, params = part.strip().partition(";")
+        token = token.strip().lower()
+        if not token:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        qualities[token] = q
+
+    best, best_q = None, 0.0
+    for encoding in available_encodings():
+        q = qualities.get(encoding, qualities.get("*", 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+def is_compressible(content_type: str) -> bool:
+    base = content_type.split(";", 1)[0].strip().lower()
+    return base.startswith("text/") or base in COMPRESSIBLE_TYPES
+
+
+def compress(body: bytes, encoding: str, gzip_level: int = 6, brotli_quality: int = 4) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=brotli_quality)
+    compressor = zlib.compressobj(gzip_level, zlib.DEFLATED, 31)  # 31 = cabeçalho gzip
+    return compressor.compress(body) + compressor.flush()
+
+
+class StreamCompressor:
+    """Compressão incremental: cada chunk sai já descodificável pelo cliente."""
+
+    def __init__(self, encoding: str, gzip_level: int = 6, brotli_quality: int = 4) -> None:
+        self.encoding = encoding
+        if encoding == "br":
+            self._br = brotli.Compressor(quality=brotli_quality)
+        else:
+            self._gz = zlib.compressobj(gzip_level, zlib.DEFLATED, 31)
+
+    def chunk(self, data: bytes) -> bytes:
+        if self.encoding == "br":
+            return self._br.process(data) + self._br.flush()
+        return self._gz.compress(data) + self._gz.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        if self.encoding == "br":
+            return self._br.finish()
+        return self._gz.flush()
+
+
+class VariantCache:
+    """LRU (limitada em bytes) de variantes comprimidas, por (hash do corpo, encoding)."""
+
+    def __init__(self, max_bytes: int) -> None:
+        self.max_bytes = max_bytes
+        self._data: "OrderedDict[Tuple[bytes, str], bytes]" = OrderedDict()
+        self._total = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get_or_compress(self, body: bytes, encoding: str, gzip_level: int, brotli_quality: int) -> bytes:
+        key = (hashlib.blake2b(body, digest_size=16).digest(), encoding)
+        cached = self._data.get(key)
+        if cached is not None:
+            self._data.move_to_end(key)
+            self.hits += 1
+            return cached
+
+        self.misses += 1
+        compressed = compress(body, encoding, gzip_level, brotli_quality)
+        if len(compressed) <= self.max_bytes:
+            self._data[key] = compressed
+            self._total += len(compressed)
+            while self._total > self.max_bytes:
+                _, old = self._data.popitem(last=False)
+                self._total -= len(old)
+        return compressed
+
+
+class CompressionMiddleware:
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int = 1024,
+        gzip_level: int = 6,
+        brotli_quality: int = 4,
+        cache_max_bytes: int = 32 * 1024 * 1024,
+    ) -> None:
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.variants = VariantCache(cache_max_bytes)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate(Headers(scope=scope).get("accept-encoding", ""))
+        await self.app(scope, receive, _Responder(self, encoding, send))
+
+
+class _Responder:
+    """Interceta `send` de um pedido e decide, no primeiro chunk, se comprime."""
+
+    def __init__(self, middleware: CompressionMiddleware, encoding: Optional[str], send: Send) -> None:
+        self.mw = middleware
+        self.encoding = encoding
+        self.send = send
+        self.start: Optional[Message] = None
+        self.decided = False
+        self.stream: Optional[StreamCompressor] = None
+
+    async def __call__(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            self.start = message
+            return
+        if message["type"] != "http.response.body" or self.decided:
+            await self._send_body(message)
+            return
+
+        self.decided = True
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        headers = MutableHeaders(raw=self.start["headers"])
+
+        compressible = (
+            is_compressible(headers.get("content-type", ""))
+            and "content-encoding" not in headers
+            and self.start["status"] not in (204, 304)
+        )
+        if compressible:
+            headers.add_vary_header("Accept-Encoding")
+
+        if not compressible or self.encoding is None or (not more_body and len(body) < self.mw.minimum_size):
+            await self.send(self.start)
+            await self.send(message)
+            return
+
+        headers["Content-Encoding"] = self.encoding
+        if not more_body:
+            compressed = self.mw.variants.get_or_compress(
+                body, self.encoding, self.mw.gzip_level, self.mw.brotli_quality
+            )
+            headers["Content-Length"] = str(len(compressed))
+            await self.send(self.start)
+            await self.send({"type": "http.response.body", "body": compressed})
+            return
+
+        del headers["Content-Length"]
+        self.stream = StreamCompressor(self.encoding, self.mw.gzip_level, self.mw.brotli_quality)
+        await self.send(self.start)
+        await self._send_body(message)
+
+    async def _send_body(self, message: Message) -> None:
+        if self.stream is None or message["type"] != "http.response.body":
+            await self.send(message)
+            return
+        more_body = message.get("more_body", False)
+        data = self.stream.chunk(message.get("body", b""))
+        if not more_body:
+            data += self.stream.finish()
+        await self.send({"type": "http.response.body", "body": data, "more_body": more_body})
@@ -0,0 +1,121 @@
+"""
+Cabeçalhos de cache HTTP (ETag / Cache-Control / Last-Modified) e respostas 304.
+
+As rotas públicas que servem dados da TMDb declaram `cache: CacheScope =
+Depends(cache_scope)`. Enquanto o pedido corre, cada entrada de `TTLCache` lida
+ou escrita é registada no scope; daí saem os validadores:
+  - ETag      -> hash dos hashes de conteúdo das entradas usadas (+ release);
+  - max-age   -> o menor tempo de vida que resta às entradas;
+  - Last-Modified -> quando a entrada mais recente foi guardada.
+Com isto a rota responde 304 antes de formatar/serializar o corpo:
+
+    dados = await cached_get_json(url)
+    if cache.fresh():
+        return cache.not_modified()
+    return formatar_lista(dados["results"])
+
+Rotas cujo conteúdo vem (também) da DB usam `cache.respond(conteudo)`, que
+serializa uma vez e usa o hash do corpo como ETag.
+"""
+import hashlib
+import json
+import time
+from contextvars import ContextVar
+from email.utils import formatdate
+from typing import Any, AsyncIterator, List, Optional
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+
+from app.core.settings import settings
+
+DB_BACKED_MAX_AGE = 60  # segundos, para conteúdo que não vem só da cache TMDb
+
+_current: ContextVar[Optional["CacheScope"]] = ContextVar("http_cache_scope", default=None)
+
+
+def content_hash(value: Any) -> str:
+    """Hash estável de um valor JSON (ordem das chaves irrelevante)."""
+    raw = json.dumps(value, sort_keys=True, ensure_ascii=False, separators=(",", ":"), default=str)
+    return hashlib.blake2b(raw.encode("utf-8"), digest_size=12).hexdigest()
+
+
+def track_entry(entry: Any) -> None:
+    """Chamado pelas caches: regista a entrada no scope do pedido atual (se houver)."""
+    scope = _current.get()
+    if scope is not None and not scope.closed:
+        scope.entries.append(entry)
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    if if_none_match.strip() == "*":
+        return True
+    # Comparação fraca: W/"x" e "x" são equivalentes
+    wanted = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == wanted for tag in if_none_match.split(","))
+
+
+class CacheScope:
+    def __init__(self, request: Request, response: Response) -> None:
+        self.request = request
+        self.response = response
+        self.entries: List[Any] = []
+        self.closed = False
+        self._headers: dict = {}
+
+    def _validators(self) -> Optional[dict]:
+        if not self.entries:
+            return None
+        etags = sorted({entry.etag for entry in self.entries})
+        digest = hashlib.blake2b("|".join([settings.release_id, *etags]).encode(), digest_size=12).hexdigest()
+        now = time.monotonic()
+        max_age = max(0, int(min(entry.expires for entry in self.entries) - now))
+        stored_at = max(entry.stored_at for entry in self.entries)
+        return {
+            "ETag": f'W/"{digest}"',
+            "Cache-Control": f"public, max-age={max_age}",
+            "Last-Modified": formatdate(stored_at, usegmt=True),
+        }
+
+    def _is_fresh(self, etag: str) -> bool:
+        if_none_match = self.request.headers.get("if-none-match")
+        return bool(if_none_match) and _etag_matches(if_none_match, etag)
+
+    def fresh(self) -> bool:
+        """Aplica os validadores à resposta; True se a cópia do cliente continua válida."""
+        validators = self._validators()
+        if validators is None:
+            return False
+        self._headers = validators
+        self.response.headers.update(validators)
+        return self._is_fresh(validators["ETag"])
+
+    def not_modified(self) -> Response:
+        return Response(status_code=304, headers=self._headers)
+
+    def respond(self, content: Any) -> Response:
+        """Serializa o conteúdo uma vez e usa o hash do corpo como ETag."""
+        body = json.dumps(
+            jsonable_encoder(content), ensure_ascii=False, allow_nan=False, separators=(",", ":")
+        ).encode("utf-8")
+        validators = self._validators() or {}
+        max_age = DB_BACKED_MAX_AGE
+        if "Cache-Control" in validators:
+            max_age = min(max_age, int(validators["Cache-Control"].rsplit("=", 1)[1]))
+        self._headers = {
+            "ETag": f'W/"{hashlib.blake2b(body, digest_size=12).hexdigest()}"',
+            "Cache-Control": f"public, max-age={max_age}",
+        }
+        if self._is_fresh(self._headers["ETag"]):
+            return self.not_modified()
+        return Response(content=body, media_type="application/json", headers=self._headers)
+
+
+async def cache_scope(request: Request, response: Response) -> AsyncIterator[CacheScope]:
+    """Dependência: ativa o registo das entradas de cache usadas neste pedido."""
+    scope = CacheScope(request, response)
+    _current.set(scope)
+    try:
+        yield scope
+    finally:
+        scope.closed = True
@@ -1,33 +1,108 @@
-import asyncio
 import time
-from typing import Any, Dict, Tuple
+from collections import OrderedDict
+from typing import Any, Hashable, List, Optional, Tuple
 
 import httpx
 
+from app.utils.conditional import content_hash, track_entry
+
 DEFAULT_TTL = 300.0  # 5 minutos
+DEFAULT_MAX_ENTRIES = 2048
 
 _client = httpx.AsyncClient(timeout=8.0)
-_cache_lock = asyncio.Lock()
-_cache: Dict[str, Tuple[float, Any]] = {}
 
 
-async def cached_get_json(url: str, ttl: float = DEFAULT_TTL) -> Any:
-    """Efetua um GET com cache simples em memória."""
-    now = time.monotonic()
-    async with _cache_lock:
-        item = _cache.get(url)
-        if item and item[0] > now:
-            return item[1]
+class CacheEntry:
+    """Valor em cache + metadados usados nos cabeçalhos HTTP (ver `conditional`)."""
+
+    __slots__ = ("value", "expires", "stored_at", "_etag")
+
+    def __init__(self, value: Any, ttl: float) -> None:
+        self.value = value
+        self.expires = time.monotonic() + ttl
+        self.stored_at = time.time()
+        self._etag: Optional[str] = None
+
+    @property
+    def etag(self) -> str:
+        # Calculado só quando uma rota com cabeçalhos de cache precisa dele
+        if self._etag is None:
+            self._etag = content_hash(self.value)
+        return self._etag
+
+
+class TTLCache:
+    """Cache em memória com expiração por entrada e limite de tamanho (LRU)."""
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES) -> None:
+        self.max_entries = max_entries
+        self._data: "OrderedDict[Hashable, CacheEntry]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        if entry.expires <= time.monotonic():
+            self._data.pop(key, None)
+            return None
+        self._data.move_to_end(key)
+        track_entry(entry)
+        return entry.value
+
+    def set(self, key: Hashable, value: Any, ttl: float) -> None:
+        entry = CacheEntry(value, ttl)
+        self._data[key] = entry
+        self._data.move_to_end(key)
+        track_entry(entry)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+
+    def pop(self, key: Hashable) -> None:
+        self._data.pop(key, None)
 
+    def clear(self) -> None:
+        self._data.clear()
+
+    def items(self) -> List[Tuple[Hashable, float, Any]]:
+        """Snapshot (chave, expira_em, valor) das entradas ainda válidas."""
+        now = time.monotonic()
+        return [(key, e.expires, e.value) for key, e in list(self._data.items()) if e.expires > now]
+
+
+_cache = TTLCache()
+
+
+def configure_client(transport: Optional[httpx.AsyncBaseTransport] = None) -> None:
+    """Troca o cliente HTTP da TMDb (ex.: substituto local em testes de carga)."""
+    global _client
+    _client = httpx.AsyncClient(timeout=8.0, transport=transport)
+
+
+async def fetch_json(url: str) -> Any:
+    """GET sem cache, para quem guarda uma projeção própria da resposta."""
     response = await _client.get(url)
     response.raise_for_status()
-    data = response.json()
+    return response.json()
+
 
-    async with _cache_lock:
-        _cache[url] = (now + ttl, data)
+async def cached_get_json(url: str, ttl: float = DEFAULT_TTL) -> Any:
+    """Efetua um GET com cache simples em memória."""
+    data = _cache.get(url)
+    if data is not None:
+        return data
 
+    data = await fetch_json(url)
+    _cache.set(url, data, ttl)
     return data
 
 
+def cached_items() -> List[Tuple[str, float, Any]]:
+    """Snapshot (url, expira_em, dados) das entradas ainda válidas."""
+    return _cache.items()
+
+
 async def close_cache_client() -> None:
     await _client.aclose()
@@ -0,0 +1,151 @@
+"""
+Proxy de imagens da TMDb com cache em disco (LRU por bytes).
+
+Cada variante (tamanho + ficheiro) é guardada uma vez em `IMAGE_CACHE_DIR`; as
+mais antigas (por último acesso) são removidas quando o total passa do limite.
+O upstream é configurável (`TMDB_IMAGE_BASE` ou `configure_upstream`) para se
+poder usar um servidor substituto em testes e benchmarks.
+"""
+import asyncio
+import os
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Optional
+from uuid import uuid4
+
+import httpx
+
+from app.core.settings import settings
+
+
+class DiskLRUCache:
+    def __init__(self, root: Path, max_bytes: int) -> None:
+        self.root = root
+        self.max_bytes = max_bytes
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._index: "OrderedDict[str, int]" = OrderedDict()
+        self._total = 0
+
+        # Reconstrói o índice a partir do disco, do acesso mais antigo para o mais recente
+        ficheiros = [p for p in self.root.iterdir() if p.is_file() and not p.name.startswith(".")]
+        for path in sorted(ficheiros, key=lambda p: p.stat().st_mtime):
+            size = path.stat().st_size
+            self._index[path.name] = size
+            self._total += size
+        self._evict()
+
+    @property
+    def total_bytes(self) -> int:
+        return self._total
+
+    def _path(self, key: str) -> Path:
+        return self.root / key
+
+    async def get(self, key: str) -> Optional[bytes]:
+        if key not in self._index:
+            return None
+        path = self._path(key)
+        try:
+            data = await asyncio.to_thread(path.read_bytes)
+        except FileNotFoundError:
+            self._total -= self._index.pop(key, 0)
+            return None
+        self._index.move_to_end(key)
+        # mtime serve de "último acesso" quando o índice é reconstruído
+        await asyncio.to_thread(os.utime, path, None)
+        return data
+
+    async def put(self, key: str, data: bytes) -> None:
+        path = self._path(key)
+        tmp = self.root / f".{key}.{uuid4().hex}.tmp"
+
+        def _write() -> None:
+            tmp.write_bytes(data)
+            os.replace(tmp, path)
+
+        await asyncio.to_thread(_write)
+        self._total += len(data) - self._index.pop(key, 0)
+        self._index[key] = len(data)
+        self._evict()
+
+    def _evict(self) -> None:
+        while self._total > self.max_bytes and self._index:
+            key, size = self._index.popitem(last=False)
+            self._total -= size
+            try:
+                self._path(key).unlink()
+            except FileNotFoundError:
+                pass
+
+
+class UpstreamNotFound(Exception):
+    pass
+
+
+_upstream_base = settings.tmdb_image_base
+_client = httpx.AsyncClient(timeout=10.0)
+_store: Optional[DiskLRUCache] = None
+_inflight: Dict[str, "asyncio.Task[bytes]"] = {}
+
+
+def configure_upstream(base_url: Optional[str] = None, transport: Optional[httpx.AsyncBaseTransport] = None) -> None:
+    """Troca o upstream de imagens (ex.: servidor substituto em testes)."""
+    global _upstream_base, _client
+    if base_url:
+        _upstream_base = base_url.rstrip("/")
+    if transport is not None:
+        _client = httpx.AsyncClient(timeout=10.0, transport=transport)
+
+
+def get_store() -> DiskLRUCache:
+    global _store
+    if _store is None:
+        _store = DiskLRUCache(Path(settings.image_cache_dir), settings.image_cache_max_mb * 1024 * 1024)
+    return _store
+
+
+async def _fetch_upstream(size: str, filename: str) -> bytes:
+    response = await _client.get(f"{_upstream_base}/{size}/{filename}")
+    if response.status_code == 404:
+        raise UpstreamNotFound(filename)
+    response.raise_for_status()
+    return response.content
+
+
+async def _download(key: str, size: str, filename: str) -> bytes:
+    try:
+        data = await _fetch_upstream(size, filename)
+        await get_store().put(key, data)
+        return data
+    finally:
+        _inflight.pop(key, None)
+
+
+def _consume_exception(task: "asyncio.Task[bytes]") -> None:
+    # Se todos os clientes desistiram ninguém lê o erro: evita o aviso do asyncio
+    if not task.cancelled():
+        task.exception()
+
+
+async def get_image(size: str, filename: str) -> bytes:
+    """
+    Bytes da variante pedida; pedidos simultâneos à mesma imagem partilham o download.
+
+    O download corre numa task própria: se o cliente que o iniciou desligar, a
+    task continua e os restantes recebem a imagem (shield só cancela a espera).
+    """
+    key = f"{size}_{filename}"
+    data = await get_store().get(key)
+    if data is not None:
+        return data
+
+    task = _inflight.get(key)
+    if task is None:
+        task = asyncio.create_task(_download(key, size, filename))
+        task.add_done_callback(_consume_exception)
+        _inflight[key] = task
+    return await asyncio.shield(task)
+
+
+async def close_image_client() -> None:
+    await _client.aclose()
@@ -0,0 +1,28 @@
+from typing import Optional
+
+from app.core.settings import settings
+
+# Tamanho TMDb por contexto de apresentação
+IMAGE_SIZES = {
+    "grid": "w342",      # posters em listas/grelhas
+    "detail": "w500",    # poster na página de detalhes
+    "backdrop": "w500",
+    "backdrop_large": "w780",
+    "cast": "w185",      # fotos do elenco
+}
+
+# Tamanhos aceites pelo proxy (os oficiais da TMDb + os que já usávamos)
+ALLOWED_SIZES = {
+    "w92", "w154", "w185", "w200", "w300", "w342", "w500", "w780", "w1280", "original",
+}
+
+
+def image_url(path: Optional[str], context: str = "detail") -> Optional[str]:
+    """URL da imagem no tamanho adequado ao contexto (via proxy quando configurado)."""
+    if not path:
+        return None
+    size = IMAGE_SIZES[context]
+    # SVG (logos) não passa pelo proxy, que só serve formatos raster
+    proxy = settings.image_proxy_base_url if not path.lower().endswith(".svg") else None
+    base = proxy or settings.tmdb_image_base
+    return f"{base}/{size}{path}"
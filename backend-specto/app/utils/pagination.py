@@ -0,0 +1,72 @@
+"""
+Cursores opacos para paginação keyset.
+
+O cursor é a chave de ordenação da última linha devolvida (ex.: `(criado_em,
+id)`), serializada em JSON e codificada em base64 url-safe. O cliente só o
+reenvia; a próxima página começa estritamente depois dessa chave, por isso o
+custo por página não cresce com a profundidade (ao contrário de OFFSET).
+"""
+import base64
+import json
+from datetime import datetime
+from typing import Any, List, Sequence, Tuple
+
+from fastapi import HTTPException, Response, status
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def _encode_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return {"dt": value.isoformat()}
+    return value
+
+
+def _decode_value(value: Any) -> Any:
+    if isinstance(value, dict) and "dt" in value:
+        return datetime.fromisoformat(value["dt"])
+    return value
+
+
+def encode_cursor(*values: Any) -> str:
+    raw = json.dumps([_encode_value(v) for v in values], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def _matches(value: Any, expected: type) -> bool:
+    if isinstance(value, bool):
+        return expected is bool
+    if expected is float:
+        return isinstance(value, (int, float))  # o JSON não distingue 1 de 1.0
+    return isinstance(value, expected)
+
+
+def decode_cursor(cursor: str, types: Tuple[type, ...]) -> List[Any]:
+    """
+    Valores da chave guardados no cursor, um por tipo em `types` (ex.:
+    `(datetime, int)`); 400 se o cursor for inválido ou tiver sido alterado
+    para outros tipos (senão o erro só aparecia no Postgres, como 500).
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not isinstance(values, list) or len(values) != len(types):
+            raise ValueError(cursor)
+        decoded = [_decode_value(v) for v in values]
+        if not all(_matches(v, t) for v, t in zip(decoded, types)):
+            raise ValueError(cursor)
+        return decoded
+    except (ValueError, TypeError):
+        raise HTTPException(status.HTTP_400_BAD_REQUEST, "Cursor inválido")
+
+
+def set_next_cursor(response: Response, rows: Sequence, limit: int, key) -> list:
+    """
+    Recebe até `limit + 1` linhas; se houver mais do que `limit`, corta e põe o
+    cursor da última linha no cabeçalho `X-Next-Cursor`.
+    """
+    rows = list(rows)
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(*key(rows[-1]))
+    return rows
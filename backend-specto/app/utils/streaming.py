@@ -0,0 +1,41 @@
+from __future__ import annotations
+
+import json
+from typing import Any, AsyncIterable, Iterable, Union
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+from starlette.requests import Request
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+_TRUTHY = {"1", "true", "yes", "on"}
+
+
+def wants_ndjson(request: Request) -> bool:
+    """Indica se o cliente pediu a resposta em streaming (NDJSON)."""
+    if request.query_params.get("stream", "").strip().lower() in _TRUTHY:
+        return True
+    accept = request.headers.get("accept", "")
+    return any(
+        part.split(";", 1)[0].strip().lower() == NDJSON_MEDIA_TYPE
+        for part in accept.split(",")
+    )
+
+
+def _encode_line(item: Any) -> bytes:
+    payload = jsonable_encoder(item)
+    return (json.dumps(payload, ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8")
+
+
+async def _iterate(items: Union[AsyncIterable[Any], Iterable[Any]]):
+    if hasattr(items, "__aiter__"):
+        async for item in items:  # type: ignore[union-attr]
+            yield _encode_line(item)
+    else:
+        for item in items:  # type: ignore[union-attr]
+            yield _encode_line(item)
+
+
+def ndjson_response(items: Union[AsyncIterable[Any], Iterable[Any]]) -> StreamingResponse:
+    """Devolve uma resposta NDJSON: um objeto JSON por linha, enviado à medida que é produzido."""
+    return StreamingResponse(_iterate(items), media_type=NDJSON_MEDIA_TYPE)
@@ -0,0 +1,8 @@
+import unicodedata
+
+
+def fold(text: str) -> str:
+    """Remove acentos, aplica casefold e normaliza espaços."""
+    decomposed = unicodedata.normalize("NFKD", text)
+    sem_acentos = "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+    return " ".join(sem_acentos.casefold().split())
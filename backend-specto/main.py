@@ -1,5 +1,6 @@
 
-from fastapi import FastAPI, Depends, Request
+from fastapi import FastAPI, Depends, Query, Request
+from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 
@@ -7,11 +8,25 @@ from config import API_KEY, BASE_URL
 from routes import filmes, series
 
 # Auth / Users
-from app.routers import auth, vistos, comentarios, users, admin
+from app.routers import auth, vistos, comentarios, users, admin, onde_assistir, imagens
 from app.routers import forum as forum_router
+from app.core.db import get_session, start_db_liveness, stop_db_liveness
+from app.core.read_routing import PrimaryPinMiddleware
+from app.core.security import shutdown_password_hasher, warm_password_hasher
+from app.core.sql_stats import SqlStatsMiddleware
+from app.services.autocomplete import autocomplete
+from app.services.catalog_search import federated_search
+from app.services.chat_partitions import start_chat_partition_job, stop_chat_partition_job
+from app.services.login_throttle import start_login_throttle_job, stop_login_throttle_job
+from app.services.platform_stats import start_platform_stats_job, stop_platform_stats_job
 from app.schemas.user import UserRead
 from app.utils.http_cache import close_cache_client, cached_get_json
+from app.utils.image_cache import close_image_client
+from app.utils.images import image_url
 from app.utils.avatars import STATIC_ROOT
+from app.utils.compression import CompressionMiddleware
+from app.utils.conditional import CacheScope, cache_scope
+from app.core.settings import settings
 
 app = FastAPI(title="Specto API")
 
@@ -34,6 +49,24 @@ app.add_middleware(
     allow_credentials=False,  # JWT em headers (sem cookies cross-site)
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],  # paginação keyset (admin)
+)
+
+# ----------------- Instrumentação de SQL -----------------
+# Conta queries/tempo de DB por pedido, deteta N+1 e regista queries lentas
+app.add_middleware(SqlStatsMiddleware)
+
+# ----------------- Réplica de leitura -----------------
+# Após uma escrita, as leituras do mesmo utilizador ficam uns segundos no primário
+app.add_middleware(PrimaryPinMiddleware)
+
+# ----------------- Compressão -----------------
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=settings.compression_min_size,
+    gzip_level=settings.compression_gzip_level,
+    brotli_quality=settings.compression_brotli_quality,
+    cache_max_bytes=settings.compression_cache_mb * 1024 * 1024,
 )
 
 # ----------------- Static files (avatars) -----------------
@@ -50,6 +83,8 @@ app.include_router(comentarios.router)  # Comentários
 app.include_router(forum_router.router) # Fórum (inclui chat)
 app.include_router(users.router)        # Perfil público
 app.include_router(admin.router)        # Admin
+app.include_router(onde_assistir.router) # Providers em lote
+app.include_router(imagens.router)       # Proxy/cache de imagens TMDb
 
 # ----------------- Health check / root -----------------
 @app.get("/", tags=["Health"])
@@ -60,53 +95,68 @@ def root():
 
 # ----------------- Rotas auxiliares (TMDb) -----------------
 @app.get("/filmes-populares", tags=["Filmes"], name="filmes_populares_public")
-async def filmes_populares():
+async def filmes_populares(cache: CacheScope = Depends(cache_scope)):
     url = f"{BASE_URL}/movie/popular?api_key={API_KEY}&language=pt-BR&page=1"
-    return await cached_get_json(url, ttl=3600)
+    dados = await cached_get_json(url, ttl=3600)
+    if cache.fresh():
+        return cache.not_modified()
+    return dados
 
 
 @app.get("/series-populares", tags=["Séries"], name="series_populares_public")
-async def series_populares():
+async def series_populares(cache: CacheScope = Depends(cache_scope)):
     url = f"{BASE_URL}/tv/popular?api_key={API_KEY}&language=pt-BR&page=1"
-    return await cached_get_json(url, ttl=3600)
+    dados = await cached_get_json(url, ttl=3600)
+    if cache.fresh():
+        return cache.not_modified()
+    return dados
 
 
 @app.get("/pesquisa", tags=["Pesquisa"])
-async def pesquisa(query: str):
-    query = query.strip()
-
-    # Pesquisa filmes
-    url_filmes = f"{BASE_URL}/search/movie?api_key={API_KEY}&language=pt-BR&query={query}"
-    filmes_res = await cached_get_json(url_filmes, ttl=300)
-
-    # Pesquisa séries
-    url_series = f"{BASE_URL}/search/tv?api_key={API_KEY}&language=pt-BR&query={query}"
-    series_res = await cached_get_json(url_series, ttl=300)
-
-    # Retorna já no formato esperado pelo frontend
-    return {
-        "filmes": filmes_res.get("results", []),
-        "series": series_res.get("results", []),
-    }
+async def pesquisa(
+    query: str,
+    session: AsyncSession = Depends(get_session),
+    cache: CacheScope = Depends(cache_scope),
+):
+    # Filmes e séries em paralelo (Postgres + TMDb com orçamento por fonte)
+    resultado = await federated_search(session, query, language="pt-BR")
+
+    filmes_fmt = filmes.formatar_lista(resultado["filmes"])
+    series_fmt = series.formatar_lista(resultado["series"])
+    por_id = {("filme", f["id"]): f for f in filmes_fmt}
+    por_id.update({("serie", s["id"]): s for s in series_fmt})
+
+    # Retorna já no formato esperado pelo frontend, mais a lista única ordenada
+    return cache.respond({
+        "filmes": filmes_fmt,
+        "series": series_fmt,
+        "resultados": [
+            {**por_id[(tipo, raw["id"])], "tipo": tipo}
+            for tipo, raw in resultado["resultados"]
+        ],
+    })
+
+
+@app.get("/pesquisa/autocomplete", tags=["Pesquisa"])
+async def pesquisa_autocomplete(q: str, limite: int = Query(8, ge=1, le=20)):
+    # Índice de prefixos em memória: não há chamadas à TMDb nem à DB por tecla
+    await autocomplete.ensure_fresh()
+    return autocomplete.lookup(q, limite)
 
 
 @app.get("/filme/{id}", tags=["Filmes"])
-async def filme_detalhes(id: int):
+async def filme_detalhes(id: int, cache: CacheScope = Depends(cache_scope)):
     url = f"{BASE_URL}/movie/{id}?api_key={API_KEY}&language=pt-BR"
     f = await cached_get_json(url, ttl=3600)
+    if cache.fresh():
+        return cache.not_modified()
     return {
         "id": f["id"],
         "titulo": f.get("title"),
         "original_title": f.get("original_title"),
         "sinopse": f.get("overview"),
-        "poster": (
-            f"https://image.tmdb.org/t/p/w500{f['poster_path']}"
-            if f.get("poster_path") else None
-        ),
-        "backdrop": (
-            f"https://image.tmdb.org/t/p/w500{f['backdrop_path']}"
-            if f.get("backdrop_path") else None
-        ),
+        "poster": image_url(f.get("poster_path"), "detail"),
+        "backdrop": image_url(f.get("backdrop_path"), "backdrop"),
         "generos_ids": f.get("genre_ids", []),
         "data_lancamento": f.get("release_date"),
         "nota": f.get("vote_average"),
@@ -116,11 +166,26 @@ async def filme_detalhes(id: int):
 
 # ----------------- Endpoint protegido -----------------
 @app.get("/me", response_model=UserRead, tags=["Auth"])
-async def me(request: Request, user=Depends(auth.get_current_user)):
+async def me(request: Request, user=Depends(auth.get_current_user_model)):
     return auth.user_to_read(user, request)
 
 
-# ----------------- Shutdown -----------------
+# ----------------- Startup / Shutdown -----------------
+@app.on_event("startup")
+async def startup_event():
+    start_db_liveness()
+    start_platform_stats_job()
+    start_chat_partition_job()
+    start_login_throttle_job()
+    await warm_password_hasher()
+
+
 @app.on_event("shutdown")
 async def shutdown_event():
+    await stop_db_liveness()
+    await stop_platform_stats_job()
+    await stop_chat_partition_job()
+    await stop_login_throttle_job()
+    shutdown_password_hasher()
     await close_cache_client()
+    await close_image_client()
@@ -3,7 +3,7 @@ import logging
 from datetime import datetime, timedelta, timezone
 from typing import Sequence
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Request
 from sqlalchemy import select, func
 from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -11,12 +11,17 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from config import API_KEY, BASE_URL
 from app.core.db import get_session
 from app.models import TmdbCachedFilme
+from app.services.catalog_search import search_catalog
+from app.services.detail_cache import formatar_imagens, get_details, get_section
+from app.services.providers import get_providers
+from app.utils.conditional import CacheScope, cache_scope
 from app.utils.http_cache import cached_get_json
+from app.utils.images import image_url
+from app.utils.streaming import ndjson_response, wants_ndjson
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
-IMG_BASE = "https://image.tmdb.org/t/p"
 
 CACHE_MIN_RESULTS = 60
 CACHE_MAX_AGE = timedelta(hours=12)
@@ -31,8 +36,8 @@ def formatar_lista(filmes_raw: list) -> list:
             "titulo": f.get("title"),
             "titulo_original": f.get("original_title"),
             "sinopse": f.get("overview"),
-            "poster": f"{IMG_BASE}/w500{f['poster_path']}" if f.get("poster_path") else None,
-            "backdrop": f"{IMG_BASE}/w500{f['backdrop_path']}" if f.get("backdrop_path") else None,
+            "poster": image_url(f.get("poster_path"), "grid"),
+            "backdrop": image_url(f.get("backdrop_path"), "backdrop"),
             "generos_ids": f.get("genre_ids", []),
             "data_lancamento": f.get("release_date"),
             "nota": f.get("vote_average"),
@@ -49,8 +54,8 @@ def formatar_detalhes(f: dict) -> dict:
         "titulo": f.get("title"),
         "titulo_original": f.get("original_title"),
         "sinopse": f.get("overview"),
-        "poster": f"{IMG_BASE}/w500{f['poster_path']}" if f.get("poster_path") else None,
-        "backdrop": f"{IMG_BASE}/w500{f['backdrop_path']}" if f.get("backdrop_path") else None,
+        "poster": image_url(f.get("poster_path"), "detail"),
+        "backdrop": image_url(f.get("backdrop_path"), "backdrop"),
         "generos": [g["name"] for g in f.get("genres", [])],
         "data_lancamento": f.get("release_date"),
         "nota": f.get("vote_average"),
@@ -61,7 +66,7 @@ def formatar_detalhes(f: dict) -> dict:
             {
                 "nome": c["name"],
                 "personagem": c.get("character"),
-                "foto": f"{IMG_BASE}/w200{c['profile_path']}" if c.get("profile_path") else None,
+                "foto": image_url(c.get("profile_path"), "cast"),
             }
             for c in f.get("credits", {}).get("cast", [])[:10]
         ],
@@ -103,18 +108,35 @@ def _build_cache_cutoff() -> datetime:
     return now - CACHE_MAX_AGE
 
 
+def _genre_cache_stmt(genero_id: int, allow_stale: bool = False):
+    stmt = select(TmdbCachedFilme.payload).where(TmdbCachedFilme.genero_id == genero_id)
+    if not allow_stale:
+        stmt = stmt.where(TmdbCachedFilme.cached_em >= _build_cache_cutoff())
+    return stmt.order_by(TmdbCachedFilme.cached_em.desc(), TmdbCachedFilme.ordem.asc())
+
+
 async def _load_genre_cache(
     session: AsyncSession,
     genero_id: int,
     allow_stale: bool = False,
 ) -> list:
-    stmt = select(TmdbCachedFilme).where(TmdbCachedFilme.genero_id == genero_id)
-    if not allow_stale:
-        stmt = stmt.where(TmdbCachedFilme.cached_em >= _build_cache_cutoff())
-    stmt = stmt.order_by(TmdbCachedFilme.cached_em.desc(), TmdbCachedFilme.ordem.asc())
-    result = await session.execute(stmt)
-    entries = result.scalars().all()
-    return [entry.payload for entry in entries]
+    result = await session.execute(_genre_cache_stmt(genero_id, allow_stale))
+    return list(result.scalars().all())
+
+
+async def _count_genre_cache(session: AsyncSession, genero_id: int) -> int:
+    stmt = select(func.count(TmdbCachedFilme.id)).where(
+        TmdbCachedFilme.genero_id == genero_id,
+        TmdbCachedFilme.cached_em >= _build_cache_cutoff(),
+    )
+    return await session.scalar(stmt) or 0
+
+
+async def _stream_genre_cache(session: AsyncSession, genero_id: int):
+    """Lê a cache do género com um cursor, sem materializar a lista completa."""
+    result = await session.stream_scalars(_genre_cache_stmt(genero_id))
+    async for payload in result:
+        yield payload
 
 
 async def _upsert_genre_cache(session: AsyncSession, genero_id: int, filmes: list) -> None:
@@ -146,59 +168,71 @@ async def _upsert_genre_cache(session: AsyncSession, genero_id: int, filmes: lis
 
 
 @router.get("/populares")
-async def filmes_populares():
+async def filmes_populares(cache: CacheScope = Depends(cache_scope)):
     paginas = 3
     urls = [
         f"{BASE_URL}/movie/popular?api_key={API_KEY}&language=pt-PT&page={page}"
         for page in range(1, paginas + 1)
     ]
     filmes = await _fetch_paginas(urls)
+    if cache.fresh():
+        return cache.not_modified()
     return formatar_lista(filmes)
 
 
 @router.get("/now-playing")
-async def filmes_now_playing():
+async def filmes_now_playing(cache: CacheScope = Depends(cache_scope)):
     url = f"{BASE_URL}/movie/now_playing?api_key={API_KEY}&language=pt-PT&page=1"
     dados = await cached_get_json(url)
+    if cache.fresh():
+        return cache.not_modified()
     return formatar_lista(dados.get("results", []))
 
 
 @router.get("/upcoming")
-async def filmes_upcoming():
+async def filmes_upcoming(cache: CacheScope = Depends(cache_scope)):
     url = f"{BASE_URL}/movie/upcoming?api_key={API_KEY}&language=pt-PT&page=1"
     dados = await cached_get_json(url)
+    if cache.fresh():
+        return cache.not_modified()
     return formatar_lista(dados.get("results", []))
 
 
 @router.get("/top-rated")
-async def filmes_top_rated():
+async def filmes_top_rated(cache: CacheScope = Depends(cache_scope)):
     url = f"{BASE_URL}/movie/top_rated?api_key={API_KEY}&language=pt-PT&page=1"
     dados = await cached_get_json(url)
+    if cache.fresh():
+        return cache.not_modified()
     return formatar_lista(dados.get("results", []))
 
 
 @router.get("/pesquisa")
-async def pesquisa_filmes(query: str):
-    url = f"{BASE_URL}/search/movie?api_key={API_KEY}&language=pt-PT&query={query.strip()}"
-    dados = await cached_get_json(url)
-    return formatar_lista(dados.get("results", []))
+async def pesquisa_filmes(
+    query: str,
+    session: AsyncSession = Depends(get_session),
+    cache: CacheScope = Depends(cache_scope),
+):
+    resultados = await search_catalog(session, "filme", query, language="pt-PT")
+    return cache.respond(formatar_lista(resultados))
 
 
 @router.get("/detalhes/{filme_id}")
-async def detalhes_filme(filme_id: int):
-    url = (
-        f"{BASE_URL}/movie/{filme_id}"
-        f"?api_key={API_KEY}&language=pt-PT"
-        f"&append_to_response=credits,reviews,videos,images"
-    )
-    dados = await cached_get_json(url, ttl=600.0)
-    return formatar_detalhes(dados)
+async def detalhes_filme(filme_id: int, imagens: bool = False, cache: CacheScope = Depends(cache_scope)):
+    dados = await get_details("movie", filme_id, "pt-PT", include_images=imagens)
+    if cache.fresh():
+        return cache.not_modified()
+    detalhes = formatar_detalhes(dados)
+    if imagens:
+        detalhes["imagens"] = formatar_imagens(dados.get("images") or {})
+    return detalhes
 
 
 @router.get("/{filme_id}/reviews")
-async def reviews_filme(filme_id: int):
-    url = f"{BASE_URL}/movie/{filme_id}/reviews?api_key={API_KEY}&language=pt-PT&page=1"
-    dados = await cached_get_json(url)
+async def reviews_filme(filme_id: int, cache: CacheScope = Depends(cache_scope)):
+    dados = await get_section("movie", filme_id, "pt-PT", "reviews")
+    if cache.fresh():
+        return cache.not_modified()
     return [
         {"autor": r["author"], "conteudo": r["content"]}
         for r in dados.get("results", [])
@@ -206,9 +240,10 @@ async def reviews_filme(filme_id: int):
 
 
 @router.get("/{filme_id}/videos")
-async def videos_filme(filme_id: int):
-    url = f"{BASE_URL}/movie/{filme_id}/videos?api_key={API_KEY}&language=pt-PT"
-    dados = await cached_get_json(url)
+async def videos_filme(filme_id: int, cache: CacheScope = Depends(cache_scope)):
+    dados = await get_section("movie", filme_id, "pt-PT", "videos")
+    if cache.fresh():
+        return cache.not_modified()
     return [
         {"tipo": v["type"], "site": v["site"], "chave": v["key"]}
         for v in dados.get("results", [])
@@ -217,14 +252,15 @@ async def videos_filme(filme_id: int):
 
 
 @router.get("/{filme_id}/elenco")
-async def elenco_filme(filme_id: int):
-    url = f"{BASE_URL}/movie/{filme_id}/credits?api_key={API_KEY}&language=pt-PT"
-    dados = await cached_get_json(url)
+async def elenco_filme(filme_id: int, cache: CacheScope = Depends(cache_scope)):
+    dados = await get_section("movie", filme_id, "pt-PT", "credits")
+    if cache.fresh():
+        return cache.not_modified()
     return [
         {
             "nome": c["name"],
             "personagem": c.get("character"),
-            "foto": f"{IMG_BASE}/w200{c['profile_path']}" if c.get("profile_path") else None,
+            "foto": image_url(c.get("profile_path"), "cast"),
         }
         for c in dados.get("cast", [])[:20]
     ]
@@ -233,11 +269,20 @@ async def elenco_filme(filme_id: int):
 @router.get("/genero/{genero_id}")
 async def filmes_por_genero(
     genero_id: int,
+    request: Request,
     session: AsyncSession = Depends(get_session),
+    cache: CacheScope = Depends(cache_scope),
 ):
-    cached = await _load_genre_cache(session, genero_id)
-    if len(cached) >= CACHE_MIN_RESULTS:
-        return cached
+    stream = wants_ndjson(request)
+    if stream:
+        # Em modo streaming só contamos as entradas; os payloads seguem do cursor.
+        if await _count_genre_cache(session, genero_id) >= CACHE_MIN_RESULTS:
+            return ndjson_response(_stream_genre_cache(session, genero_id))
+        cached = []
+    else:
+        cached = await _load_genre_cache(session, genero_id)
+        if len(cached) >= CACHE_MIN_RESULTS:
+            return cache.respond(cached)
 
     try:
         filmes_raw = await _fetch_genero_paginas(genero_id, CACHE_GENRE_PAGES)
@@ -247,14 +292,16 @@ async def filmes_por_genero(
             genero_id,
             exc,
         )
-        return cached or await _load_genre_cache(session, genero_id, allow_stale=True)
+        fallback = cached or await _load_genre_cache(session, genero_id, allow_stale=True)
+        return ndjson_response(fallback) if stream else cache.respond(fallback)
 
     filmes = formatar_lista(filmes_raw)
     await _upsert_genre_cache(session, genero_id, filmes)
-    return filmes
+    return ndjson_response(filmes) if stream else cache.respond(filmes)
 
 @router.get("/{filme_id}/onde-assistir")
-async def onde_assistir_filme(filme_id: int, pais: str = "PT"):
-    url = f"{BASE_URL}/movie/{filme_id}/watch/providers?api_key={API_KEY}"
-    dados = await cached_get_json(url)
-    return dados.get("results", {}).get(pais, {})
+async def onde_assistir_filme(filme_id: int, pais: str = "PT", cache: CacheScope = Depends(cache_scope)):
+    providers = await get_providers("movie", filme_id, pais)
+    if cache.fresh():
+        return cache.not_modified()
+    return providers
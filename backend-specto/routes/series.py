@@ -1,13 +1,19 @@
 import asyncio
 from typing import List
 
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from config import API_KEY, BASE_URL
+from app.core.db import get_session
+from app.services.catalog_search import search_catalog
+from app.services.detail_cache import formatar_imagens, get_details, get_section
+from app.services.providers import get_providers
+from app.utils.conditional import CacheScope, cache_scope
 from app.utils.http_cache import cached_get_json
+from app.utils.images import image_url
 
 router = APIRouter()
-IMG_BASE = "https://image.tmdb.org/t/p"
 
 
 def formatar_lista(series_raw: list) -> list:
@@ -18,8 +24,8 @@ def formatar_lista(series_raw: list) -> list:
             "titulo": s.get("name"),
             "original_name": s.get("original_name"),
             "sinopse": s.get("overview"),
-            "poster": f"{IMG_BASE}/w500{s['poster_path']}" if s.get("poster_path") else None,
-            "backdrop": f"{IMG_BASE}/w500{s['backdrop_path']}" if s.get("backdrop_path") else None,
+            "poster": image_url(s.get("poster_path"), "grid"),
+            "backdrop": image_url(s.get("backdrop_path"), "backdrop"),
             "generos_ids": s.get("genre_ids", []),
             "data_lancamento": s.get("first_air_date"),
             "nota": s.get("vote_average"),
@@ -35,7 +41,7 @@ def formatar_detalhes(s: dict) -> dict:
         {
             "nome": c.get("name"),
             "personagem": c.get("character"),
-            "foto": f"{IMG_BASE}/w200{c['profile_path']}" if c.get("profile_path") else None,
+            "foto": image_url(c.get("profile_path"), "cast"),
         }
         for c in s.get("credits", {}).get("cast", [])[:20]
     ]
@@ -58,8 +64,8 @@ def formatar_detalhes(s: dict) -> dict:
         "titulo": s.get("name"),
         "original_name": s.get("original_name"),
         "sinopse": s.get("overview"),
-        "poster": f"{IMG_BASE}/w500{s['poster_path']}" if s.get("poster_path") else None,
-        "backdrop": f"{IMG_BASE}/w500{s['backdrop_path']}" if s.get("backdrop_path") else None,
+        "poster": image_url(s.get("poster_path"), "detail"),
+        "backdrop": image_url(s.get("backdrop_path"), "backdrop"),
         "generos": generos,
         "data_lancamento": s.get("first_air_date"),
         "nota": s.get("vote_average"),
@@ -88,56 +94,71 @@ async def _fetch_paginas(urls: List[str]) -> list:
 
 
 @router.get("/populares")
-async def series_populares():
+async def series_populares(cache: CacheScope = Depends(cache_scope)):
     paginas = 3
     urls = [
         f"{BASE_URL}/tv/popular?api_key={API_KEY}&language=pt-BR&page={page}"
         for page in range(1, paginas + 1)
     ]
     series = await _fetch_paginas(urls)
+    if cache.fresh():
+        return cache.not_modified()
     return formatar_lista(series)
 
 
 @router.get("/top-rated")
-async def series_top_rated():
+async def series_top_rated(cache: CacheScope = Depends(cache_scope)):
     url = f"{BASE_URL}/tv/top_rated?api_key={API_KEY}&language=pt-BR&page=1"
     dados = await cached_get_json(url)
+    if cache.fresh():
+        return cache.not_modified()
     return formatar_lista(dados.get("results", []))
 
 
 @router.get("/on-air")
-async def series_on_air():
+async def series_on_air(cache: CacheScope = Depends(cache_scope)):
     url = f"{BASE_URL}/tv/on_the_air?api_key={API_KEY}&language=pt-BR&page=1"
     dados = await cached_get_json(url)
+    if cache.fresh():
+        return cache.not_modified()
     return formatar_lista(dados.get("results", []))
 
 
 @router.get("/upcoming")
-async def series_upcoming():
+async def series_upcoming(cache: CacheScope = Depends(cache_scope)):
     url = f"{BASE_URL}/tv/airing_today?api_key={API_KEY}&language=pt-BR&page=1"
     dados = await cached_get_json(url)
+    if cache.fresh():
+        return cache.not_modified()
     return formatar_lista(dados.get("results", []))
 
 
 @router.get("/pesquisa")
-async def pesquisa_series(query: str):
-    query = query.strip()
-    url = f"{BASE_URL}/search/tv?api_key={API_KEY}&language=pt-BR&query={query}"
-    dados = await cached_get_json(url)
-    return formatar_lista(dados.get("results", []))
+async def pesquisa_series(
+    query: str,
+    session: AsyncSession = Depends(get_session),
+    cache: CacheScope = Depends(cache_scope),
+):
+    resultados = await search_catalog(session, "serie", query, language="pt-BR")
+    return cache.respond(formatar_lista(resultados))
 
 
 @router.get("/detalhes/{serie_id}")
-async def detalhes_serie(serie_id: int):
-    url = f"{BASE_URL}/tv/{serie_id}?api_key={API_KEY}&language=pt-BR&append_to_response=credits,reviews,videos,images"
-    dados = await cached_get_json(url, ttl=600.0)
-    return formatar_detalhes(dados)
+async def detalhes_serie(serie_id: int, imagens: bool = False, cache: CacheScope = Depends(cache_scope)):
+    dados = await get_details("tv", serie_id, "pt-BR", include_images=imagens)
+    if cache.fresh():
+        return cache.not_modified()
+    detalhes = formatar_detalhes(dados)
+    if imagens:
+        detalhes["imagens"] = formatar_imagens(dados.get("images") or {})
+    return detalhes
 
 
 @router.get("/{serie_id}/reviews")
-async def reviews_serie(serie_id: int):
-    url = f"{BASE_URL}/tv/{serie_id}/reviews?api_key={API_KEY}&language=pt-BR&page=1"
-    dados = await cached_get_json(url)
+async def reviews_serie(serie_id: int, cache: CacheScope = Depends(cache_scope)):
+    dados = await get_section("tv", serie_id, "pt-BR", "reviews")
+    if cache.fresh():
+        return cache.not_modified()
     return [
         {"autor": r["author"], "conteudo": r["content"]}
         for r in dados.get("results", [])
@@ -145,9 +166,10 @@ async def reviews_serie(serie_id: int):
 
 
 @router.get("/{serie_id}/videos")
-async def videos_serie(serie_id: int):
-    url = f"{BASE_URL}/tv/{serie_id}/videos?api_key={API_KEY}&language=pt-BR"
-    dados = await cached_get_json(url)
+async def videos_serie(serie_id: int, cache: CacheScope = Depends(cache_scope)):
+    dados = await get_section("tv", serie_id, "pt-BR", "videos")
+    if cache.fresh():
+        return cache.not_modified()
     return [
         {"tipo": v.get("type"), "site": v.get("site"), "chave": v.get("key")}
         for v in dados.get("results", [])
@@ -156,27 +178,31 @@ async def videos_serie(serie_id: int):
 
 
 @router.get("/{serie_id}/elenco")
-async def elenco_serie(serie_id: int):
-    url = f"{BASE_URL}/tv/{serie_id}/credits?api_key={API_KEY}&language=pt-BR"
-    dados = await cached_get_json(url)
+async def elenco_serie(serie_id: int, cache: CacheScope = Depends(cache_scope)):
+    dados = await get_section("tv", serie_id, "pt-BR", "credits")
+    if cache.fresh():
+        return cache.not_modified()
     return [
         {
             "nome": c.get("name"),
             "personagem": c.get("character"),
-            "foto": f"{IMG_BASE}/w200{c['profile_path']}" if c.get("profile_path") else None,
+            "foto": image_url(c.get("profile_path"), "cast"),
         }
         for c in dados.get("cast", [])[:20]
     ]
 
 
 @router.get("/genero/{genero_id}")
-async def series_por_genero(genero_id: int):
+async def series_por_genero(genero_id: int, cache: CacheScope = Depends(cache_scope)):
     url = f"{BASE_URL}/discover/tv?api_key={API_KEY}&language=pt-BR&with_genres={genero_id}&page=1"
     dados = await cached_get_json(url)
+    if cache.fresh():
+        return cache.not_modified()
     return formatar_lista(dados.get("results", []))
 
 @router.get("/{serie_id}/onde-assistir")
-async def onde_assistir_serie(serie_id: int,pais: str = "PT"):
-    url = f"{BASE_URL}/tv/{serie_id}/watch/providers?api_key={API_KEY}"
-    dados = await cached_get_json(url)
-    return dados.get("results", {}).get(pais, {})
\ No newline at end of file
+async def onde_assistir_serie(serie_id: int, pais: str = "PT", cache: CacheScope = Depends(cache_scope)):
+    providers = await get_providers("tv", serie_id, pais)
+    if cache.fresh():
+        return cache.not_modified()
+    return providers
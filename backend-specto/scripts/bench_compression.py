@@ -0,0 +1,113 @@
+"""
+Benchmark da compressão de respostas: CPU gasto vs bytes poupados.
+
+Usa payloads sintéticos com o formato das nossas respostas (lista de um género,
+detalhes com elenco/reviews, árvore de comentários) e mede, por encoding/nível:
+  - tamanho final e rácio;
+  - tempo de compressão "a frio" (cada pedido comprime);
+  - tempo com a cache de variantes do middleware (hash + lookup).
+
+    python scripts/bench_compression.py [--repeticoes 200]
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.utils.compression import VariantCache, available_encodings, compress
+
+PALAVRAS = (
+    "filme série aventura drama comédia realizador elenco história personagem "
+    "crítica temporada episódio família amizade mistério ação futuro cidade"
+).split()
+
+
+def _texto(rng: random.Random, n: int) -> str:
+    return " ".join(rng.choice(PALAVRAS) for _ in range(n))
+
+
+def _filme(rng: random.Random, i: int) -> dict:
+    return {
+        "id": 1000 + i,
+        "titulo": _texto(rng, 3).title(),
+        "titulo_original": _texto(rng, 3).title(),
+        "sinopse": _texto(rng, 60),
+        "poster": f"https://image.tmdb.org/t/p/w342/{rng.getrandbits(64):x}.jpg",
+        "backdrop": f"https://image.tmdb.org/t/p/w500/{rng.getrandbits(64):x}.jpg",
+        "generos_ids": rng.sample([12, 16, 18, 28, 35, 80, 99, 10749], 3),
+        "data_lancamento": f"20{rng.randint(0, 24):02d}-0{rng.randint(1, 9)}-1{rng.randint(0, 9)}",
+        "nota": round(rng.uniform(4, 9), 1),
+        "adulto": False,
+    }
+
+
+def payloads() -> dict:
+    rng = random.Random(42)
+    genero = [_filme(rng, i) for i in range(100)]
+    detalhes = {
+        **_filme(rng, 0),
+        "elenco": [
+            {"nome": _texto(rng, 2).title(), "personagem": _texto(rng, 2), "foto": None}
+            for _ in range(10)
+        ],
+        "reviews": [{"autor": _texto(rng, 1), "conteudo": _texto(rng, 300)} for _ in range(5)],
+    }
+    comentarios = [
+        {
+            "id": i,
+            "texto": _texto(rng, rng.randint(5, 80)),
+            "autor": {"id": rng.randint(1, 500), "username": _texto(rng, 1)},
+            "likes": rng.randint(0, 50),
+            "respostas": [{"id": i * 100 + j, "texto": _texto(rng, 20)} for j in range(rng.randint(0, 4))],
+        }
+        for i in range(150)
+    ]
+    return {
+        name: json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        for name, data in (("genero", genero), ("detalhes", detalhes), ("comentarios", comentarios))
+    }
+
+
+def _medir(fn, repeticoes: int) -> float:
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        fn()
+    return (time.perf_counter() - inicio) / repeticoes * 1e6  # µs por chamada
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeticoes", type=int, default=200)
+    args = parser.parse_args()
+
+    configs = [("gzip", level) for level in (1, 6, 9)]
+    if "br" in available_encodings():
+        configs += [("br", quality) for quality in (1, 4, 8, 11)]
+    else:
+        print("(pacote `brotli` não instalado: só gzip)\n")
+
+    print(f"{'payload':<12} {'encoding':<9} {'original':>9} {'final':>8} {'rácio':>6} {'frio µs':>9} {'cache µs':>9}")
+    for name, body in payloads().items():
+        for encoding, level in configs:
+            kwargs = {"gzip_level": level, "brotli_quality": level}
+            final = compress(body, encoding, **kwargs)
+            frio = _medir(lambda: compress(body, encoding, **kwargs), args.repeticoes)
+
+            cache = VariantCache(max_bytes=8 * 1024 * 1024)
+            cache.get_or_compress(body, encoding, level, level)
+            quente = _medir(lambda: cache.get_or_compress(body, encoding, level, level), args.repeticoes)
+
+            label = f"{encoding}:{level}"
+            print(
+                f"{name:<12} {label:<9} {len(body):>9} {len(final):>8} "
+                f"{len(final) / len(body):>6.2f} {frio:>9.1f} {quente:>9.1f}"
+            )
+        print()
+
+
+if __name__ == "__main__":
+    main()
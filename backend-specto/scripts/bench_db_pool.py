@@ -0,0 +1,111 @@
+"""
+Benchmark: ligações diretas com pool vs modo pooler em transação (PgBouncer).
+
+Corre o mesmo trabalho (N workers concorrentes, cada um abre uma sessão e faz
+uma leitura parecida com as das rotas) contra cada configuração e imprime
+throughput e latências.
+
+    python scripts/bench_db_pool.py --duracao 15 --concorrencia 50 \
+        --direct-url postgresql://...:5432/db --pooler-url postgresql://...:6543/db
+
+Sem URLs, usa DATABASE_URL para ambas (útil para medir só o custo de
+desativar os prepared statements).
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from app.core.db import engine_kwargs
+from app.core.metrics import Timings
+from app.core.settings import settings
+from app.models import User, Visto
+
+
+def _async_url(url: str) -> str:
+    for prefix in ("postgres://", "postgresql://"):
+        if url.startswith(prefix):
+            return url.replace(prefix, "postgresql+asyncpg://", 1)
+    return url
+
+
+async def _trabalho(session: AsyncSession, user_ids: list, i: int) -> None:
+    # Leitura por índice + agregado pequeno, como em /users/{id} e /vistos
+    user_id = user_ids[i % len(user_ids)] if user_ids else 1
+    await session.scalar(select(User.username).where(User.id == user_id))
+    await session.scalar(select(func.count(Visto.id)).where(Visto.user_id == user_id))
+
+
+async def _correr(nome: str, url: str, pooler_mode: str, null_pool: bool, args) -> dict:
+    engine = create_async_engine(url, **engine_kwargs(url, pooler_mode=pooler_mode, null_pool=null_pool))
+    Session = async_sessionmaker(engine, expire_on_commit=False)
+    async with Session() as session:
+        user_ids = list((await session.scalars(select(User.id).limit(1000))).all())
+
+    latencias = Timings(window=1_000_000)
+    erros = 0
+    fim = time.perf_counter() + args.duracao
+
+    async def worker(w: int) -> None:
+        nonlocal erros
+        i = w
+        while time.perf_counter() < fim:
+            inicio = time.perf_counter()
+            try:
+                async with Session() as session:
+                    await _trabalho(session, user_ids, i)
+            except Exception:
+                erros += 1
+            else:
+                latencias.observe(time.perf_counter() - inicio)
+            i += args.concorrencia
+
+    await asyncio.gather(*(worker(w) for w in range(args.concorrencia)))
+    await engine.dispose()
+
+    stats = latencias.as_dict()
+    return {
+        "config": nome,
+        "req_s": round(stats["count"] / args.duracao, 1),
+        "erros": erros,
+        **{k: stats[k] for k in ("p50_ms", "p95_ms", "p99_ms", "max_ms")},
+    }
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--direct-url", default=settings.database_url)
+    parser.add_argument("--pooler-url", default=settings.database_url)
+    parser.add_argument("--duracao", type=float, default=10.0, help="segundos por configuração")
+    parser.add_argument("--concorrencia", type=int, default=32)
+    args = parser.parse_args()
+
+    direct, pooler = _async_url(args.direct_url), _async_url(args.pooler_url)
+    configs = [
+        ("direct + QueuePool", direct, "direct", False),
+        ("transaction + QueuePool", pooler, "transaction", False),
+        ("transaction + NullPool", pooler, "transaction", True),
+    ]
+
+    resultados = []
+    for nome, url, mode, null_pool in configs:
+        print(f"a correr: {nome} ...", flush=True)
+        resultados.append(await _correr(nome, url, mode, null_pool, args))
+
+    print()
+    print(f"{'config':<26} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8} {'erros':>6}")
+    for r in resultados:
+        print(
+            f"{r['config']:<26} {r['req_s']:>8} {r['p50_ms']:>8} {r['p95_ms']:>8} "
+            f"{r['p99_ms']:>8} {r['max_ms']:>8} {r['erros']:>6}"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
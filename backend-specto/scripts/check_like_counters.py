@@ -0,0 +1,78 @@
+"""
+Verifica se `likes_count` (comentarios / chat_messages) bate certo com as
+linhas de `likes` / `chat_likes`, e corrige com --fix.
+
+    python scripts/check_like_counters.py [--fix] [--limite 50]
+
+Sai com código 1 se encontrar divergências (e não as corrigir), para poder
+correr num cron/CI.
+"""
+import argparse
+import asyncio
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text
+
+from app.core.db import engine
+
+# (tabela alvo, tabela de likes, coluna FK nos likes)
+COUNTERS = (
+    ("comentarios", "likes", "comentario_id"),
+    ("chat_messages", "chat_likes", "message_id"),
+)
+
+
+def _divergencias_sql(target: str, likes: str, fk: str) -> str:
+    return f"""
+        SELECT t.id, t.likes_count, COALESCE(c.total, 0) AS real
+        FROM {target} t
+        LEFT JOIN (SELECT {fk} AS id, count(*) AS total FROM {likes} GROUP BY {fk}) c
+            ON c.id = t.id
+        WHERE t.likes_count <> COALESCE(c.total, 0)
+        ORDER BY t.id
+    """
+
+
+def _fix_sql(target: str, likes: str, fk: str) -> str:
+    return f"""
+        UPDATE {target} t
+        SET likes_count = d.real
+        FROM ({_divergencias_sql(target, likes, fk)}) d
+        WHERE t.id = d.id
+    """
+
+
+async def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--fix", action="store_true", help="corrige os contadores divergentes")
+    parser.add_argument("--limite", type=int, default=50, help="máx. de linhas mostradas por tabela")
+    args = parser.parse_args()
+
+    encontrou = False
+    async with engine.begin() as conn:
+        for target, likes, fk in COUNTERS:
+            rows = (await conn.execute(text(_divergencias_sql(target, likes, fk)))).all()
+            if not rows:
+                print(f"{target}: OK")
+                continue
+
+            encontrou = True
+            print(f"{target}: {len(rows)} contadores divergentes")
+            for row_id, guardado, real in rows[: args.limite]:
+                print(f"  id={row_id} likes_count={guardado} real={real}")
+
+            if args.fix:
+                # Bloqueia novos likes durante a correção para não corrigir contra um alvo em movimento
+                await conn.execute(text(f"LOCK TABLE {likes} IN SHARE MODE"))
+                result = await conn.execute(text(_fix_sql(target, likes, fk)))
+                print(f"  corrigidos: {result.rowcount}")
+
+    await engine.dispose()
+    return 1 if encontrou and not args.fix else 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,326 @@
+"""
+Verificação de planos das queries quentes (regressões de índices).
+
+Numa transação que é sempre desfeita no fim: semeia dados sintéticos com a
+distribuição típica (um utilizador com milhares de vistos, um filme com muitos
+comentários, um tópico de chat muito ativo, ...), corre ANALYZE e depois
+`EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON)` sobre os mesmos statements que as
+rotas usam. Para cada query verifica:
+  - que os índices esperados aparecem no plano;
+  - que não há Seq Scan nas tabelas grandes indicadas;
+  - orçamento de tempo de execução e de buffers lidos.
+
+    python scripts/check_query_plans.py [--escala 2] [--sem-seed] [--verbose]
+
+Usar numa DB de desenvolvimento/CI (com `alembic upgrade head`). Sai com
+código 1 se alguma query falhar o orçamento, para poder correr em CI.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, List, Tuple
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import func, select, text
+from sqlalchemy.ext.asyncio import AsyncConnection
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import ClauseElement, Executable
+
+from app.core.db import engine
+from app.models import Comentario, Like, User
+from app.routers.admin import _comments_page_query, _user_search_query
+from app.routers.comentarios import _target_comments_stmt
+from app.routers.forum import _history_stmt
+from app.routers.vistos import _vistos_stmt
+from routes.filmes import _genre_cache_stmt
+
+
+class Explain(Executable, ClauseElement):
+    """`EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) <statement>` com os binds do statement."""
+
+    inherit_cache = False
+
+    def __init__(self, statement) -> None:
+        self.statement = statement
+
+
+@compiles(Explain, "postgresql")
+def _compile_explain(element, compiler, **kw):
+    return "EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + compiler.process(element.statement, **kw)
+
+
+# ----------------- Dados sintéticos -----------------
+# Volumes base (multiplicados por --escala). Os ids explícitos começam depois
+# dos que já existem. Tudo é desfeito no fim, mas o rollback não desfaz o
+# nextval(): as sequências de vistos, likes, chat_messages e tmdb_cached_filmes
+# avançam (só ficam buracos nos ids, sem outro efeito).
+BASE = {
+    "users": 20_000,
+    "filmes": 5_000,
+    "series": 2_000,
+    "comentarios": 100_000,
+    "topics": 500,
+    "chat_messages": 200_000,
+    "generos": 20,
+    "cache_por_genero": 400,
+}
+
+SEED_SQL = (
+    """
+    INSERT INTO users (id, username, email, senha_hash, criado_em)
+    SELECT :u0 + g, 'plancheck_' || g, 'plancheck_' || g || '@example.com', 'x',
+           now() - make_interval(mins => g)
+    FROM generate_series(1, :users) g
+    """,
+    """
+    INSERT INTO filmes (id, tmdb_id, titulo)
+    SELECT :f0 + g, 900000000 + g, 'Filme ' || g FROM generate_series(1, :filmes) g
+    """,
+    """
+    INSERT INTO series (id, tmdb_id, nome)
+    SELECT :s0 + g, 900000000 + g, 'Serie ' || g FROM generate_series(1, :series) g
+    """,
+    # Vistos com cauda longa: o utilizador de rank r tem ~2000/r + 5 filmes
+    """
+    INSERT INTO vistos (user_id, filme_id, data_visto, favorito)
+    SELECT :u0 + r, :f0 + ((r * 131 + g) % :filmes) + 1,
+           now() - make_interval(hours => g), g % 7 = 0
+    FROM generate_series(1, :users) r,
+         LATERAL generate_series(1, LEAST(:filmes - 1, 2000 / r + 5)) g
+    """,
+    """
+    INSERT INTO vistos (user_id, serie_id, data_visto)
+    SELECT :u0 + r, :s0 + ((r * 37 + g) % :series) + 1, now() - make_interval(hours => g)
+    FROM generate_series(1, :users) r,
+         LATERAL generate_series(1, LEAST(:series - 1, 500 / r + 2)) g
+    """,
+    # 2% dos comentários no filme "quente" (o 1.º); 1 em cada 10 em séries
+    """
+    INSERT INTO comentarios (id, user_id, filme_id, serie_id, texto, criado_em)
+    SELECT :c0 + g, :u0 + (g * 13 % :users) + 1,
+           CASE WHEN g % 10 = 0 THEN NULL WHEN g % 50 = 1 THEN :f0 + 1 ELSE :f0 + (g * 7 % :filmes) + 1 END,
+           CASE WHEN g % 10 = 0 THEN :s0 + (g * 3 % :series) + 1 END,
+           'comentário ' || g, now() - make_interval(secs => g)
+    FROM generate_series(1, :comentarios) g
+    """,
+    # 3 likes por comentário, de utilizadores a users/3 de distância (nunca o mesmo par)
+    """
+    INSERT INTO likes (user_id, comentario_id)
+    SELECT :u0 + ((g + (k - 1) * (:users / 3)) % :users) + 1, :c0 + g
+    FROM generate_series(1, :comentarios) g, generate_series(1, 3) k
+    WHERE g % 3 = 0
+    ON CONFLICT DO NOTHING
+    """,
+    """
+    INSERT INTO forum_topics (id, type, title, tmdb_id, media_type)
+    SELECT :t0 + g, 'movies', 'Tópico ' || g, 900000000 + g, 'movie' FROM generate_series(1, :topics) g
+    """,
+    # Metade das mensagens no tópico "quente" (o 1.º)
+    """
+    INSERT INTO chat_messages (topic_id, user_id, message, created_at)
+    SELECT CASE WHEN g % 2 = 0 THEN :t0 + 1 ELSE :t0 + (g % :topics) + 1 END,
+           :u0 + (g % :users) + 1, 'mensagem ' || g, now() - make_interval(secs => g)
+    FROM generate_series(1, :chat_messages) g
+    """,
+    """
+    INSERT INTO tmdb_cached_filmes (tmdb_id, genero_id, ordem, payload, cached_em)
+    SELECT 900000000 + o, 900000 + gen, o, jsonb_build_object('id', 900000000 + o, 'titulo', 'Filme ' || o),
+           now() - make_interval(mins => o)
+    FROM generate_series(1, :generos) gen, generate_series(1, :cache_por_genero) o
+    """,
+)
+
+ANALYZE_TABLES = (
+    "users", "filmes", "series", "vistos", "comentarios", "likes",
+    "forum_topics", "chat_messages", "tmdb_cached_filmes",
+)
+
+
+async def seed(conn: AsyncConnection, escala: float) -> None:
+    params = {name: max(1, int(n * escala)) for name, n in BASE.items()}
+    for name, table in (("u0", "users"), ("f0", "filmes"), ("s0", "series"), ("c0", "comentarios"), ("t0", "forum_topics")):
+        params[name] = await conn.scalar(text(f"SELECT COALESCE(max(id), 0) FROM {table}"))
+    for sql in SEED_SQL:
+        await conn.execute(text(sql), params)
+    for table in ANALYZE_TABLES:
+        await conn.execute(text(f"ANALYZE {table}"))
+
+
+async def pick_targets(conn: AsyncConnection) -> Dict[str, int]:
+    """Os alvos "quentes" (e um frio) presentes na DB, semeados ou não."""
+    queries = {
+        "heavy_user": "SELECT user_id FROM vistos GROUP BY user_id ORDER BY count(*) DESC LIMIT 1",
+        "commenter": "SELECT user_id FROM comentarios GROUP BY user_id ORDER BY count(*) DESC LIMIT 1",
+        "hot_filme": "SELECT filme_id FROM comentarios WHERE filme_id IS NOT NULL GROUP BY filme_id ORDER BY count(*) DESC LIMIT 1",
+        "cold_filme": "SELECT filme_id FROM comentarios WHERE filme_id IS NOT NULL GROUP BY filme_id ORDER BY count(*) ASC LIMIT 1",
+        "hot_topic": "SELECT topic_id FROM chat_messages GROUP BY topic_id ORDER BY count(*) DESC LIMIT 1",
+        "genero": "SELECT genero_id FROM tmdb_cached_filmes GROUP BY genero_id ORDER BY count(*) DESC LIMIT 1",
+        "search_user": "SELECT username::text FROM users ORDER BY id DESC LIMIT 1",
+    }
+    targets = {}
+    for name, sql in queries.items():
+        value = await conn.scalar(text(sql))
+        if value is None:
+            raise SystemExit(f"Sem dados para '{name}': correr sem --sem-seed")
+        targets[name] = value
+    return targets
+
+
+# ----------------- Queries e orçamentos -----------------
+@dataclass
+class PlanCheck:
+    name: str
+    statement: Callable[[Dict[str, int]], object]
+    indexes: Tuple[str, ...]                       # têm de aparecer no plano
+    no_seq_scan: Tuple[str, ...] = ()              # tabelas que não podem ter Seq Scan
+    max_ms: float = 50.0
+    max_buffers: int = 5_000                       # shared hit + read
+    problems: List[str] = field(default_factory=list)
+
+
+CHECKS = (
+    PlanCheck(
+        "vistos (utilizador com mais vistos)",
+        lambda t: _vistos_stmt(t["heavy_user"]),
+        ("vistos_user_data_idx",), ("vistos",), max_ms=150, max_buffers=20_000,
+    ),
+    PlanCheck(
+        "perfil: total de comentários",
+        lambda t: select(func.count(Comentario.id)).where(Comentario.user_id == t["commenter"]),
+        ("comentarios_user_idx",), ("comentarios",),
+    ),
+    PlanCheck(
+        "perfil: likes recebidos",
+        lambda t: select(func.count(Like.id))
+        .join(Comentario, Like.comentario_id == Comentario.id)
+        .where(Comentario.user_id == t["commenter"]),
+        ("comentarios_user_idx", "likes_comentario_idx"), ("comentarios", "likes"),
+    ),
+    PlanCheck(
+        "árvore de comentários (filme quente)",
+        lambda t: _target_comments_stmt("filme", t["hot_filme"]),
+        ("comentarios_filme_criado_idx",), ("comentarios",), max_ms=100, max_buffers=10_000,
+    ),
+    PlanCheck(
+        "árvore de comentários (filme frio)",
+        lambda t: _target_comments_stmt("filme", t["cold_filme"]),
+        ("comentarios_filme_criado_idx",), ("comentarios",), max_ms=10, max_buffers=200,
+    ),
+    PlanCheck(
+        "histórico do chat (tópico quente)",
+        lambda t: _history_stmt(t["hot_topic"], since=datetime.now(timezone.utc) - timedelta(days=30)),
+        ("chat_messages_topic_created_idx",), ("chat_messages",), max_ms=10, max_buffers=500,
+    ),
+    PlanCheck(
+        "cache de géneros",
+        lambda t: _genre_cache_stmt(t["genero"], allow_stale=True),
+        ("tmdb_cache_genero_cached_idx",), ("tmdb_cached_filmes",), max_ms=30,
+    ),
+    PlanCheck(
+        "admin: utilizadores (1.ª página)",
+        lambda t: select(User).order_by(User.id).limit(51),
+        ("users_pkey",), ("users",), max_ms=10, max_buffers=200,
+    ),
+    PlanCheck(
+        "admin: pesquisa de utilizadores",
+        lambda t: _user_search_query(t["search_user"], 50, 0, None),
+        ("users_username_trgm",), ("users",), max_ms=100,
+    ),
+    PlanCheck(
+        "admin: comentários (1.ª página)",
+        lambda t: _comments_page_query(50),
+        ("ix_comentarios_criado_em_id",), ("comentarios",), max_ms=10, max_buffers=1_000,
+    ),
+)
+
+
+async def _index_aliases(conn: AsyncConnection, index: str) -> set:
+    """O índice e, se for de uma tabela particionada, os índices das partições."""
+    rows = await conn.execute(
+        text(
+            """
+            SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = to_regclass(:index)
+            """
+        ),
+        {"index": index},
+    )
+    return {index} | {name for (name,) in rows}
+
+
+def _walk(node: dict):
+    yield node
+    for child in node.get("Plans", []):
+        yield from _walk(child)
+
+
+async def run_check(conn: AsyncConnection, check: PlanCheck, targets: Dict[str, int]) -> dict:
+    raw = await conn.scalar(Explain(check.statement(targets)))
+    plan = (json.loads(raw) if isinstance(raw, str) else raw)[0]
+    root = plan["Plan"]
+    nodes = list(_walk(root))
+
+    used = {n["Index Name"] for n in nodes if "Index Name" in n}
+    # Nas tabelas particionadas o plano mostra a partição, não a tabela-mãe
+    seq_scans = {n["Relation Name"] for n in nodes if n["Node Type"] == "Seq Scan"}
+    seq_scans |= {name.rsplit("_", 2)[0] for name in seq_scans if name.startswith("chat_messages_")}
+    elapsed = plan["Execution Time"]
+    buffers = root.get("Shared Hit Blocks", 0) + root.get("Shared Read Blocks", 0)
+
+    for index in check.indexes:
+        if not used & await _index_aliases(conn, index):
+            check.problems.append(f"índice {index} não usado")
+    for table in check.no_seq_scan:
+        if table in seq_scans:
+            check.problems.append(f"Seq Scan em {table}")
+    if elapsed > check.max_ms:
+        check.problems.append(f"{elapsed:.1f} ms > {check.max_ms} ms")
+    if buffers > check.max_buffers:
+        check.problems.append(f"{buffers} buffers > {check.max_buffers}")
+
+    return {"plan": plan, "elapsed": elapsed, "buffers": buffers, "rows": root.get("Actual Rows", 0)}
+
+
+async def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--escala", type=float, default=1.0, help="multiplicador dos volumes sintéticos")
+    parser.add_argument("--sem-seed", action="store_true", help="usa só os dados que já existem na DB")
+    parser.add_argument("--verbose", action="store_true", help="imprime o plano JSON das queries que falham")
+    args = parser.parse_args()
+
+    falhas = 0
+    async with engine.connect() as conn:
+        trans = await conn.begin()
+        try:
+            if not args.sem_seed:
+                print(f"a semear dados sintéticos (escala {args.escala}) ...", flush=True)
+                await seed(conn, args.escala)
+            targets = await pick_targets(conn)
+
+            print()
+            print(f"{'query':<40} {'ms':>8} {'buffers':>8} {'linhas':>7}  resultado")
+            for check in CHECKS:
+                result = await run_check(conn, check, targets)
+                estado = "ok" if not check.problems else "FALHA: " + "; ".join(check.problems)
+                print(f"{check.name:<40} {result['elapsed']:>8.2f} {result['buffers']:>8} {result['rows']:>7}  {estado}")
+                if check.problems:
+                    falhas += 1
+                    if args.verbose:
+                        print(json.dumps(result["plan"]["Plan"], indent=2, ensure_ascii=False))
+        finally:
+            # Nada do que foi semeado fica na DB
+            await trans.rollback()
+    await engine.dispose()
+
+    print()
+    print(f"{len(CHECKS) - falhas}/{len(CHECKS)} queries dentro do orçamento")
+    return 1 if falhas else 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
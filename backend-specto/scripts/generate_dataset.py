@@ -0,0 +1,374 @@
+"""
+Gerador de dados sintéticos à escala de produção (para testes de carga/perf).
+
+Carrega com COPY (asyncpg `copy_records_to_table`) utilizadores, filmes,
+séries, vistos, árvores de comentários com likes, tópicos do fórum, mensagens
+do chat com likes e conquistas desbloqueadas. As distribuições são enviesadas
+como na realidade: popularidade dos títulos e atividade dos utilizadores
+seguem uma lei de Zipf, likes por comentário/mensagem têm cauda longa.
+
+É determinístico: o mesmo --seed e a mesma --referencia geram exatamente os
+mesmos dados, por isso os benchmarks são comparáveis entre corridas.
+
+    python scripts/generate_dataset.py --users 1000000 --vistos 20000000 \
+        --comentarios 5000000 --mensagens 10000000 --seed 42 [--truncate]
+
+Sem --truncate os dados são acrescentados depois dos ids que já existem.
+Os contadores `likes_count` são escritos já calculados (os triggers de likes
+ficam desligados durante o COPY) e o XP/nível dos utilizadores é recalculado
+no fim.
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+from bisect import bisect_left
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from itertools import accumulate
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text
+
+from app.core.db import engine
+from app.core.security import hash_password
+from app.services.chat_partitions import ensure_partition_range
+from app.services.gamification import GamificationService
+
+# Todas as contas geradas têm esta password (útil para o teste de carga)
+PASSWORD = "specto-load"
+TMDB_ID_BASE = 800_000_000
+# Referência fixa por omissão: com a mesma seed, os dados (e os benchmarks) não
+# mudam de um mês para o outro
+REFERENCIA_PADRAO = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+GENERATED_TABLES = (
+    "users", "filmes", "series", "vistos", "comentarios", "likes",
+    "forum_topics", "chat_messages", "chat_likes", "user_achievements",
+)
+LIKE_TRIGGERS = (("likes", "likes_count"), ("chat_likes", "chat_likes_count"))
+
+
+class Zipf:
+    """Amostragem de índices 0..n-1 com peso 1/(i+1)^s (o índice 0 é o mais popular)."""
+
+    def __init__(self, n: int, s: float) -> None:
+        self.n = n
+        self.cum = list(accumulate(1.0 / (i + 1) ** s for i in range(n)))
+        self.total = self.cum[-1]
+
+    def weight(self, i: int) -> float:
+        return (self.cum[i] - (self.cum[i - 1] if i else 0.0)) / self.total
+
+    def sample(self, rng: random.Random) -> int:
+        return bisect_left(self.cum, rng.random() * self.total)
+
+
+def _item_rng(seed: int, kind: int, item_id: int) -> random.Random:
+    # RNG próprio por comentário/mensagem: as duas passagens (linha + likes)
+    # reproduzem os mesmos valores sem guardar nada em memória.
+    return random.Random((seed * 1_000_003 + kind) * 10_000_019 + item_id)
+
+
+def _likes_for(seed: int, kind: int, item_id: int, users: int, u0: int, cap: int) -> List[int]:
+    rng = _item_rng(seed, kind, item_id)
+    k = min(cap, users, int(rng.paretovariate(1.3)) - 1)
+    return [u0 + 1 + i for i in rng.sample(range(users), k)] if k > 0 else []
+
+
+class Generator:
+    def __init__(self, args, offsets: Dict[str, int], achievements: Sequence[Tuple[int, int]]) -> None:
+        self.args = args
+        self.o = offsets
+        self.achievements = achievements
+        self.rng = random.Random(args.seed)
+        self.ref = args.referencia
+        self.span = timedelta(days=args.dias).total_seconds()
+        self.title_pop = Zipf(args.filmes + args.series, args.zipf)
+        self.user_pop = Zipf(args.users, args.zipf)
+        # Rank de popularidade -> id (baralhado, para os ids baixos não serem sempre os populares)
+        self.title_by_rank = list(range(args.filmes + args.series))
+        self.user_by_rank = list(range(args.users))
+        self.rng.shuffle(self.title_by_rank)
+        self.rng.shuffle(self.user_by_rank)
+
+    # ---- helpers ----
+    def _when(self, rng: random.Random) -> datetime:
+        return self.ref - timedelta(seconds=rng.random() * self.span)
+
+    def _title(self, idx: int) -> Tuple[Optional[int], Optional[int]]:
+        """(filme_id, serie_id) para o índice global de título."""
+        if idx < self.args.filmes:
+            return self.o["filmes"] + 1 + idx, None
+        return None, self.o["series"] + 1 + idx - self.args.filmes
+
+    def _user(self, rank: int) -> int:
+        return self.o["users"] + 1 + self.user_by_rank[rank]
+
+    # ---- tabelas ----
+    def users(self, senha_hash: str) -> Iterator[tuple]:
+        for i in range(1, self.args.users + 1):
+            uid = self.o["users"] + i
+            criado = self.ref - timedelta(seconds=self.span * (1 - i / self.args.users))
+            yield (uid, f"load_{uid}", f"load_{uid}@example.com", senha_hash, criado, "user")
+
+    def filmes(self) -> Iterator[tuple]:
+        rng = self.rng
+        for i in range(1, self.args.filmes + 1):
+            fid = self.o["filmes"] + i
+            yield (
+                fid, TMDB_ID_BASE + fid, f"Filme sintético {fid}", 1950 + rng.randrange(76),
+                f"Sinopse do filme {fid}.", f"/poster_f{fid}.jpg", f"/backdrop_f{fid}.jpg",
+                round(rng.uniform(3, 9.5), 1), rng.randrange(20_000),
+            )
+
+    def series(self) -> Iterator[tuple]:
+        rng = self.rng
+        for i in range(1, self.args.series + 1):
+            sid = self.o["series"] + i
+            estreia = datetime(1970, 1, 1).date() + timedelta(days=rng.randrange(20_000))
+            yield (
+                sid, TMDB_ID_BASE + sid, f"Série sintética {sid}", estreia,
+                f"Sinopse da série {sid}.", f"/poster_s{sid}.jpg", f"/backdrop_s{sid}.jpg",
+                round(rng.uniform(3, 9.5), 1), rng.randrange(20_000),
+            )
+
+    def _vistos_por_user(self) -> List[int]:
+        """
+        Vistos de cada utilizador (por rank): Zipf repartido pelo método dos
+        maiores restos, com o excesso de quem passa o máximo (metade dos
+        títulos) redistribuído pelos restantes; a soma é exatamente --vistos.
+        """
+        n_users, n_titles = self.args.users, self.args.filmes + self.args.series
+        cap = max(1, n_titles // 2)
+        weights = [self.user_pop.weight(rank) for rank in range(n_users)]
+        remaining = min(self.args.vistos, cap * n_users)
+        counts = [0] * n_users
+        # Os pesos descem com o rank: quem chega ao máximo é sempre um prefixo
+        first, total_weight = 0, sum(weights)
+        while first < n_users and remaining * weights[first] / total_weight >= cap:
+            counts[first] = cap
+            remaining -= cap
+            total_weight -= weights[first]
+            first += 1
+        if first == n_users or remaining <= 0:
+            return counts
+        quotas = [(remaining * weights[rank] / total_weight, rank) for rank in range(first, n_users)]
+        for quota, rank in quotas:
+            counts[rank] = int(quota)
+        leftover = remaining - sum(counts[first:])
+        for _, rank in sorted(quotas, key=lambda q: (q[0] - int(q[0]), -q[1]), reverse=True)[:leftover]:
+            counts[rank] += 1
+        return counts
+
+    def vistos(self) -> Iterator[tuple]:
+        rng = self.rng
+        vid = self.o["vistos"]
+        for rank, count in enumerate(self._vistos_por_user()):
+            seen = set()
+            while len(seen) < count:
+                seen.add(self.title_by_rank[self.title_pop.sample(rng)])
+            uid = self._user(rank)
+            for idx in sorted(seen):
+                vid += 1
+                filme_id, serie_id = self._title(idx)
+                yield (vid, uid, filme_id, serie_id, self._when(rng), rng.random() < 0.12)
+
+    def comentarios(self) -> Iterator[tuple]:
+        rng, args = self.rng, self.args
+        recent: Dict[int, deque] = {}
+        step = self.span / max(1, args.comentarios)
+        start = self.ref - timedelta(seconds=self.span)
+        for i in range(1, args.comentarios + 1):
+            cid = self.o["comentarios"] + i
+            idx = self.title_by_rank[self.title_pop.sample(rng)]
+            filme_id, serie_id = self._title(idx)
+            fila = recent.setdefault(idx, deque(maxlen=50))
+            pai = rng.choice(fila) if fila and rng.random() < args.respostas else None
+            fila.append(cid)
+            likes = len(_likes_for(args.seed, 1, cid, args.users, self.o["users"], args.max_likes))
+            # Ordem cronológica: uma resposta é sempre posterior ao comentário pai
+            yield (
+                cid, self._user(self.user_pop.sample(rng)), filme_id, serie_id, pai,
+                f"Comentário sintético {cid}", start + timedelta(seconds=i * step), likes,
+            )
+
+    def likes(self) -> Iterator[tuple]:
+        args, lid = self.args, self.o["likes"]
+        for i in range(1, args.comentarios + 1):
+            cid = self.o["comentarios"] + i
+            for uid in _likes_for(args.seed, 1, cid, args.users, self.o["users"], args.max_likes):
+                lid += 1
+                yield (lid, uid, cid)
+
+    def topics(self) -> Iterator[tuple]:
+        # Os títulos mais populares têm tópico (um por título: índice único)
+        for rank in range(self.args.topics):
+            idx = self.title_by_rank[rank]
+            filme_id, serie_id = self._title(idx)
+            tmdb_id = TMDB_ID_BASE + (filme_id or serie_id)
+            media = "movie" if filme_id else "tv"
+            yield (self.o["forum_topics"] + rank + 1, "custom", f"Tópico {rank + 1}", f"Discussão {rank + 1}", tmdb_id, media)
+
+    def mensagens(self) -> Iterator[tuple]:
+        rng, args = self.rng, self.args
+        topic_pop = Zipf(args.topics, args.zipf)
+        for i in range(1, args.mensagens + 1):
+            mid = self.o["chat_messages"] + i
+            likes = len(_likes_for(args.seed, 2, mid, args.users, self.o["users"], args.max_likes))
+            yield (
+                mid, self.o["forum_topics"] + 1 + topic_pop.sample(rng), self._user(self.user_pop.sample(rng)),
+                f"Mensagem sintética {mid}", self._when(rng), likes,
+            )
+
+    def chat_likes(self) -> Iterator[tuple]:
+        args, lid = self.args, self.o["chat_likes"]
+        for i in range(1, args.mensagens + 1):
+            mid = self.o["chat_messages"] + i
+            for uid in _likes_for(args.seed, 2, mid, args.users, self.o["users"], args.max_likes):
+                lid += 1
+                yield (lid, uid, mid)
+
+    def user_achievements(self) -> Iterator[tuple]:
+        # Os utilizadores mais ativos desbloqueiam mais conquistas (por ordem de dificuldade)
+        uaid = self.o["user_achievements"]
+        n = len(self.achievements)
+        for rank in range(self.args.users):
+            k = min(n, int(n * (1 - rank / self.args.users) ** 3))
+            for achievement_id, _ in self.achievements[:k]:
+                uaid += 1
+                yield (uaid, self._user(rank), achievement_id, self.ref)
+
+
+COPY_PLAN = (
+    ("users", ("id", "username", "email", "senha_hash", "criado_em", "role")),
+    ("filmes", ("id", "tmdb_id", "titulo", "ano", "descricao", "poster_path", "backdrop_path", "media_avaliacao", "votos")),
+    ("series", ("id", "tmdb_id", "nome", "primeira_exibicao", "descricao", "poster_path", "backdrop_path", "media_avaliacao", "votos")),
+    ("vistos", ("id", "user_id", "filme_id", "serie_id", "data_visto", "favorito")),
+    ("comentarios", ("id", "user_id", "filme_id", "serie_id", "comentario_pai_id", "texto", "criado_em", "likes_count")),
+    ("likes", ("id", "user_id", "comentario_id")),
+    ("forum_topics", ("id", "type", "title", "description", "tmdb_id", "media_type")),
+    ("chat_messages", ("id", "topic_id", "user_id", "message", "created_at", "likes_count")),
+    ("chat_likes", ("id", "user_id", "message_id")),
+    ("user_achievements", ("id", "user_id", "achievement_id", "unlocked_at")),
+)
+
+
+def _xp_sql() -> str:
+    levels = sorted(GamificationService.LEVEL_THRESHOLDS.items(), reverse=True)
+    level_case = " ".join(f"WHEN xp >= {threshold} THEN {level}" for level, threshold in levels)
+    return f"""
+        WITH v AS (
+            SELECT user_id, count(*) AS vistos, count(*) FILTER (WHERE favorito) AS favoritos
+            FROM vistos WHERE user_id > :u0 GROUP BY user_id
+        ), c AS (
+            SELECT user_id, count(*) AS comentarios FROM comentarios WHERE user_id > :u0 GROUP BY user_id
+        )
+        UPDATE users u SET xp = COALESCE(v.vistos, 0) * {GamificationService.XP_PER_WATCHED}
+                              + COALESCE(v.favoritos, 0) * {GamificationService.XP_PER_FAVORITE}
+                              + COALESCE(c.comentarios, 0) * {GamificationService.XP_PER_COMMENT}
+        FROM users x
+        LEFT JOIN v ON v.user_id = x.id
+        LEFT JOIN c ON c.user_id = x.id
+        WHERE u.id = x.id AND x.id > :u0
+    """, f"UPDATE users SET level = CASE {level_case} ELSE 1 END WHERE id > :u0"
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--filmes", type=int, default=20_000)
+    parser.add_argument("--series", type=int, default=5_000)
+    parser.add_argument("--vistos", type=int, default=2_000_000, help="total (limitado a metade dos títulos por utilizador)")
+    parser.add_argument("--comentarios", type=int, default=500_000)
+    parser.add_argument("--respostas", type=float, default=0.35, help="fração de comentários que são respostas")
+    parser.add_argument("--topics", type=int, default=2_000)
+    parser.add_argument("--mensagens", type=int, default=1_000_000)
+    parser.add_argument("--max-likes", type=int, default=500, help="máximo de likes por comentário/mensagem")
+    parser.add_argument("--zipf", type=float, default=1.1, help="expoente da lei de Zipf")
+    parser.add_argument("--dias", type=int, default=365, help="janela temporal dos dados")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument(
+        "--referencia",
+        type=lambda s: datetime.fromisoformat(s).replace(tzinfo=timezone.utc),
+        default=REFERENCIA_PADRAO,
+        help=f"instante mais recente dos dados (ISO; por omissão {REFERENCIA_PADRAO:%Y-%m-%d}, fixo "
+        "para as corridas serem comparáveis; usar uma data recente para o histórico do chat ter dados)",
+    )
+    parser.add_argument("--truncate", action="store_true", help="APAGA as tabelas geradas antes de carregar")
+    args = parser.parse_args()
+    args.topics = min(args.topics, args.filmes + args.series)
+    max_vistos = max(1, (args.filmes + args.series) // 2) * args.users
+    if args.vistos > max_vistos:
+        print(f"aviso: --vistos limitado a {max_vistos} (metade dos títulos por utilizador)")
+        args.vistos = max_vistos
+
+    print(f"referência {args.referencia:%Y-%m-%d} (seed {args.seed}): usar as mesmas para comparar corridas")
+    inicio_total = time.perf_counter()
+    async with engine.begin() as conn:
+        if args.truncate:
+            await conn.execute(text(f"TRUNCATE {', '.join(GENERATED_TABLES)} RESTART IDENTITY CASCADE"))
+
+        offsets = {
+            table: await conn.scalar(text(f"SELECT COALESCE(max(id), 0) FROM {table}"))
+            for table in GENERATED_TABLES
+        }
+        achievements = (await conn.execute(text("SELECT id, condition_value FROM achievements ORDER BY condition_value, id"))).all()
+        if not achievements:
+            print("aviso: tabela achievements vazia (correr scripts/seed_achievements.py); sem conquistas")
+
+        gen = Generator(args, offsets, [tuple(a) for a in achievements])
+        await ensure_partition_range(conn, args.referencia - timedelta(days=args.dias), args.referencia)
+
+        raw = await conn.get_raw_connection()
+        driver = raw.driver_connection
+        sources = {
+            "users": lambda: gen.users(hash_password(PASSWORD)),
+            "filmes": gen.filmes,
+            "series": gen.series,
+            "vistos": gen.vistos,
+            "comentarios": gen.comentarios,
+            "likes": gen.likes,
+            "forum_topics": gen.topics,
+            "chat_messages": gen.mensagens,
+            "chat_likes": gen.chat_likes,
+            "user_achievements": gen.user_achievements,
+        }
+
+        # likes_count já vem calculado: os triggers de contagem ficam desligados no COPY
+        for table, trigger in LIKE_TRIGGERS:
+            await conn.execute(text(f"ALTER TABLE {table} DISABLE TRIGGER {trigger}"))
+        try:
+            for table, columns in COPY_PLAN:
+                inicio = time.perf_counter()
+                status = await driver.copy_records_to_table(table, records=sources[table](), columns=list(columns))
+                print(f"{table:<18} {status:>20}  {time.perf_counter() - inicio:7.1f} s", flush=True)
+        finally:
+            for table, trigger in LIKE_TRIGGERS:
+                await conn.execute(text(f"ALTER TABLE {table} ENABLE TRIGGER {trigger}"))
+
+        # Sequências a seguir aos ids explícitos
+        for table in GENERATED_TABLES:
+            await conn.execute(text(
+                f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), GREATEST((SELECT max(id) FROM {table}), 1))"
+            ))
+
+        xp_sql, level_sql = _xp_sql()
+        await conn.execute(text(xp_sql), {"u0": offsets["users"]})
+        await conn.execute(text(level_sql), {"u0": offsets["users"]})
+
+    # ANALYZE fora da transação, para o planner ver os volumes novos
+    async with engine.connect() as conn:
+        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+        for table in GENERATED_TABLES:
+            await conn.execute(text(f"ANALYZE {table}"))
+    await engine.dispose()
+    print(f"\nconcluído em {time.perf_counter() - inicio_total:.1f} s (seed {args.seed}, referência {args.referencia:%Y-%m-%d})")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
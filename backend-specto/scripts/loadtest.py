@@ -0,0 +1,464 @@
+"""
+Teste de carga ponta a ponta com relatório de latências por rota (SLO).
+
+Corre a app real (`main:app`) no mesmo processo (httpx.ASGITransport; o chat
+por um cliente WebSocket ASGI mínimo) contra o Postgres configurado em
+DATABASE_URL. A TMDb é substituída por um servidor local: respostas gravadas
+(--tmdb-fixtures, com --gravar para as capturar da TMDb real) ou, em falta,
+sintetizadas de forma determinística, sempre com latência simulada.
+
+Cada utilizador virtual faz login e repete jornadas com pesos realistas:
+página inicial, detalhes, marcar visto, comentar, dar like, fórum e chat.
+No fim imprime throughput e p50/p95/p99 por rota e compara com a baseline.
+
+    python scripts/generate_dataset.py --users 20000 ...   # contas load_*
+    python scripts/loadtest.py --vus 50 --duracao 60 --baseline scripts/loadtest_baselines/local.json
+    python scripts/loadtest.py ... --salvar-baseline        # grava a corrida como nova baseline
+
+Sai com código 1 se alguma rota passar o SLO de p95 ou regredir mais do que
+--tolerancia face à baseline. Sem baseline gravada a comparação não é feita
+(e é dito no fim); com --exigir-baseline o script sai logo com código 2.
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import random
+import sys
+import time
+from collections import defaultdict
+from contextlib import suppress
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlencode
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+from sqlalchemy import select
+
+from app.core.db import SessionLocal, engine
+from app.core.metrics import Timings
+from app.models import User
+from app.utils import http_cache
+from scripts.generate_dataset import PASSWORD
+
+# Relativa ao script, não à pasta de onde se corre
+DEFAULT_BASELINE = Path(__file__).resolve().parent / "loadtest_baselines" / "default.json"
+
+TMDB_HOST = "api.themoviedb.org"
+CATALOG_SIZE = 2_000  # ids TMDb usados pelo substituto e pelas jornadas
+
+
+# ----------------- Substituto da TMDb -----------------
+class TmdbStandIn:
+    """Transporte httpx que responde aos pedidos à TMDb sem sair da máquina."""
+
+    def __init__(self, latency_ms: float, fixtures: Optional[Path], record: bool) -> None:
+        self.latency = latency_ms / 1000
+        self.fixtures = fixtures
+        self.record = record
+        self.requests = 0
+        self.replayed = 0
+        self._real = httpx.AsyncClient(timeout=10.0) if record else None
+
+    def _fixture_path(self, request: httpx.URL) -> Path:
+        params = sorted((k, v) for k, v in request.params.multi_items() if k != "api_key")
+        key = request.path + "?" + urlencode(params)
+        digest = hashlib.sha1(key.encode()).hexdigest()[:12]
+        return self.fixtures / f"{request.path.strip('/').replace('/', '_')}__{digest}.json"
+
+    async def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.requests += 1
+        if self.fixtures:
+            path = self._fixture_path(request.url)
+            if path.exists():
+                self.replayed += 1
+                await asyncio.sleep(self.latency)
+                return httpx.Response(200, content=path.read_bytes(), headers={"content-type": "application/json"})
+            if self._real is not None:
+                real = await self._real.get(str(request.url))
+                if real.status_code == 200:
+                    path.parent.mkdir(parents=True, exist_ok=True)
+                    path.write_bytes(real.content)
+                return httpx.Response(real.status_code, content=real.content, headers={"content-type": "application/json"})
+        await asyncio.sleep(self.latency)
+        return httpx.Response(200, json=self._synthesize(request.url))
+
+    @staticmethod
+    def _item(tmdb_id: int, tv: bool = False) -> dict:
+        rng = random.Random(tmdb_id)
+        base = {
+            "id": tmdb_id,
+            "overview": f"Sinopse {tmdb_id}",
+            "poster_path": f"/p{tmdb_id}.jpg",
+            "backdrop_path": f"/b{tmdb_id}.jpg",
+            "vote_average": round(rng.uniform(4, 9), 1),
+            "vote_count": rng.randrange(10_000),
+            "genre_ids": [28, 12, 18][: rng.randrange(1, 4)],
+            "popularity": rng.uniform(1, 500),
+            "adult": False,
+        }
+        if tv:
+            base.update(name=f"Série {tmdb_id}", original_name=f"Series {tmdb_id}", first_air_date="2020-01-01")
+        else:
+            base.update(title=f"Filme {tmdb_id}", original_title=f"Movie {tmdb_id}", release_date="2020-01-01")
+        return base
+
+    def _synthesize(self, url: httpx.URL) -> Any:
+        parts = [p for p in url.path.split("/") if p and p != "3"]
+        tv = parts[0] == "tv" if parts else False
+        page = int(url.params.get("page", "1"))
+        numeric = [p for p in parts if p.isdigit()]
+        if numeric and parts[-1].isdigit():
+            detail = self._item(int(numeric[0]), tv)
+            detail.update(genres=[{"id": 28, "name": "Ação"}], runtime=110, status="Released")
+            return detail
+        if numeric:
+            sub = parts[-1]
+            if sub == "credits":
+                return {"id": int(numeric[0]), "cast": [{"id": i, "name": f"Ator {i}", "character": "—", "profile_path": f"/a{i}.jpg"} for i in range(1, 16)], "crew": []}
+            if sub == "providers":
+                return {"id": int(numeric[0]), "results": {"PT": {"link": "https://example.com", "flatrate": []}}}
+            return {"id": int(numeric[0]), "page": 1, "results": [], "total_pages": 0, "total_results": 0}
+        # Listas (populares, descoberta, pesquisa): 20 por página, ids estáveis
+        start = ((page - 1) * 20) % CATALOG_SIZE
+        results = [self._item(start + i + 1, tv) for i in range(20)]
+        return {"page": page, "results": results, "total_pages": CATALOG_SIZE // 20, "total_results": CATALOG_SIZE}
+
+
+# ----------------- Cliente WebSocket ASGI -----------------
+class AsgiWebSocket:
+    """Liga-se a um endpoint WebSocket da app ASGI no mesmo processo."""
+
+    def __init__(self, app, path: str, query: str = "") -> None:
+        self.app = app
+        self.scope = {
+            "type": "websocket",
+            "asgi": {"version": "3.0"},
+            "scheme": "ws",
+            "path": path,
+            "raw_path": path.encode(),
+            "query_string": query.encode(),
+            "headers": [(b"host", b"loadtest")],
+            "client": ("127.0.0.1", 0),
+            "server": ("loadtest", 80),
+            "subprotocols": [],
+        }
+        self._to_app: asyncio.Queue = asyncio.Queue()
+        self._from_app: asyncio.Queue = asyncio.Queue()
+        self._task: Optional[asyncio.Task] = None
+
+    async def __aenter__(self) -> "AsgiWebSocket":
+        self._task = asyncio.create_task(self.app(self.scope, self._to_app.get, self._from_app.put))
+        await self._to_app.put({"type": "websocket.connect"})
+        message = await asyncio.wait_for(self._from_app.get(), timeout=10)
+        if message["type"] != "websocket.accept":
+            raise ConnectionError(f"WebSocket recusado: {message}")
+        return self
+
+    async def send_text(self, data: str) -> None:
+        await self._to_app.put({"type": "websocket.receive", "text": data})
+
+    async def receive_json(self, timeout: float = 10) -> dict:
+        message = await asyncio.wait_for(self._from_app.get(), timeout=timeout)
+        if message["type"] == "websocket.close":
+            raise ConnectionError(f"WebSocket fechado: {message.get('code')}")
+        return json.loads(message.get("text") or message.get("bytes"))
+
+    async def __aexit__(self, *exc) -> None:
+        await self._to_app.put({"type": "websocket.disconnect", "code": 1000})
+        if self._task is not None:
+            with suppress(Exception):
+                await asyncio.wait_for(self._task, timeout=5)
+
+
+# ----------------- Jornadas -----------------
+class Recorder:
+    def __init__(self) -> None:
+        self.timings: Dict[str, Timings] = defaultdict(lambda: Timings(window=1_000_000))
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.recording = False
+
+    def observe(self, label: str, seconds: float, ok: bool) -> None:
+        if not self.recording:
+            return
+        if ok:
+            self.timings[label].observe(seconds)
+        else:
+            self.errors[label] += 1
+
+
+class VirtualUser:
+    def __init__(self, app, client: httpx.AsyncClient, recorder: Recorder, rng: random.Random, user_id: int, token: str) -> None:
+        self.app = app
+        self.client = client
+        self.rec = recorder
+        self.rng = rng
+        self.user_id = user_id
+        self.headers = {"Authorization": f"Bearer {token}"}
+        self.token = token
+
+    def _tmdb_id(self) -> int:
+        # Poucos títulos recebem a maior parte do tráfego
+        return min(CATALOG_SIZE, int(self.rng.paretovariate(1.2)))
+
+    async def call(self, label: str, method: str, url: str, **kwargs) -> Optional[httpx.Response]:
+        start = time.perf_counter()
+        try:
+            response = await self.client.request(method, url, headers=self.headers, **kwargs)
+        except Exception:
+            self.rec.observe(label, time.perf_counter() - start, ok=False)
+            return None
+        self.rec.observe(label, time.perf_counter() - start, ok=response.status_code < 400)
+        return response
+
+    async def browse_home(self) -> None:
+        await self.call("GET /filmes-populares", "GET", "/filmes-populares")
+        await self.call("GET /series-populares", "GET", "/series-populares")
+        await self.call("GET /filmes/now-playing", "GET", "/filmes/now-playing")
+        await self.call("GET /filmes/genero/{id}", "GET", f"/filmes/genero/{self.rng.choice([28, 12, 18, 35])}")
+
+    async def open_details(self) -> None:
+        tmdb_id = self._tmdb_id()
+        await self.call("GET /filmes/detalhes/{id}", "GET", f"/filmes/detalhes/{tmdb_id}")
+        await self.call("GET /filmes/{id}/elenco", "GET", f"/filmes/{tmdb_id}/elenco")
+        await self.call("GET /filmes/{id}/onde-assistir", "GET", f"/filmes/{tmdb_id}/onde-assistir")
+        await self.call("GET /comentarios/filme/{id}", "GET", f"/comentarios/filme/{tmdb_id}")
+
+    async def mark_visto(self) -> None:
+        tmdb_id = self._tmdb_id()
+        await self.call(
+            "POST /vistos/", "POST", "/vistos/",
+            json={"tipo": "filme", "tmdb_id": tmdb_id, "titulo": f"Filme {tmdb_id}", "favorito": self.rng.random() < 0.1},
+        )
+        await self.call("GET /vistos/", "GET", "/vistos/")
+
+    async def comment_and_like(self) -> None:
+        tmdb_id = self._tmdb_id()
+        response = await self.call(
+            "POST /comentarios/", "POST", "/comentarios/",
+            json={"tipo": "filme", "tmdb_id": tmdb_id, "texto": "Comentário de carga", "alvo_titulo": f"Filme {tmdb_id}"},
+        )
+        if response is not None and response.status_code < 400:
+            await self.call("POST /comentarios/{id}/like", "POST", f"/comentarios/{response.json()['id']}/like")
+
+    async def like_existing(self) -> None:
+        tmdb_id = self._tmdb_id()
+        response = await self.call("GET /comentarios/filme/{id}", "GET", f"/comentarios/filme/{tmdb_id}")
+        if response is not None and response.status_code < 400:
+            comentarios = response.json().get("comentarios", [])
+            if comentarios:
+                alvo = self.rng.choice(comentarios)["id"]
+                await self.call("POST /comentarios/{id}/like", "POST", f"/comentarios/{alvo}/like")
+
+    async def _topic(self) -> Optional[int]:
+        tmdb_id = self._tmdb_id()
+        response = await self.call(
+            "POST /forum/topics/ensure", "POST", "/forum/topics/ensure",
+            json={"tmdb_id": tmdb_id, "media_type": "movie", "title": f"Filme {tmdb_id}"},
+        )
+        if response is None or response.status_code >= 400:
+            return None
+        return response.json()["id"]
+
+    async def open_forum(self) -> None:
+        await self.call("GET /forum/top-items", "GET", "/forum/top-items")
+        topic_id = await self._topic()
+        if topic_id is not None:
+            await self.call("GET /forum/topics/{id}", "GET", f"/forum/topics/{topic_id}")
+
+    async def chat(self) -> None:
+        topic_id = await self._topic()
+        if topic_id is None:
+            return
+        texto = f"olá {self.user_id} {self.rng.random():.6f}"
+        start = time.perf_counter()
+        try:
+            async with AsgiWebSocket(self.app, f"/forum/{topic_id}/ws", f"token={self.token}") as ws:
+                self.rec.observe("WS /forum/{id}/ws (ligar)", time.perf_counter() - start, ok=True)
+                start = time.perf_counter()
+                await ws.send_text(texto)
+                while True:
+                    message = await ws.receive_json()
+                    if message.get("type") == "message" and message["data"]["message"] == texto:
+                        break
+                self.rec.observe("WS chat (envio->broadcast)", time.perf_counter() - start, ok=True)
+        except Exception:
+            self.rec.observe("WS chat (envio->broadcast)", time.perf_counter() - start, ok=False)
+
+    async def profile(self) -> None:
+        await self.call("GET /me", "GET", "/me")
+        await self.call("GET /users/{id}/profile", "GET", f"/users/{self.user_id}/profile")
+
+
+JOURNEYS = (
+    ("browse_home", 30),
+    ("open_details", 25),
+    ("mark_visto", 12),
+    ("comment_and_like", 8),
+    ("like_existing", 8),
+    ("open_forum", 7),
+    ("chat", 5),
+    ("profile", 5),
+)
+
+
+# ----------------- Execução -----------------
+async def _login_all(client: httpx.AsyncClient, vus: int, run_tag: str) -> List[tuple]:
+    async with SessionLocal() as session:
+        rows = (await session.execute(
+            select(User.id, User.email).where(User.email.like("load\\_%@example.com")).order_by(User.id).limit(vus)
+        )).all()
+    accounts = [(uid, email) for uid, email in rows]
+    # Contas em falta (DB sem o gerador): regista novas
+    for i in range(len(accounts), vus):
+        email = f"lt_{run_tag}_{i}@example.com"
+        response = await client.post("/auth/register", json={"username": f"lt_{run_tag}_{i}", "email": email, "password": PASSWORD})
+        response.raise_for_status()
+        accounts.append((response.json()["id"], email))
+
+    sessions = []
+    for uid, email in accounts:
+        response = await client.post("/auth/login", data={"username": email, "password": PASSWORD})
+        response.raise_for_status()
+        sessions.append((uid, response.json()["access_token"]))
+    return sessions
+
+
+async def run(args) -> dict:
+    from main import app
+
+    stand_in = TmdbStandIn(args.tmdb_latency_ms, Path(args.tmdb_fixtures) if args.tmdb_fixtures else None, args.gravar)
+    http_cache.configure_client(httpx.MockTransport(stand_in))
+
+    await app.router.startup()
+    recorder = Recorder()
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=30.0) as client:
+        sessions = await _login_all(client, args.vus, str(args.seed))
+        names, weights = zip(*JOURNEYS)
+        stop_at = time.perf_counter() + args.aquecimento + args.duracao
+
+        async def vu_loop(i: int, uid: int, token: str) -> None:
+            rng = random.Random(args.seed * 100_003 + i)
+            vu = VirtualUser(app, client, recorder, rng, uid, token)
+            while time.perf_counter() < stop_at:
+                journey = rng.choices(names, weights)[0]
+                await getattr(vu, journey)()
+                await asyncio.sleep(rng.expovariate(1000 / args.think_ms) if args.think_ms > 0 else 0)
+
+        async def start_recording() -> None:
+            await asyncio.sleep(args.aquecimento)
+            recorder.recording = True
+
+        print(f"{len(sessions)} utilizadores virtuais, {args.aquecimento:.0f}s aquecimento + {args.duracao:.0f}s medição ...", flush=True)
+        await asyncio.gather(start_recording(), *(vu_loop(i, uid, token) for i, (uid, token) in enumerate(sessions)))
+
+    await app.router.shutdown()
+    await engine.dispose()
+
+    routes = {}
+    for label, timings in sorted(recorder.timings.items()):
+        stats = timings.as_dict()
+        routes[label] = {
+            "count": stats["count"],
+            "errors": recorder.errors.get(label, 0),
+            "rps": round(stats["count"] / args.duracao, 2),
+            **{k: stats[k] for k in ("p50_ms", "p95_ms", "p99_ms", "max_ms")},
+        }
+    for label, errors in recorder.errors.items():
+        routes.setdefault(label, {"count": 0, "errors": errors, "rps": 0.0, "p50_ms": 0, "p95_ms": 0, "p99_ms": 0, "max_ms": 0})
+    return {
+        "meta": {
+            "vus": args.vus,
+            "duracao": args.duracao,
+            "seed": args.seed,
+            "tmdb_latency_ms": args.tmdb_latency_ms,
+            "tmdb_requests": stand_in.requests,
+            "tmdb_replayed": stand_in.replayed,
+            "total_rps": round(sum(r["rps"] for r in routes.values()), 2),
+        },
+        "routes": routes,
+    }
+
+
+def report(result: dict, baseline: Optional[dict], slo_p95_ms: float, tolerance: float) -> int:
+    problems = 0
+    base_routes = (baseline or {}).get("routes", {})
+    print()
+    header = f"{'rota':<36} {'n':>7} {'err':>5} {'req/s':>8} {'p50':>8} {'p95':>8} {'p99':>8}"
+    print(header + ("  vs baseline (p95 / req/s)" if baseline else ""))
+    for label, r in result["routes"].items():
+        notas = []
+        if r["p95_ms"] > slo_p95_ms:
+            notas.append(f"SLO p95>{slo_p95_ms:.0f}ms")
+        if r["errors"]:
+            notas.append(f"{r['errors']} erros")
+        comparacao = ""
+        base = base_routes.get(label)
+        if base and base["p95_ms"] and base["rps"]:
+            d_p95 = (r["p95_ms"] - base["p95_ms"]) / base["p95_ms"]
+            d_rps = (r["rps"] - base["rps"]) / base["rps"]
+            comparacao = f"  {d_p95:+7.1%} / {d_rps:+7.1%}"
+            if d_p95 > tolerance or d_rps < -tolerance:
+                notas.append("REGRESSÃO")
+        if notas:
+            problems += 1
+        print(
+            f"{label:<36} {r['count']:>7} {r['errors']:>5} {r['rps']:>8} {r['p50_ms']:>8} "
+            f"{r['p95_ms']:>8} {r['p99_ms']:>8}{comparacao}  {' '.join(notas)}"
+        )
+    meta = result["meta"]
+    print(f"\ntotal: {meta['total_rps']} req/s; TMDb: {meta['tmdb_requests']} pedidos ({meta['tmdb_replayed']} gravados)")
+    return problems
+
+
+async def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--vus", type=int, default=20, help="utilizadores virtuais concorrentes")
+    parser.add_argument("--duracao", type=float, default=60.0, help="segundos de medição")
+    parser.add_argument("--aquecimento", type=float, default=10.0, help="segundos antes de começar a medir")
+    parser.add_argument("--think-ms", type=float, default=200.0, help="pausa média entre jornadas")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--tmdb-latency-ms", type=float, default=80.0)
+    parser.add_argument("--tmdb-fixtures", help="diretório com respostas gravadas da TMDb")
+    parser.add_argument("--gravar", action="store_true", help="grava em --tmdb-fixtures as respostas em falta (TMDb real)")
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument("--salvar-baseline", action="store_true", help="grava esta corrida em --baseline")
+    parser.add_argument("--exigir-baseline", action="store_true", help="falha (código 2) se --baseline não existir")
+    parser.add_argument("--slo-p95-ms", type=float, default=300.0)
+    parser.add_argument("--tolerancia", type=float, default=0.15, help="regressão máxima face à baseline")
+    parser.add_argument("--json", help="grava o resultado completo neste ficheiro")
+    args = parser.parse_args()
+    if args.gravar and not args.tmdb_fixtures:
+        parser.error("--gravar precisa de --tmdb-fixtures")
+
+    baseline_path: Path = args.baseline
+    baseline = None
+    if not args.salvar_baseline:
+        if baseline_path.exists():
+            baseline = json.loads(baseline_path.read_text())
+        elif args.exigir_baseline:
+            print(f"erro: nenhuma baseline encontrada em {baseline_path} (gravar uma com --salvar-baseline)")
+            return 2
+
+    result = await run(args)
+
+    problems = report(result, baseline, args.slo_p95_ms, args.tolerancia)
+    if baseline is None and not args.salvar_baseline:
+        print(f"\naviso: nenhuma baseline encontrada em {baseline_path}; só o SLO foi verificado "
+              "(gravar uma com --salvar-baseline)")
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(result, indent=2, ensure_ascii=False))
+    if args.salvar_baseline:
+        baseline_path.parent.mkdir(parents=True, exist_ok=True)
+        baseline_path.write_text(json.dumps(result, indent=2, ensure_ascii=False))
+        print(f"baseline gravada em {baseline_path}")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
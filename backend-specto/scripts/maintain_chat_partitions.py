@@ -0,0 +1,47 @@
+"""
+Manutenção das partições de chat_messages (o mesmo que o job da app faz):
+termina arquivamentos interrompidos, cria as partições dos próximos meses e
+arquiva as anteriores à retenção.
+
+    python scripts/maintain_chat_partitions.py [--listar]
+
+Útil num cron quando a app corre com CHAT_PARTITION_INTERVAL=0.
+"""
+import argparse
+import asyncio
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.db import engine
+from app.services.chat_partitions import ARCHIVE, PARENT, list_partitions, maintain_chat_partitions
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--listar", action="store_true", help="só lista as partições, sem alterar nada")
+    args = parser.parse_args()
+
+    if not args.listar:
+        resultado = await maintain_chat_partitions()
+        if resultado["skipped"]:
+            print("Outro processo está a fazer a manutenção; nada feito.")
+        for name in resultado["recovered"]:
+            print(f"recuperada: {name}")
+        for name in resultado["created"]:
+            print(f"criada: {name}")
+        for name in resultado["archived"]:
+            print(f"arquivada: {name}")
+
+    async with engine.connect() as conn:
+        for parent in (PARENT, ARCHIVE):
+            partitions = await list_partitions(conn, parent)
+            print(f"{parent}: {len(partitions)} partições")
+            for name, month in partitions:
+                print(f"  {name}  ({month:%Y-%m})")
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())